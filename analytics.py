@@ -0,0 +1,194 @@
+"""增量的记录统计：按键次数、按住时长、组合键、按键间隔分位数
+
+每来一个事件只做常数量的工作，内存只和出现过的键的种类有关，
+可以在记录过程中实时刷新显示，也可以对已有记录一次性统计。
+"""
+import math
+import threading
+
+from keynames import key_id, normalize_modifier, chord_name
+
+# 最多统计多少种组合键，超过后新的组合键只计入总数
+MAX_CHORDS = 256
+
+
+class QuantileSketch:
+    """对数分桶的流式分位数估计
+
+    落在同一个桶里的值相对误差不超过 relative_accuracy，
+    桶的数量只和数值范围有关（1ms 到 1 小时大约几百个），和样本数无关。
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-4):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, value):
+        index = math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def quantile(self, q):
+        """第 q 分位数（0~1），没有样本时返回 None"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return None
+
+
+class HoldStats:
+    """某个键按住时长的次数、总和、最大值"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class RecordingAnalytics:
+    """按事件增量更新的统计，feed 和 snapshot 可以在不同线程调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.event_count = 0
+            # 按下次数（不含按住不放时系统自动重复的按下）
+            self.key_counts = {}
+            self.repeat_count = 0
+            self.holds = {}
+            self.chord_counts = {}
+            self.chord_holds = {}
+            self.gaps = QuantileSketch()
+            # 正在按住的键（有扫描码时按扫描码）-> (键名, 按下时间, 组合键名或 None)
+            self._held = {}
+            self._modifiers = set()
+            self._last_down = None
+
+    @classmethod
+    def from_store(cls, store):
+        """对已有的 EventStore 一次性统计"""
+        analytics = cls()
+        for name, event_type, scan_code, t in store.iter_records():
+            analytics.feed(name, event_type, t, scan_code)
+        return analytics
+
+    def feed(self, name, event_type, t, scan_code=None):
+        """scan_code 用来配对同一个键的按下和抬起，见 keynames.key_id"""
+        with self._lock:
+            self.event_count += 1
+            if event_type == 'down':
+                self._on_down(key_id(name, scan_code), name, t)
+            elif event_type == 'up':
+                self._on_up(key_id(name, scan_code), name, t)
+
+    def feed_event(self, event):
+        self.feed(event.name, event.event_type, event.time, event.scan_code)
+
+    def _on_down(self, key, name, t):
+        if key in self._held:
+            # 按住不放时的自动重复
+            self.repeat_count += 1
+            return
+        self.key_counts[name] = self.key_counts.get(name, 0) + 1
+        if self._last_down is not None:
+            self.gaps.add(t - self._last_down)
+        self._last_down = t
+
+        modifier = normalize_modifier(name)
+        chord = None
+        if modifier is not None:
+            self._modifiers.add(modifier)
+        elif self._modifiers:
+            chord = chord_name(self._modifiers, name)
+            if chord in self.chord_counts or len(self.chord_counts) < MAX_CHORDS:
+                self.chord_counts[chord] = self.chord_counts.get(chord, 0) + 1
+            else:
+                chord = None
+        self._held[key] = (name, t, chord)
+
+    def _on_up(self, key, name, t):
+        held = self._held.pop(key, None)
+        if held is not None:
+            # 时长算在按下时的键名上
+            name = held[0]
+        modifier = normalize_modifier(name)
+        if modifier is not None and not any(
+                normalize_modifier(k) == modifier for k, _t, _chord in self._held.values()):
+            self._modifiers.discard(modifier)
+        if held is None:
+            # 记录开始前就按下的键，没有配对的按下事件
+            return
+        _name, down_time, chord = held
+        duration = t - down_time
+        stats = self.holds.get(name)
+        if stats is None:
+            stats = self.holds[name] = HoldStats()
+        stats.add(duration)
+        if chord is not None:
+            stats = self.chord_holds.get(chord)
+            if stats is None:
+                stats = self.chord_holds[chord] = HoldStats()
+            stats.add(duration)
+
+    def gap_percentiles(self):
+        """按键间隔的 p50/p95/p99（秒）"""
+        with self._lock:
+            return {p: self.gaps.quantile(p / 100) for p in (50, 95, 99)}
+
+    def summary_line(self):
+        """一行简要统计，记录过程中实时显示"""
+        percentiles = self.gap_percentiles()
+        text = f"事件: {self.event_count}  按键: {sum(self.key_counts.values())}"
+        if percentiles[50] is not None:
+            text += "  间隔 p50/p95/p99: " + "/".join(
+                f"{percentiles[p] * 1000:.0f}" for p in (50, 95, 99)) + "ms"
+        return text
+
+    def report(self):
+        """完整的统计文本"""
+        percentiles = self.gap_percentiles()
+        with self._lock:
+            lines = ["\n按键统计:"]
+            for key, count in self.key_counts.items():
+                line = f"\n  {key}: {count}次"
+                stats = self.holds.get(key)
+                if stats is not None:
+                    line += f"  平均按住 {stats.mean * 1000:.0f}ms  最长 {stats.max * 1000:.0f}ms"
+                lines.append(line)
+            if self.repeat_count:
+                lines.append(f"\n  自动重复按下: {self.repeat_count}次")
+            if self.chord_counts:
+                lines.append("\n组合键统计:")
+                for chord, count in self.chord_counts.items():
+                    line = f"\n  {chord}: {count}次"
+                    stats = self.chord_holds.get(chord)
+                    if stats is not None:
+                        line += f"  平均按住 {stats.mean * 1000:.0f}ms"
+                    lines.append(line)
+        if percentiles[50] is not None:
+            lines.append("\n按键间隔: " + "  ".join(
+                f"p{p} {percentiles[p] * 1000:.0f}ms" for p in (50, 95, 99)))
+        return ''.join(lines)
@@ -0,0 +1,161 @@
+"""批量回放：逐行读取 CSV/TSV 数据文件，每行填进宏模板回放一遍
+
+数据文件第一行是列名，列名和模板里的槽位名对应。文件按需逐行读取，
+几万行的数据也不会整个读进内存。行号从 1 开始，不算列名那一行，
+回放失败或被停止后可以从结果里的 next_row 继续。
+"""
+import csv
+import os
+import time
+from itertools import islice
+
+from playback import PlaybackProgress
+
+# 按扩展名确定分隔符，其他文件看列名那一行
+_DELIMITERS = {'.tsv': '\t', '.tab': '\t'}
+
+
+def _guess_delimiter(path, header):
+    delimiter = _DELIMITERS.get(os.path.splitext(path)[1].lower())
+    if delimiter is not None:
+        return delimiter
+    if '\t' in header and ',' not in header:
+        return '\t'
+    return ','
+
+
+class RowSource:
+    """数据文件，打开时只读列名，rows() 逐行产生 (行号, 列名 -> 文本)"""
+
+    def __init__(self, path, delimiter=None, encoding='utf-8-sig'):
+        self.path = path
+        # utf-8-sig 可以读 Excel 导出的带 BOM 的文件
+        self._file = open(path, newline='', encoding=encoding)
+        try:
+            header = self._file.readline()
+            self._file.seek(0)
+            if delimiter is None:
+                delimiter = _guess_delimiter(path, header)
+            self._reader = csv.DictReader(self._file, delimiter=delimiter)
+            self.columns = self._reader.fieldnames or []
+        except Exception:
+            self._file.close()
+            raise
+
+    def rows(self, start_row=1):
+        """从第 start_row 行开始逐行读取，前面的行读过就丢掉"""
+        rows = enumerate(self._reader, 1)
+        if start_row > 1:
+            rows = islice(rows, start_row - 1, None)
+        return rows
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BatchProgress:
+    """批量回放进度，回放线程只做属性赋值，界面线程定时读取"""
+
+    def __init__(self):
+        self.row = 0
+        self.rows_done = 0
+        self.start_time = None
+        self.clock = time.perf_counter
+        # 当前这一行的事件进度
+        self.events = PlaybackProgress()
+
+    def begin(self):
+        self.start_time = self.clock()
+
+    def rows_per_minute(self):
+        if not self.rows_done or self.start_time is None:
+            return 0.0
+        return self.rows_done * 60.0 / (self.clock() - self.start_time)
+
+    def position(self):
+        """返回一致的 (行号, 这一行里下一个事件序号)，用来写断点，做法同 PlaybackProgress.position"""
+        while True:
+            row = self.row
+            index = self.events.index
+            if self.row == row:
+                return row, index
+
+    def snapshot(self):
+        """返回 (正在回放的行号, 已完成行数, 每分钟行数)"""
+        return self.row, self.rows_done, self.rows_per_minute()
+
+
+class BatchResult:
+    """批量回放结果
+
+    completed:  所有行都回放完了
+    next_row:   没回放完时，下次从这一行继续
+    error:      出错时的错误信息，被用户停止时为 None
+    """
+
+    def __init__(self, path, start_row):
+        self.path = path
+        self.start_row = start_row
+        self.next_row = start_row
+        self.rows_done = 0
+        self.completed = False
+        self.error = None
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_minute(self):
+        return self.rows_done * 60.0 / self.elapsed if self.elapsed > 0 else 0.0
+
+    def describe(self):
+        text = (f"\n批量回放了 {self.rows_done} 行（第 {self.start_row} 行起），"
+                f"用时 {self.elapsed:.1f} 秒，每分钟 {self.rows_per_minute:.1f} 行")
+        if self.completed:
+            return text + "，全部完成"
+        if self.error is not None:
+            return text + f"\n第 {self.next_row} 行回放失败: {self.error}\n修正后可以从第 {self.next_row} 行继续"
+        return text + f"\n已停止，可以从第 {self.next_row} 行继续"
+
+
+def run_batch(engine, template, source, start_row=1, row_gap=0.3, cancel=None, progress=None,
+              start_index=0):
+    """把 source 里从 start_row 开始的每一行填进 template，用 engine 逐行回放
+
+    每行之间等待 row_gap 秒。第一行从第 start_index 个事件开始（从断点继续时用）。
+    某一行出错时停在这一行，返回的结果里记下错误和行号，不会抛出异常。
+    """
+    template.check_columns(source.columns)
+    result = BatchResult(source.path, start_row)
+    if progress is None:
+        progress = BatchProgress()
+    progress.begin()
+    start = time.perf_counter()
+    try:
+        for row_number, row in source.rows(start_row):
+            result.next_row = row_number
+            first_index = start_index if row_number == start_row else 0
+            # 先重置事件序号再换行号，见 BatchProgress.position
+            progress.events.index = first_index
+            progress.row = row_number
+            if result.rows_done and not engine.wait(row_gap, cancel):
+                return result
+            try:
+                finished = engine.play_timeline(template.fill(row), cancel, progress.events,
+                                                first_index)
+            except Exception as e:
+                result.error = str(e)
+                return result
+            if not finished:
+                return result
+            result.rows_done += 1
+            result.next_row = row_number + 1
+            progress.rows_done = result.rows_done
+        result.completed = True
+        return result
+    finally:
+        result.elapsed = time.perf_counter() - start
@@ -0,0 +1,211 @@
+"""性能基准：用合成记录测量保存、加载、编译时间线的耗时和内存，以及回放计时误差
+
+不依赖 keyboard 和界面，回放用假后端，可以在没有显示器的 Linux 机器上运行。
+结果写成 JSON，可以和保存的基准结果比较，变慢超过容忍度就算退步：
+
+    python bench.py --output bench_results.json --baseline bench_baseline.json
+    python bench.py --sizes 1000,10000 --save-baseline bench_baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from event_store import EventStore
+from playback import PlaybackEngine, FakeBackend
+from recording_format import load_store, save_store
+from timeline import compile_timeline
+from timing import TimingProfile
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# 大致按中文输入法下录入数据时的按键频率，字母、数字、空格最多
+_KEY_WEIGHTS = (
+    [(chr(c), 3) for c in range(ord('a'), ord('z') + 1)]
+    + [(str(d), 4) for d in range(10)]
+    + [('space', 10), ('enter', 5), ('tab', 6), ('backspace', 4),
+       ('left', 1), ('right', 1), ('up', 1), ('down', 1)]
+)
+# 组合键：(修饰键, 键, 权重)
+_CHORDS = [('ctrl', 'c', 3), ('ctrl', 'v', 3), ('ctrl', 's', 1), ('alt', 'tab', 1),
+           ('shift', 'tab', 1)]
+# 每多少个按键里有一个组合键
+_CHORD_RATE = 0.05
+# 结果里小于这个差值的变化当作测量噪声
+_NOISE_FLOOR = {'s': 0.002, 'MB': 0.5, 'ms': 0.5}
+
+
+def synthetic_store(n, seed=0):
+    """生成大约 n 个事件的合成记录：按常见按键频率打字，夹杂组合键，间隔和按住时长随机"""
+    rng = random.Random(seed)
+    keys, weights = zip(*_KEY_WEIGHTS)
+    chord_weights = [w for _, _, w in _CHORDS]
+    scan_codes = {}
+
+    def scan_code(name):
+        return scan_codes.setdefault(name, len(scan_codes) + 2)
+
+    records = []
+    t = 0.0
+    while len(records) < n:
+        # 按键间隔对数正态分布，中位数约 120ms，偶尔有几秒的停顿
+        t += rng.lognormvariate(-2.1, 0.6)
+        if rng.random() < _CHORD_RATE:
+            modifier, key, _ = rng.choices(_CHORDS, chord_weights)[0]
+            records.append((modifier, 'down', scan_code(modifier), t))
+            t += rng.uniform(0.05, 0.2)
+            records.append((key, 'down', scan_code(key), t))
+            t += rng.uniform(0.05, 0.12)
+            records.append((key, 'up', scan_code(key), t))
+            t += rng.uniform(0.02, 0.1)
+            records.append((modifier, 'up', scan_code(modifier), t))
+        else:
+            key = rng.choices(keys, weights)[0]
+            records.append((key, 'down', scan_code(key), t))
+            t += rng.uniform(0.04, 0.12)
+            records.append((key, 'up', scan_code(key), t))
+    return EventStore.from_records(records[:n])
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _peak_mb(func, *args):
+    """func 运行期间新分配内存的峰值（MB）"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def measure_jitter(events=1000, seed=0, duration=5.0):
+    """用假后端回放一段合成记录，返回每个事件 实际发送时刻 - 计划时刻 的统计（毫秒）
+
+    计划时刻是回放引擎开始计时的时刻加上偏移量，第一个事件的迟到也算在内；
+    间隔压缩到总长大约 duration 秒。
+    """
+    store = synthetic_store(events, seed)
+    profile = TimingProfile(scale=max(store.duration() / duration, 1e-6), max_gap=10.0,
+                            min_delays={c: 0.0 for c in TimingProfile().min_delays})
+    timeline = compile_timeline(store, profile)
+    backend = FakeBackend()
+    engine = PlaybackEngine(backend)
+    # 前面的基准留下的垃圾先回收掉，免得回收停顿算进这里
+    gc.collect()
+    engine.play_timeline(timeline)
+    start = engine.scheduled_start
+    lateness = sorted((sent[0] - start - offset) * 1000
+                      for sent, offset in zip(backend.sent, timeline.offsets))
+
+    def percentile(p):
+        return lateness[min(len(lateness) - 1, int(len(lateness) * p / 100))]
+
+    return {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99),
+            'max': lateness[-1]}
+
+
+def run_suite(sizes=DEFAULT_SIZES, memory=True, jitter=True, log=None):
+    """运行全部基准，返回 {指标名: {'value': 数值, 'unit': 单位}}"""
+    results = {}
+
+    def record(name, value, unit):
+        results[name] = {'value': value, 'unit': unit}
+        if log is not None:
+            log(f"{name:28s} {value:12.4f} {unit}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            store = synthetic_store(n)
+            json_path = os.path.join(directory, f'bench_{n}.json')
+            kbr_path = os.path.join(directory, f'bench_{n}.kbr')
+            for fmt, path, binary in (('json', json_path, False), ('kbr', kbr_path, True)):
+                seconds, _ = _timed(save_store, path, store, binary)
+                record(f'save_{fmt}/{n}', seconds, 's')
+                seconds, _ = _timed(load_store, path)
+                record(f'load_{fmt}/{n}', seconds, 's')
+                record(f'size_{fmt}/{n}', os.path.getsize(path) / (1024 * 1024), 'MB')
+                if memory:
+                    record(f'load_{fmt}_peak/{n}', _peak_mb(load_store, path), 'MB')
+            seconds, _ = _timed(compile_timeline, store)
+            record(f'compile/{n}', seconds, 's')
+            if memory:
+                record(f'compile_peak/{n}', _peak_mb(compile_timeline, store), 'MB')
+    if jitter:
+        for name, value in measure_jitter().items():
+            record(f'jitter_{name}', value, 'ms')
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """和基准结果比较，返回退步的指标列表 [(指标名, 基准值, 当前值, 单位)]
+
+    所有指标都是越小越好，比基准大 tolerance 以上、并且差值超过噪声下限才算退步。
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        unit = current['unit']
+        delta = current['value'] - base['value']
+        if delta > base['value'] * tolerance and delta > _NOISE_FLOOR.get(unit, 0.0):
+            regressions.append((name, base['value'], current['value'], unit))
+    return regressions
+
+
+def _environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': _environment(), 'results': results}, f,
+                  ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    from cli import add_bench_arguments
+    parser = argparse.ArgumentParser(prog='bench', description='键盘记录回放工具性能基准')
+    add_bench_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+def run(args):
+    """按解析好的命令行参数运行"""
+    sizes = [int(n) for n in args.sizes.split(',') if n.strip()] if args.sizes else DEFAULT_SIZES
+    results = run_suite(sizes, memory=not args.no_memory, jitter=not args.no_jitter, log=print)
+    save_results(args.output, results)
+    print(f"结果已写入 {args.output}")
+    if args.save_baseline:
+        save_results(args.save_baseline, results)
+        print(f"已保存为基准结果 {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for name, base, current, unit in regressions:
+            print(f"退步: {name} {base:.4f} -> {current:.4f} {unit}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"和基准结果 {args.baseline} 相比没有退步")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
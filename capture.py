@@ -0,0 +1,144 @@
+"""记录时在键盘钩子里直接过滤事件：允许/禁止的键、自动重复、停止组合键
+
+钩子回调运行在系统的键盘钩子线程上，处理慢了会拖慢用户真实的输入，
+所以这里每个事件只做几次集合查找，过滤后的事件放进预先分配好的环形缓冲区，
+不加锁、不分配新的列表，写盘等其余工作都交给写线程。
+"""
+from keynames import key_id, normalize_modifier
+
+
+def parse_chord(chord):
+    """'ctrl+shift+q' -> (frozenset({'ctrl', 'shift'}), 'q')，最后一个键是触发键"""
+    parts = [part.strip().lower() for part in chord.split('+') if part.strip()]
+    if not parts:
+        raise ValueError("停止组合键不能为空")
+    *modifiers, trigger = parts
+    normalized = []
+    for modifier in modifiers:
+        name = normalize_modifier(modifier)
+        if name is None:
+            raise ValueError(f"{modifier} 不是修饰键，组合键只能是 修饰键+...+键")
+        normalized.append(name)
+    return frozenset(normalized), normalize_modifier(trigger) or trigger
+
+
+def _key_set(names):
+    return frozenset(name.strip().lower() for name in names or () if name.strip())
+
+
+class CaptureFilter:
+    """按顺序喂钩子事件，决定哪些事件要记录
+
+    allow:            非空时只记录这些键
+    deny:             不记录这些键
+    suppress_repeats: 按住不放时系统自动重复的按下只保留第一个
+    stop_chord:       停止记录的组合键，比如 'esc' 或 'ctrl+shift+q'，组合键的所有事件都不会被记录
+
+    键名按 keyboard 报告的名字匹配，修饰键左右不分（'ctrl' 同时匹配 left ctrl 和 right ctrl）。
+    """
+
+    def __init__(self, allow=None, deny=None, suppress_repeats=True, stop_chord='esc'):
+        self.allow = _key_set(allow)
+        self.deny = _key_set(deny)
+        self.suppress_repeats = suppress_repeats
+        self.stop_chord = stop_chord
+        self._stop_modifiers, self._stop_key = parse_chord(stop_chord)
+        self.reset()
+
+    def reset(self):
+        # 按着的键：keynames.key_id -> 按下时 keyboard 报告的名字
+        self._held = {}
+        # 停止组合键里的修饰键先按下时暂时扣住，确定不是在按停止组合键后再放行
+        self._pending = []
+        self.repeats_dropped = 0
+        self.filtered = 0
+
+    def _accepts(self, name, key):
+        if self.allow and key not in self.allow and name not in self.allow:
+            return False
+        return key not in self.deny and name not in self.deny
+
+    def _emit(self, event, emit):
+        name = event.name
+        if name is None or self._accepts(name.lower(), normalize_modifier(name) or name.lower()):
+            emit(event)
+        else:
+            self.filtered += 1
+
+    def process(self, event, emit):
+        """处理一个钩子事件，要记录的事件交给 emit；按下停止组合键时返回 True"""
+        name = event.name
+        down = event.event_type == 'down'
+        held = self._held
+        held_key = key_id(name, event.scan_code)
+        if down:
+            if held_key in held:
+                if self.suppress_repeats:
+                    self.repeats_dropped += 1
+                    return False
+            else:
+                held[held_key] = name
+        else:
+            held.pop(held_key, None)
+
+        # 停止组合键里有 shift 时触发键的名字是大写的，比较时不分大小写
+        key = normalize_modifier(name) or (name.lower() if name else name)
+        if down and key == self._stop_key and self._stop_modifiers <= {
+                normalize_modifier(n) for n in held.values()}:
+            # 扣住的修饰键属于停止组合键，和触发键一起丢掉
+            self._pending.clear()
+            return True
+        if down and key in self._stop_modifiers:
+            self._pending.append(event)
+            return False
+        if self._pending:
+            for pending in self._pending:
+                self._emit(pending, emit)
+            self._pending.clear()
+        self._emit(event, emit)
+        return False
+
+
+class RingBuffer:
+    """单生产者单消费者的定长环形缓冲区
+
+    槽位在创建时一次分配好。生产者只写 _tail，消费者只写 _head，
+    CPython 里列表元素和属性的赋值都是原子的，不需要加锁。满了 push 返回 False。
+    """
+
+    def __init__(self, capacity=4096):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._slots = [None] * size
+        self._mask = size - 1
+        self._head = 0
+        self._tail = 0
+
+    @property
+    def capacity(self):
+        return self._mask + 1
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def push(self, item):
+        """生产者线程调用"""
+        tail = self._tail
+        if tail - self._head > self._mask:
+            return False
+        self._slots[tail & self._mask] = item
+        self._tail = tail + 1
+        return True
+
+    def drain(self, out):
+        """消费者线程调用：把现有的全部元素按顺序追加到 out，返回取出的个数"""
+        head = self._head
+        tail = self._tail
+        slots = self._slots
+        mask = self._mask
+        for i in range(head, tail):
+            out.append(slots[i & mask])
+            slots[i & mask] = None
+        self._head = tail
+        return tail - head
@@ -0,0 +1,69 @@
+"""回放断点：记下回放到哪一轮、哪个事件（批量回放还有哪一行），中断后可以从这里继续
+
+断点文件是很小的 JSON，先写临时文件再用 os.replace 换上去，
+写到一半断电也不会留下半个文件。记录的校验和不一致时断点作废，
+避免把断点用在改过的记录上。
+"""
+import json
+import os
+
+
+class Checkpoint:
+    """回放断点
+
+    checksum:  记录的 EventStore.checksum()
+    iteration: 第几轮（从 1 开始）
+    index:     这一轮里下一个要发送的事件序号
+    row:       批量回放时正在回放的数据行号，普通回放为 None
+    data_path: 批量回放的数据文件
+    """
+
+    def __init__(self, checksum, iteration=1, index=0, row=None, data_path=None):
+        self.checksum = checksum
+        self.iteration = iteration
+        self.index = index
+        self.row = row
+        self.data_path = data_path
+
+    def to_dict(self):
+        return {'checksum': self.checksum, 'iteration': self.iteration, 'index': self.index,
+                'row': self.row, 'data_path': self.data_path}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['checksum'], data.get('iteration', 1), data.get('index', 0),
+                   data.get('row'), data.get('data_path'))
+
+    def describe(self):
+        if self.row is not None:
+            return f"数据第 {self.row} 行的第 {self.index} 个事件"
+        return f"第 {self.iteration} 轮的第 {self.index} 个事件"
+
+
+def save_checkpoint(path, checkpoint):
+    """原子地写入断点文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint.to_dict(), f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, checksum=None):
+    """读取断点，文件不存在、内容损坏或 checksum 对不上时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = Checkpoint.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if checksum is not None and checkpoint.checksum != checksum:
+        return None
+    return checkpoint
+
+
+def clear_checkpoint(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,336 @@
+"""命令行入口：不打开界面记录、回放、转换和查看记录，方便从计划任务和脚本里调用
+
+    python cli.py record 输出文件 [--stop-key ctrl+shift+q] [--deny windows]
+    python cli.py play 记录文件 [--count N] [--speed S] [--data 数据文件 --start-row N]
+    python cli.py convert 输入文件 输出文件
+    python cli.py stats 记录文件
+    python cli.py verify 记录文件 [--speed S] [--tune] [--live]
+    python cli.py bench [记录文件] [--baseline 基准结果]
+    python cli.py gui
+
+不带子命令时打开界面，命令行版本（keyboard_cli）不带界面，只显示帮助。
+tkinter 只在打开界面时导入，keyboard 只在真正记录或发送按键时导入，
+命令行回放从启动到开始计划第一个事件通常在 100 毫秒以内。
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+
+def _elapsed_ms():
+    """从进入本模块到现在的毫秒数，不包括解释器自身的启动时间"""
+    return (time.perf_counter() - _START) * 1000
+
+
+def _load_profile(store, args):
+    from timing import TimingProfile
+    profile = TimingProfile.from_dict(store.meta.get('timing'))
+    if args.speed is not None:
+        profile.scale = args.speed
+    # 命令行调用时不需要留时间准备回放环境，除非明确指定
+    profile.lead_in = args.lead_in
+    return profile
+
+
+def cmd_record(args):
+    from event_store import EventStore
+    from capture import CaptureFilter
+    from journal import JournalRecorder, read_journal
+    from recording_format import save_store
+    import threading
+
+    journal_path = args.output + '.journal'
+    finished = threading.Event()
+    errors = []
+    capture = CaptureFilter(allow=args.allow.split(',') if args.allow else None,
+                            deny=args.deny.split(',') if args.deny else None,
+                            suppress_repeats=not args.keep_repeats, stop_chord=args.stop_key)
+    recorder = JournalRecorder(journal_path, capture=capture,
+                               on_finished=finished.set, on_error=errors.append)
+    recorder.start()
+    print(f"开始记录，按 {args.stop_key} 停止", file=sys.stderr)
+    try:
+        # 带超时地等，Windows 上 Ctrl+C 才能打断
+        while not finished.wait(0.2) and not errors:
+            pass
+    except KeyboardInterrupt:
+        recorder.stop()
+        recorder.wait()
+    if errors:
+        print(f"记录出错: {errors[0]}，已记录的事件保存在 {journal_path}", file=sys.stderr)
+        return 1
+    records, _ = read_journal(journal_path)
+    save_store(args.output, EventStore.from_records(records), binary=args.output.endswith('.kbr'))
+    os.remove(journal_path)
+    print(f"已保存 {len(records)} 个事件到 {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_play(args):
+    from playback import PlaybackEngine, KeyboardBackend, FakeBackend
+    from recording_format import load_store
+    from template import slot_names
+
+    store = load_store(args.file)
+    slots = slot_names(store)
+    if slots and not args.data:
+        # 槽位不是真正的按键，不填数据直接回放会把槽位名当成键发出去
+        print(f"记录里有模板槽位 {', '.join(slots)}，请用 --data 指定数据文件", file=sys.stderr)
+        return 2
+    profile = _load_profile(store, args)
+    if args.dry_run:
+        backend = FakeBackend()
+    else:
+        backend = KeyboardBackend()
+        # 先导入 keyboard，不让导入时间算进第一个事件
+        backend.keyboard
+    engine = PlaybackEngine(backend)
+    if args.trace:
+        from tracing import tracer
+        tracer.enable()
+
+    if args.data:
+        return _finish_trace(args, _play_batch(engine, store, profile, args))
+
+    from timeline import compile_timeline
+    timeline = compile_timeline(store, profile)
+    if profile.lead_in:
+        time.sleep(profile.lead_in)
+    print(f"启动用时 {_elapsed_ms():.0f} 毫秒（到开始计划第一个事件）", file=sys.stderr)
+    try:
+        for i in range(args.count):
+            if i:
+                time.sleep(profile.iteration_gap)
+            engine.play_timeline(timeline)
+    except KeyboardInterrupt:
+        print("回放被中断", file=sys.stderr)
+        return _finish_trace(args, 130)
+    _finish_trace(args, 0)
+    if args.dry_run:
+        print(f"试运行发送了 {len(backend.sent)} 个事件，最大迟到 "
+              f"{engine.max_lateness * 1000:.2f} 毫秒", file=sys.stderr)
+    return 0
+
+
+def _finish_trace(args, status):
+    """打开了跟踪时输出统计并导出跟踪文件"""
+    if args.trace:
+        from tracing import tracer
+        tracer.disable()
+        print(tracer.summary().strip(), file=sys.stderr)
+        tracer.export(args.trace)
+        print(f"跟踪已导出到 {args.trace}", file=sys.stderr)
+    return status
+
+
+def _play_batch(engine, store, profile, args):
+    from batch import RowSource, run_batch
+    from template import MacroTemplate
+
+    template = MacroTemplate.compile(store, profile)
+    with RowSource(args.data) as source:
+        template.check_columns(source.columns)
+        if profile.lead_in:
+            time.sleep(profile.lead_in)
+        print(f"启动用时 {_elapsed_ms():.0f} 毫秒（到开始计划第一个事件）", file=sys.stderr)
+        try:
+            result = run_batch(engine, template, source, args.start_row, profile.iteration_gap)
+        except KeyboardInterrupt:
+            print("回放被中断", file=sys.stderr)
+            return 130
+    print(result.describe().strip(), file=sys.stderr)
+    return 0 if result.completed else 1
+
+
+def cmd_convert(args):
+    from recording_format import load_store, save_store
+    store = load_store(args.input)
+    save_store(args.output, store, binary=args.output.endswith('.kbr'))
+    print(f"已转换 {len(store)} 个事件: {args.input} -> {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_stats(args):
+    from analytics import RecordingAnalytics
+    from recording_format import load_store
+    from template import slot_names
+    from timeline import compile_timeline
+    from timing import TimingProfile
+
+    store = load_store(args.file)
+    profile = TimingProfile.from_dict(store.meta.get('timing'))
+    print(f"{args.file}: {len(store)} 个事件，记录时长 {store.duration():.1f} 秒，"
+          f"回放时长 {compile_timeline(store, profile).duration:.1f} 秒")
+    print(f"校验和: {store.checksum()}")
+    slots = slot_names(store)
+    if slots:
+        print(f"模板槽位: {', '.join(slots)}")
+    print(RecordingAnalytics.from_store(store).report().strip())
+    return 0
+
+
+def cmd_verify(args):
+    from playback import PlaybackEngine, KeyboardBackend
+    from recording_format import load_store
+    from timeline import compile_timeline
+    from verify import simulated_verifier, live_verifier, tune_scale
+
+    store = load_store(args.file)
+    profile = _load_profile(store, args)
+    if args.live:
+        backend = KeyboardBackend()
+        backend.keyboard
+        verify = live_verifier(PlaybackEngine(backend), gap=profile.iteration_gap)
+        if profile.lead_in:
+            time.sleep(profile.lead_in)
+    else:
+        verify = simulated_verifier(process_time=args.process_time, buffer=args.buffer)
+    try:
+        if args.tune:
+            result = tune_scale(store, verify, profile, args.low, args.high, args.tolerance, args.repeats)
+            print(result.describe().strip())
+            return 0 if result.scale is not None else 1
+        report = verify(compile_timeline(store, profile))
+    except KeyboardInterrupt:
+        print("校验被中断", file=sys.stderr)
+        return 130
+    report.scale = profile.scale
+    print(report.describe().strip())
+    return 0 if report.clean else 1
+
+
+def cmd_bench(args):
+    if args.file is None:
+        # 不指定记录文件时运行合成记录的完整基准，见 bench.py
+        import bench
+        return bench.run(args)
+
+    from playback import PlaybackEngine, FakeBackend
+    from recording_format import load_store
+    from timeline import compile_timeline
+    from timing import TimingProfile
+
+    t0 = time.perf_counter()
+    store = load_store(args.file)
+    t1 = time.perf_counter()
+    timeline = compile_timeline(store, TimingProfile.from_dict(store.meta.get('timing')))
+    t2 = time.perf_counter()
+    print(f"加载 {len(store)} 个事件: {(t1 - t0) * 1000:.1f} 毫秒")
+    print(f"编译时间线: {(t2 - t1) * 1000:.1f} 毫秒")
+    if args.play:
+        engine = PlaybackEngine(FakeBackend())
+        engine.play_timeline(timeline)
+        print(f"试运行 {timeline.duration:.1f} 秒，最大迟到 {engine.max_lateness * 1000:.2f} 毫秒")
+    return 0
+
+
+def cmd_gui(args):
+    try:
+        from keyboard_app import main
+    except ImportError as e:
+        # 命令行版本打包时排除了界面和 tkinter
+        print(f"这个版本不带界面（{e}），请用 record、play 等子命令", file=sys.stderr)
+        return 2
+    main()
+    return 0
+
+
+def add_bench_arguments(parser):
+    """合成记录基准的参数，bench.py 单独运行时也用这些参数"""
+    parser.add_argument('--sizes', help='合成记录的事件数，逗号分隔（默认 1000 到 100 万）')
+    parser.add_argument('--output', default='bench_results.json', help='结果文件')
+    parser.add_argument('--baseline', help='要比较的基准结果文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许变慢的比例（默认 0.25）')
+    parser.add_argument('--save-baseline', help='把这次结果另存为基准结果')
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存峰值（tracemalloc 很慢）')
+    parser.add_argument('--no-jitter', action='store_true', help='不测量回放计时误差')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='keyboard_cli', description='键盘记录回放工具（命令行）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出调试日志')
+    commands = parser.add_subparsers(dest='command')
+
+    record = commands.add_parser('record', help='记录键盘输入')
+    record.add_argument('output', help='输出文件，扩展名是 .kbr 时保存为二进制格式')
+    record.add_argument('--stop-key', default='esc',
+                        help='停止记录的键或组合键，比如 ctrl+shift+q，不会被记录（默认 esc）')
+    record.add_argument('--allow', help='只记录这些键，逗号分隔')
+    record.add_argument('--deny', help='不记录这些键，逗号分隔')
+    record.add_argument('--keep-repeats', action='store_true', help='保留按住不放时的自动重复')
+    record.set_defaults(func=cmd_record)
+
+    play = commands.add_parser('play', help='回放记录')
+    play.add_argument('file', help='记录文件（.json 或 .kbr）')
+    play.add_argument('--count', type=int, default=1, help='回放次数')
+    play.add_argument('--speed', type=float, help='速度倍率，默认用记录里保存的时序配置')
+    play.add_argument('--lead-in', type=float, default=0.0, help='开始前等待的秒数（默认 0）')
+    play.add_argument('--data', help='CSV/TSV 数据文件，每行填进模板槽位回放一遍')
+    play.add_argument('--start-row', type=int, default=1, help='批量回放从第几行开始')
+    play.add_argument('--dry-run', action='store_true', help='只按计划计时，不真正发送按键')
+    play.add_argument('--trace', help='把回放跟踪导出到这个文件（Chrome/Perfetto 格式）')
+    play.set_defaults(func=cmd_play)
+
+    convert = commands.add_parser('convert', help='在 JSON 和 .kbr 之间转换')
+    convert.add_argument('input')
+    convert.add_argument('output', help='扩展名是 .kbr 时转成二进制，否则转成 JSON')
+    convert.set_defaults(func=cmd_convert)
+
+    stats = commands.add_parser('stats', help='查看记录统计')
+    stats.add_argument('file')
+    stats.set_defaults(func=cmd_stats)
+
+    verify = commands.add_parser('verify', help='校验回放送达的事件，或自动找出最快的安全速度')
+    verify.add_argument('file')
+    verify.add_argument('--speed', type=float, help='校验用的速度倍率，默认用记录里保存的时序配置')
+    verify.add_argument('--lead-in', type=float, default=0.0, help='--live 时开始前等待的秒数（默认 0）')
+    verify.add_argument('--tune', action='store_true', help='二分查找校验能通过的最快速度')
+    verify.add_argument('--low', type=float, default=1.0, help='自动调速的最低速度')
+    verify.add_argument('--high', type=float, default=10.0, help='自动调速的最高速度')
+    verify.add_argument('--tolerance', type=float, default=0.1, help='自动调速的精度')
+    verify.add_argument('--repeats', type=int, default=1, help='每个速度回放几遍，全部通过才算通过')
+    verify.add_argument('--live', action='store_true',
+                        help='真的发送按键，用键盘钩子记录送达的事件；默认在模拟目标上校验')
+    verify.add_argument('--process-time', type=float, default=0.004,
+                        help='模拟目标处理一个输入的秒数')
+    verify.add_argument('--buffer', type=int, default=16, help='模拟目标的输入缓冲区大小')
+    verify.set_defaults(func=cmd_verify)
+
+    bench = commands.add_parser('bench', help='测量加载、编译和回放计时')
+    bench.add_argument('file', nargs='?', help='要测量的记录文件，不指定时运行合成记录的完整基准')
+    bench.add_argument('--play', action='store_true', help='再用假后端试运行一遍，测量计时误差')
+    add_bench_arguments(bench)
+    bench.set_defaults(func=cmd_bench)
+
+    gui = commands.add_parser('gui', help='打开界面')
+    gui.set_defaults(func=cmd_gui)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.verbose:
+        from tracing import setup_logging
+        setup_logging(level='debug')
+    if args.command is None:
+        status = cmd_gui(args)
+        if status:
+            parser.print_help(sys.stderr)
+        return status
+    if getattr(args, 'count', 1) <= 0:
+        print("回放次数必须大于0", file=sys.stderr)
+        return 2
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
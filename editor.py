@@ -0,0 +1,360 @@
+"""宏编辑器：在不复制整个记录的前提下插入、删除、拼接和调整事件时间，支持撤销和重做
+
+事件序列是一个分段表（piece table）：原始记录和新插入的事件分别放在两个只读的 EventStore 里，
+编辑只改变"哪一段、从第几个、多少个"这样的分段。分段组织成按位置索引的持久化 treap，
+每个节点还带一个时间变换 t -> t * scale + offset，调整一段事件的时间只是给子树打一个标记。
+每次编辑只新建 O(log n) 个节点，旧的根节点原封不动，撤销和重做就是换回以前的根节点。
+"""
+import random
+
+from event_store import EventStore
+
+# 插在记录最前面或最后面时，和相邻事件之间的间隔（秒）
+DEFAULT_GAP = 0.05
+
+
+class _Node:
+    """treap 节点：一个分段加上整棵子树的信息
+
+    source/start/length: 分段取自第 source 个事件源的 [start, start + length)
+    scale/offset:        分段里事件时间的变换
+    tag:                 还没下推给子节点的时间变换 (scale, offset)，作用于整棵子树
+    size:                子树里的事件数
+    """
+
+    __slots__ = ('source', 'start', 'length', 'scale', 'offset', 'priority',
+                 'left', 'right', 'tag', 'size')
+
+    def __init__(self, source, start, length, scale, offset, priority, left, right, tag=None):
+        self.source = source
+        self.start = start
+        self.length = length
+        self.scale = scale
+        self.offset = offset
+        self.priority = priority
+        self.left = left
+        self.right = right
+        self.tag = tag
+        self.size = length + (left.size if left else 0) + (right.size if right else 0)
+
+
+def _compose(inner, outer):
+    """先做 inner 再做 outer 的时间变换，None 表示不变换"""
+    if inner is None:
+        return outer
+    if outer is None:
+        return inner
+    return inner[0] * outer[0], inner[1] * outer[0] + outer[1]
+
+
+def _with_children(node, left, right):
+    return _Node(node.source, node.start, node.length, node.scale, node.offset, node.priority,
+                 left, right, node.tag)
+
+
+def _with_tag(node, scale, offset):
+    """给整棵子树加一个时间变换，O(1)"""
+    if node is None:
+        return None
+    return _Node(node.source, node.start, node.length, node.scale, node.offset, node.priority,
+                 node.left, node.right, _compose(node.tag, (scale, offset)))
+
+
+def _push(node):
+    """把节点上的时间变换下推到分段和子节点，返回没有标记的新节点"""
+    tag = node.tag
+    if tag is None:
+        return node
+    scale, offset = tag
+    return _Node(node.source, node.start, node.length, node.scale * scale,
+                 node.offset * scale + offset, node.priority,
+                 _with_tag(node.left, scale, offset), _with_tag(node.right, scale, offset))
+
+
+def _split(node, k):
+    """按位置拆成前 k 个事件和其余事件，分段跨过拆分点时拆成两段"""
+    if node is None:
+        return None, None
+    node = _push(node)
+    left_size = node.left.size if node.left else 0
+    if k <= left_size:
+        left, right = _split(node.left, k)
+        return left, _with_children(node, right, node.right)
+    k -= left_size
+    if k >= node.length:
+        left, right = _split(node.right, k - node.length)
+        return _with_children(node, node.left, left), right
+    # 拆分点在分段中间：前一半沿用原来的优先级，后一半是新分段，取新的随机优先级再合并，
+    # 否则同一个大分段反复拆出来的碎片优先级都相同，树会退化成链
+    head = _Node(node.source, node.start, k, node.scale, node.offset, node.priority,
+                 node.left, None)
+    tail = _Node(node.source, node.start + k, node.length - k, node.scale, node.offset,
+                 random.random(), None, None)
+    return head, _merge(tail, node.right)
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left = _push(left)
+        return _with_children(left, left.left, _merge(left.right, right))
+    right = _push(right)
+    return _with_children(right, _merge(left, right.left), right.right)
+
+
+def _piece(source, start, length, offset=0.0):
+    return _Node(source, start, length, 1.0, offset, random.random(), None, None) if length else None
+
+
+class Clip:
+    """复制或剪切下来的一段事件，和编辑器共用节点，不复制事件"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def __len__(self):
+        return self.root.size if self.root else 0
+
+
+class MacroEditor:
+    """可编辑的事件序列
+
+    位置参数都是事件序号，范围是左闭右开的 [start, end)。
+    ripple 为 True 时，编辑点之后的事件整体前移或后移，保持它们之间原来的间隔。
+    插入的事件按相对时间放到插入点：和前一个事件的间隔等于插入点原来的间隔。
+    """
+
+    def __init__(self, store, max_history=200):
+        self.base = store
+        # 编辑器打开时记录的版本，记录在别处被修改过时 stale 为 True
+        self.base_version = store.version
+        # 新插入的事件追加在这里，键名表从原记录复制，原记录里的键名序号继续有效
+        self.added = EventStore()
+        self.added.names = list(store.names)
+        self.added._name_index = dict(store._name_index)
+        self._sources = (store, self.added)
+        self._root = _piece(0, 0, len(store))
+        self.max_history = max_history
+        self._undo = []
+        self._redo = []
+        # 每次编辑、撤销、重做加一，界面用来判断要不要重画
+        self.version = 0
+
+    def __len__(self):
+        return self._root.size if self._root else 0
+
+    @property
+    def stale(self):
+        return self.base.version != self.base_version
+
+    @property
+    def modified(self):
+        return bool(self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def _check_range(self, start, end):
+        if not 0 <= start < end <= len(self):
+            raise IndexError(f"事件范围不对: {start}-{end}")
+
+    def _locate(self, root, index):
+        """第 index 个事件所在的节点、在分段里的位置和它的时间变换"""
+        transform = None
+        node = root
+        while True:
+            transform = _compose(node.tag, transform)
+            left_size = node.left.size if node.left else 0
+            if index < left_size:
+                node = node.left
+                continue
+            index -= left_size
+            if index < node.length:
+                return node, index, _compose((node.scale, node.offset), transform)
+            index -= node.length
+            node = node.right
+
+    def _time(self, root, index):
+        node, i, (scale, offset) = self._locate(root, index)
+        return self._sources[node.source].times[node.start + i] * scale + offset
+
+    def record(self, index):
+        """第 index 个事件的 (name, event_type, scan_code, time)"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        node, i, (scale, offset) = self._locate(self._root, index)
+        name, event_type, scan_code, t = self._sources[node.source].record(node.start + i)
+        return name, event_type, scan_code, t * scale + offset
+
+    def time(self, index):
+        return self.record(index)[3]
+
+    def _pieces(self, node, start, stop, transform=None):
+        """按顺序产生和 [start, stop) 相交的 (事件源, 起始, 结束, scale, offset)"""
+        if node is None or start >= stop or stop <= 0 or start >= node.size:
+            return
+        transform = _compose(node.tag, transform)
+        left_size = node.left.size if node.left else 0
+        yield from self._pieces(node.left, start, stop, transform)
+        first = max(start - left_size, 0)
+        last = min(stop - left_size, node.length)
+        if first < last:
+            scale, offset = _compose((node.scale, node.offset), transform)
+            yield node.source, node.start + first, node.start + last, scale, offset
+        skip = left_size + node.length
+        yield from self._pieces(node.right, start - skip, stop - skip, transform)
+
+    def records(self, start=0, stop=None):
+        """按顺序产生 [start, stop) 里事件的元组，只访问用到的分段"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for source, first, last, scale, offset in self._pieces(self._root, max(start, 0), stop):
+            store = self._sources[source]
+            for i in range(first, last):
+                name, event_type, scan_code, t = store.record(i)
+                yield name, event_type, scan_code, t * scale + offset
+
+    def _commit(self, root, label):
+        self._undo.append((self._root, label))
+        if len(self._undo) > self.max_history:
+            del self._undo[0]
+        self._redo.clear()
+        self._root = root
+        self.version += 1
+
+    def _place(self, root, index, block, ripple):
+        """把 block 插到 root 的第 index 个事件之前，按插入点的间隔对齐时间"""
+        count = root.size if root else 0
+        first = self._time(block, 0)
+        duration = self._time(block, block.size - 1) - first
+        previous = self._time(root, index - 1) if index > 0 else None
+        following = self._time(root, index) if index < count else None
+        gap = following - previous if previous is not None and following is not None else DEFAULT_GAP
+        if previous is not None:
+            start_time = previous + gap
+        elif following is not None:
+            start_time = following
+        else:
+            start_time = first
+        left, right = _split(root, index)
+        if ripple:
+            right = _with_tag(right, 1.0, duration + gap)
+        return _merge(_merge(left, _with_tag(block, 1.0, start_time - first)), right)
+
+    def insert(self, index, records, ripple=True):
+        """在第 index 个事件之前插入 (name, event_type, scan_code, time) 元组"""
+        if not 0 <= index <= len(self):
+            raise IndexError(index)
+        first = len(self.added)
+        self.added.extend_records(records)
+        block = _piece(1, first, len(self.added) - first)
+        if block is None:
+            return
+        self._commit(self._place(self._root, index, block, ripple), f"插入 {block.size} 个事件")
+
+    def _remove(self, start, end, ripple):
+        """返回 (删掉 [start, end) 之后的根节点, 删掉的子树)"""
+        root = self._root
+        shift = self._time(root, start) - self._time(root, end) if ripple and end < len(self) else 0.0
+        left, rest = _split(root, start)
+        middle, right = _split(rest, end - start)
+        if shift:
+            right = _with_tag(right, 1.0, shift)
+        return _merge(left, right), middle
+
+    def delete(self, start, end, ripple=True):
+        self._check_range(start, end)
+        root, _ = self._remove(start, end, ripple)
+        self._commit(root, f"删除 {end - start} 个事件")
+
+    def splice(self, start, end, records, ripple=True):
+        """把 [start, end) 换成 records，作为一步编辑撤销"""
+        self._check_range(start, end)
+        root, _ = self._remove(start, end, ripple)
+        first = len(self.added)
+        self.added.extend_records(records)
+        block = _piece(1, first, len(self.added) - first)
+        if block is not None:
+            root = self._place(root, start, block, ripple)
+        self._commit(root, f"替换 {end - start} 个事件")
+
+    def copy(self, start, end):
+        self._check_range(start, end)
+        _, rest = _split(self._root, start)
+        middle, _ = _split(rest, end - start)
+        return Clip(middle)
+
+    def cut(self, start, end, ripple=True):
+        self._check_range(start, end)
+        root, middle = self._remove(start, end, ripple)
+        self._commit(root, f"剪切 {end - start} 个事件")
+        return Clip(middle)
+
+    def paste(self, index, clip, ripple=True):
+        """在第 index 个事件之前粘贴 clip，可以粘贴多次"""
+        if not 0 <= index <= len(self):
+            raise IndexError(index)
+        if not len(clip):
+            return
+        self._commit(self._place(self._root, index, clip.root, ripple), f"粘贴 {len(clip)} 个事件")
+
+    def retime(self, start, end, factor=1.0, delta=0.0, ripple=True):
+        """[start, end) 内的间隔乘以 factor，再整体平移 delta 秒"""
+        self._check_range(start, end)
+        if factor <= 0:
+            raise ValueError("时间倍率必须大于0")
+        root = self._root
+        t0 = self._time(root, start)
+        span = self._time(root, end - 1) - t0
+        left, rest = _split(root, start)
+        middle, right = _split(rest, end - start)
+        middle = _with_tag(middle, factor, t0 * (1.0 - factor) + delta)
+        if ripple:
+            right = _with_tag(right, 1.0, span * (factor - 1.0) + delta)
+        self._commit(_merge(_merge(left, middle), right), f"调整 {end - start} 个事件的时间")
+
+    def undo(self):
+        """撤销上一步编辑，返回它的说明，没有可撤销的编辑时返回 None"""
+        if not self._undo:
+            return None
+        root, label = self._undo.pop()
+        self._redo.append((self._root, label))
+        self._root = root
+        self.version += 1
+        return label
+
+    def redo(self):
+        if not self._redo:
+            return None
+        root, label = self._redo.pop()
+        self._undo.append((self._root, label))
+        self._root = root
+        self.version += 1
+        return label
+
+    def to_store(self):
+        """生成编辑后的 EventStore，按分段整段复制列"""
+        store = EventStore()
+        store.names = list(self.added.names)
+        store._name_index = dict(self.added._name_index)
+        store.meta = dict(self.base.meta)
+        for source, first, last, scale, offset in self._pieces(self._root, 0, len(self)):
+            columns = self._sources[source]
+            store.scan_codes.extend(columns.scan_codes[first:last])
+            store.types.extend(columns.types[first:last])
+            store.name_ids.extend(columns.name_ids[first:last])
+            times = columns.times[first:last]
+            if scale != 1.0 or offset != 0.0:
+                times = [t * scale + offset for t in times]
+            store.times.extend(times)
+        store.version += 1
+        return store
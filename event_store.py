@@ -0,0 +1,161 @@
+"""列式事件存储：扫描码、事件类型、键名序号、时间戳分别存在 array 里
+
+每个事件只占十几个字节，不再为每个事件保留一个带 __dict__ 的 KeyboardEvent，
+需要 KeyboardEvent 时再按下标临时创建。
+"""
+import hashlib
+from array import array
+from collections import Counter
+from itertools import compress
+
+# text 是优化后合并出来的一段文本，键名里存的是文本内容；
+# sync 是同步点，键名里存的是同步条件（见 sync.py）；
+# slot 是模板槽位，键名里存的是槽位名，批量回放时换成数据行里对应列的文本（见 template.py）
+EVENT_TYPES = ('up', 'down', 'text', 'sync', 'slot')
+TYPE_CODES = {'up': 0, 'down': 1, 'text': 2, 'sync': 3, 'slot': 4}
+UP, DOWN, TEXT, SYNC, SLOT = 0, 1, 2, 3, 4
+# 扫描码为 None 时存的值
+NO_SCAN_CODE = -1
+
+
+def _type_mask(code):
+    """bytes.translate 用的表：事件类型等于 code 的映射成 1，其余为 0"""
+    return bytes(1 if i == code else 0 for i in range(256))
+
+
+class EventStore:
+    """按列存储的事件序列，下标和切片用法和列表一样"""
+
+    def __init__(self):
+        self.scan_codes = array('i')
+        self.types = array('b')
+        self.name_ids = array('I')
+        self.times = array('d')
+        # 键名表，name_ids 里存的是这里的下标
+        self.names = []
+        self._name_index = {}
+        # 每次修改加一，用来判断编译好的时间线是否过期
+        self.version = 0
+        # 和记录一起保存的附加信息，比如时序配置
+        self.meta = {}
+
+    @classmethod
+    def from_records(cls, records):
+        """从 (name, event_type, scan_code, time) 元组创建"""
+        store = cls()
+        store.extend_records(records)
+        return store
+
+    @classmethod
+    def from_events(cls, events):
+        """从 keyboard.KeyboardEvent 列表创建"""
+        return cls.from_records((e.name, e.event_type, e.scan_code, e.time) for e in events)
+
+    def _name_id(self, name):
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_index[name] = name_id
+        return name_id
+
+    def append(self, name, event_type, scan_code, t):
+        self.scan_codes.append(NO_SCAN_CODE if scan_code is None else scan_code)
+        self.types.append(TYPE_CODES[event_type])
+        self.name_ids.append(self._name_id(name))
+        self.times.append(t)
+        self.version += 1
+
+    def insert(self, index, name, event_type, scan_code, t):
+        self.scan_codes.insert(index, NO_SCAN_CODE if scan_code is None else scan_code)
+        self.types.insert(index, TYPE_CODES[event_type])
+        self.name_ids.insert(index, self._name_id(name))
+        self.times.insert(index, t)
+        self.version += 1
+
+    def append_event(self, event):
+        self.append(event.name, event.event_type, event.scan_code, event.time)
+
+    def extend_records(self, records):
+        for name, event_type, scan_code, t in records:
+            self.scan_codes.append(NO_SCAN_CODE if scan_code is None else scan_code)
+            self.types.append(TYPE_CODES[event_type])
+            self.name_ids.append(self._name_id(name))
+            self.times.append(t)
+        self.version += 1
+
+    def __len__(self):
+        return len(self.times)
+
+    def __repr__(self):
+        return f"<EventStore: {len(self)} 个事件>"
+
+    def record(self, index):
+        """第 index 个事件的 (name, event_type, scan_code, time)"""
+        scan_code = self.scan_codes[index]
+        return (self.names[self.name_ids[index]],
+                EVENT_TYPES[self.types[index]],
+                None if scan_code == NO_SCAN_CODE else scan_code,
+                self.times[index])
+
+    def iter_records(self):
+        names = self.names
+        for scan_code, type_code, name_id, t in zip(self.scan_codes, self.types,
+                                                    self.name_ids, self.times):
+            yield (names[name_id], EVENT_TYPES[type_code],
+                   None if scan_code == NO_SCAN_CODE else scan_code, t)
+
+    def __getitem__(self, index):
+        """整数下标返回临时创建的 KeyboardEvent，切片返回新的 EventStore"""
+        if isinstance(index, slice):
+            store = EventStore()
+            store.scan_codes = self.scan_codes[index]
+            store.types = self.types[index]
+            store.name_ids = self.name_ids[index]
+            store.times = self.times[index]
+            store.names = list(self.names)
+            store._name_index = dict(self._name_index)
+            store.meta = dict(self.meta)
+            return store
+        import keyboard
+        name, event_type, scan_code, t = self.record(index)
+        return keyboard.KeyboardEvent(name=name, event_type=event_type,
+                                      scan_code=scan_code, time=t)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def pop(self, index=-1):
+        """删除并返回第 index 个事件的元组"""
+        record = self.record(index)
+        self.scan_codes.pop(index)
+        self.types.pop(index)
+        self.name_ids.pop(index)
+        self.times.pop(index)
+        self.version += 1
+        return record
+
+    def copy(self):
+        return self[:]
+
+    def key_counts(self, event_type='down'):
+        """各个键某种事件的次数，默认统计按下次数"""
+        code = TYPE_CODES[event_type]
+        # 用 bytes.translate 生成筛选掩码，统计全程在 C 里完成
+        mask = self.types.tobytes().translate(_type_mask(code))
+        selected = compress(self.name_ids, mask)
+        names = self.names
+        return {names[name_id]: count for name_id, count in Counter(selected).items()}
+
+    def checksum(self):
+        """记录内容的 SHA-1，用来识别同一个宏"""
+        digest = hashlib.sha1()
+        for column in (self.scan_codes, self.types, self.name_ids, self.times):
+            digest.update(column.tobytes())
+        digest.update('\0'.join('' if name is None else name for name in self.names).encode('utf-8'))
+        return digest.hexdigest()
+
+    def duration(self):
+        """第一个事件到最后一个事件的时长（秒）"""
+        return self.times[-1] - self.times[0] if self.times else 0.0
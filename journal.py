@@ -0,0 +1,167 @@
+"""流式记录：钩子事件经环形缓冲区写入只追加的磁盘日志，崩溃后可以恢复"""
+import json
+import logging
+import os
+import threading
+import time
+
+from capture import CaptureFilter, RingBuffer
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class JournalRecorder:
+    """边记录边写日志的记录器
+
+    钩子线程只用 capture 过滤事件并放进预先分配的环形缓冲区，
+    写线程定时取出事件，按批写入日志文件并刷到磁盘，
+    内存占用不随记录时长增长，程序崩溃时最多丢失最后一批未落盘的事件。
+    按下停止组合键结束记录，停止组合键本身不会写入日志。
+    不传 capture 时只按 stop_key 停止，其余过滤用 CaptureFilter 的默认设置。
+    """
+
+    def __init__(self, path, stop_key='esc', queue_size=4096, batch_size=256,
+                 flush_interval=0.2, on_finished=None, on_error=None,
+                 on_event=None, hook=None, unhook=None, capture=None, poll_interval=0.01):
+        self.path = path
+        self.capture = capture if capture is not None else CaptureFilter(stop_chord=stop_key)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_finished = on_finished
+        self.on_error = on_error
+        # 写线程每取出一个事件调用一次，用于实时统计，不占用钩子线程
+        self.on_event = on_event
+        # 默认使用 keyboard 的全局钩子，测试时可以换成别的事件源
+        self._hook = hook
+        self._unhook = unhook
+        # 写线程发现缓冲区空着时等多久再看
+        self.poll_interval = poll_interval
+        self._ring = RingBuffer(queue_size)
+        self._stopping = False
+        self._writer = None
+        self.event_count = 0
+        # 缓冲区满了放不进去的事件数
+        self.dropped = 0
+
+    def start(self):
+        """打开日志文件并挂上钩子，钩子挂不上会直接抛出异常"""
+        if self._hook is None:
+            import keyboard
+            self._hook, self._unhook = keyboard.hook, keyboard.unhook
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._writer = threading.Thread(target=self._writer_thread, daemon=True)
+        self._writer.start()
+        try:
+            self._hook(self._on_event)
+        except Exception:
+            # 钩子没挂上就不算记录完成
+            self.on_finished = None
+            self.stop()
+            self.wait()
+            raise
+
+    def stop(self):
+        """结束记录，可以在任何线程调用"""
+        self._stopping = True
+
+    def wait(self, timeout=None):
+        """等待写线程把剩余事件写完"""
+        if self._writer is not None:
+            self._writer.join(timeout)
+
+    def _on_event(self, event):
+        """钩子回调，运行在钩子线程上，只做过滤和入队"""
+        if self._stopping:
+            return
+        if self.capture.process(event, self._push):
+            self.stop()
+
+    def _push(self, event):
+        if not self._ring.push(event):
+            self.dropped += 1
+        elif tracer.enabled:
+            tracer.hook_event(event.name, event.time)
+
+    def _writer_thread(self):
+        """写线程：攒够一批或距上次落盘超过 flush_interval 就写一次盘"""
+        batch = []
+        ring = self._ring
+        try:
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                # 先看停止标志再取事件，停止前放进缓冲区的事件都会被取到
+                stopping = self._stopping
+                start = len(batch)
+                if ring.drain(batch) and self.on_event is not None:
+                    for item in batch[start:]:
+                        self.on_event(item)
+                if stopping:
+                    break
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self._write_batch(batch)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_interval
+                elif len(batch) == start:
+                    time.sleep(self.poll_interval)
+            self._write_batch(batch)
+        except Exception as e:
+            self._close()
+            if self.on_error is not None:
+                self.on_error(str(e))
+            return
+        self._close()
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        lines = [json.dumps([e.name, e.event_type, e.scan_code, e.time],
+                            ensure_ascii=False) + '\n' for e in batch]
+        self._file.write(''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.event_count += len(batch)
+        if tracer.enabled:
+            tracer.complete('journal.write', start, time.perf_counter(), 'record',
+                            {'events': len(batch)})
+
+    def _close(self):
+        try:
+            self._unhook(self._on_event)
+        except Exception:
+            logger.exception("卸载键盘钩子失败")
+        self._file.close()
+        if self.dropped:
+            logger.warning("记录缓冲区满，丢弃了 %d 个事件", self.dropped)
+        logger.info("记录结束: 写入 %d 个事件，忽略自动重复 %d 个，过滤掉 %d 个",
+                    self.event_count, self.capture.repeats_dropped, self.capture.filtered)
+
+
+def read_journal(path):
+    """读取日志，返回 (name, event_type, scan_code, time) 列表和最后一条完整记录的结束位置"""
+    records = []
+    good_end = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            # 崩溃时最后一行可能只写了一半，遇到第一条不完整的记录就停止
+            if not line.endswith(b'\n'):
+                break
+            try:
+                name, event_type, scan_code, t = json.loads(line)
+            except ValueError:
+                break
+            records.append((name, event_type, scan_code, t))
+            good_end += len(line)
+    return records, good_end
+
+
+def recover_journal(path):
+    """恢复崩溃后留下的日志：截掉不完整的尾部，返回其中完整的记录"""
+    records, good_end = read_journal(path)
+    if os.path.getsize(path) != good_end:
+        with open(path, 'r+b') as f:
+            f.truncate(good_end)
+    return records
@@ -1,12 +1,44 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, filedialog
+from tkinter import ttk, messagebox, scrolledtext, filedialog, simpledialog
 import keyboard
 import threading
 import time
-import json
 from datetime import datetime
+import logging
 import os
 
+from playback import PlaybackEngine, KeyboardBackend, PlaybackProgress
+from timeline import TimelineCache, compile_timeline
+from journal import JournalRecorder, read_journal, recover_journal
+from capture import CaptureFilter, parse_chord
+from event_store import EventStore
+from analytics import RecordingAnalytics
+from log_pane import LogPane
+from library import MacroLibrary
+from optimizer import optimize
+from timing import TimingProfile, KEY_CLASSES, KEY_CLASS_LABELS
+from sync import SyncContext, SyncPoint, STANDALONE_SYNC_KINDS, SYNC_KIND_LABELS, insert_sync_point
+from recording_format import load_store, save_store
+from checkpoint import Checkpoint, save_checkpoint, load_checkpoint, clear_checkpoint
+from template import MacroTemplate, make_slot, slot_names
+from batch import RowSource, BatchProgress, run_batch
+from editor import MacroEditor
+from virtual_list import VirtualList
+from verify import live_verifier, tune_scale
+from scheduler import JobScheduler, Job, JOB_STATE_LABELS, acquire_injection, parse_start_time
+from tracing import tracer, traced, setup_logging
+
+# 记录过程中实时写入的日志文件，记录正常结束后删除，启动时还在说明上次记录异常中断
+JOURNAL_FILE = "keyboard_record.journal"
+# 回放断点，回放被停止或出错时写入，完整回放后删除
+CHECKPOINT_FILE = "keyboard_playback.checkpoint"
+# 回放过程中每隔多少秒更新一次断点，程序崩溃或机器锁屏后也能从附近继续
+CHECKPOINT_INTERVAL = 1.0
+# 打包后的程序没有控制台，日志写到这个文件
+LOG_FILE = "keyboard_app.log"
+
+logger = logging.getLogger(__name__)
+
 
 class KeyboardRecorderApp:
     def __init__(self, root):
@@ -18,15 +50,46 @@ class KeyboardRecorderApp:
         # 记录状态变量
         self.is_recording = False
         self.is_playing = False
-        self.recorded_events = []
-        self.record_thread = None
+        self.recorded_events = EventStore()
+        self.recorder = None
+        # 记录时在钩子里过滤事件的设置，见 capture.CaptureFilter
+        self.capture_settings = {'stop_chord': 'esc', 'allow': [], 'deny': [],
+                                 'suppress_repeats': True}
+        # 宏库，第一次打开宏库窗口时才建立
+        self.library = None
+        # 记录过程中增量更新的统计
+        self.analytics = RecordingAnalytics()
         self.play_thread = None
+
+        # 回放引擎，按高精度计划发送事件
+        # 同步点等待剪贴板变化时通过Tk读取系统剪贴板
+        self.playback_engine = PlaybackEngine(KeyboardBackend(),
+                                              sync_context=SyncContext(self._read_clipboard))
+        # 编译好的回放时间线，按记录和速度缓存，切换回用过的记录不用重新编译
+        self.timeline_cache = TimelineCache()
+        # 停止回放的取消标志，回放引擎在每个事件之间都会检查
+        self.cancel_playback = threading.Event()
+        # 回放进度，由界面定时读取
+        self.playback_progress = PlaybackProgress()
+        # 批量回放进度和上次批量回放的结果（失败后从哪一行继续）
+        self.batch_progress = BatchProgress()
+        self.last_batch_result = None
+        # 正在回放的记录的校验和，批量回放时还有数据文件，写断点用
+        self.playback_checksum = None
+        self.batch_data_path = None
+        self._last_checkpoint = 0.0
+        # 注入锁：界面上的回放和计划任务谁拿到谁发送按键，按键不会交错
+        self.injection_lock = threading.Lock()
+        # 任务计划，第一次打开任务计划窗口时才建立
+        self.scheduler = None
         
         self.setup_ui()
 
         self.setup_shortcuts()
 
         self.setup_welcome_message()
+
+        self.recover_unfinished_journal()
         
     def setup_ui(self):
         """设置用户界面"""
@@ -53,6 +116,12 @@ class KeyboardRecorderApp:
         
         self.record_status = ttk.Label(record_frame, text="状态: 未记录", foreground="red")
         self.record_status.grid(row=0, column=2)
+
+        ttk.Button(record_frame, text="记录设置", command=self.edit_capture_settings).grid(row=0, column=3, padx=(10, 0))
+
+        # 记录过程中实时刷新的统计
+        self.record_stats = ttk.Label(record_frame, text="")
+        self.record_stats.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
         
         # 回放控制区域
         play_frame = ttk.LabelFrame(main_frame, text="回放控制", padding="10")
@@ -67,12 +136,13 @@ class KeyboardRecorderApp:
 
         ttk.Label(play_frame, text="回放速度:").grid(row=0, column=2, padx=(0, 5))
         
-        self.replay_speed = tk.StringVar(value="1")
-        replay_speed_spinbox = ttk.Spinbox(play_frame, from_=1, to=100, width=3,
-                                    textvariable=self.replay_speed)
+        self.replay_speed = tk.StringVar(value="1.0")
+        replay_speed_spinbox = ttk.Spinbox(play_frame, from_=0.1, to=10.0, increment=0.1,
+                                    width=4, textvariable=self.replay_speed)
         replay_speed_spinbox.grid(row=0, column=3, padx=(0, 10))
 
         # ttk.Label(play_frame, text="档").grid(row=0, column=4, padx=(0, 5))
+        ttk.Button(play_frame, text="时序配置", command=self.edit_timing_profile).grid(row=0, column=4, padx=(0, 10))
         
         self.play_button = ttk.Button(play_frame, text="开始回放", 
                                      command=self.start_playback)
@@ -84,6 +154,23 @@ class KeyboardRecorderApp:
         
         self.play_status = ttk.Label(play_frame, text="状态: 未回放", foreground="red")
         self.play_status.grid(row=0, column=7, padx=(20, 0))
+
+        self.batch_button = ttk.Button(play_frame, text="批量回放",
+                                       command=self.start_batch_playback)
+        self.batch_button.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+
+        self.trace_button = ttk.Button(play_frame, text="开始跟踪", command=self.toggle_tracing)
+        self.trace_button.grid(row=1, column=2, columnspan=2, sticky=tk.W, pady=(5, 0))
+
+        self.pause_button = ttk.Button(play_frame, text="暂停回放", command=self.toggle_pause,
+                                       state="disabled")
+        self.pause_button.grid(row=1, column=5, sticky=tk.W, pady=(5, 0))
+
+        self.tune_button = ttk.Button(play_frame, text="自动调速", command=self.auto_tune_speed)
+        self.tune_button.grid(row=1, column=6, sticky=tk.W, pady=(5, 0))
+
+        ttk.Button(play_frame, text="任务计划", command=self.open_scheduler).grid(row=1, column=7, sticky=tk.W,
+                                                                              padx=(20, 0), pady=(5, 0))
         
         # 记录信息显示
         info_frame = ttk.LabelFrame(main_frame, text="记录信息", padding="10")
@@ -91,14 +178,23 @@ class KeyboardRecorderApp:
         
         self.info_text = scrolledtext.ScrolledText(info_frame, height=8, width=78)
         self.info_text.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        # 消息先进队列，每100毫秒合并刷新一次，文本框最多保留2000行
+        self.log_pane = LogPane(self.root, self.info_text)
+        self.log_pane.start()
         
         # 文件操作区域
         file_frame = ttk.LabelFrame(main_frame, text="文件操作", padding="10")
         file_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
         
         ttk.Button(file_frame, text="保存记录", command=self.save_recording).grid(row=0, column=0, padx=(0, 10))
-        ttk.Button(file_frame, text="加载记录", command=self.load_recording).grid(row=0, column=1, padx=(0, 10))
-        ttk.Button(file_frame, text="清空记录", command=self.clear_recording).grid(row=0, column=2)
+        ttk.Button(file_frame, text="保存为二进制", command=lambda: self.save_recording(binary=True)).grid(row=0, column=1, padx=(0, 10))
+        ttk.Button(file_frame, text="加载记录", command=self.load_recording).grid(row=0, column=2, padx=(0, 10))
+        ttk.Button(file_frame, text="清空记录", command=self.clear_recording).grid(row=0, column=3, padx=(0, 10))
+        ttk.Button(file_frame, text="优化记录", command=self.optimize_recording).grid(row=0, column=4, padx=(0, 10))
+        ttk.Button(file_frame, text="宏库", command=self.open_library).grid(row=0, column=5, padx=(0, 10))
+        ttk.Button(file_frame, text="插入同步点", command=self.add_sync_point).grid(row=0, column=6, padx=(0, 10))
+        ttk.Button(file_frame, text="设置槽位", command=self.add_template_slot).grid(row=0, column=7, padx=(0, 10))
+        ttk.Button(file_frame, text="编辑记录", command=self.open_editor).grid(row=0, column=8)
         
         # 状态栏
         status_frame = ttk.Frame(main_frame)
@@ -114,25 +210,26 @@ class KeyboardRecorderApp:
     
     def setup_shortcuts(self):
         """设置快捷键"""
-        print("setup_shortcuts called")
+        logger.debug("setup_shortcuts called")
         # 使用keyboard库监听全局快捷键
         # keyboard.add_hotkey('ctrl+shift+r', self.toggle_recording)
         keyboard.add_hotkey('f9', self.start_playback)
         keyboard.add_hotkey('f10', self.stop_playback)
+        keyboard.add_hotkey('f11', lambda: self.root.after(0, self.toggle_pause))
         # keyboard.add_hotkey('ctrl+shift+l', self.load_recording)
         # keyboard.add_hotkey('ctrl+shift+w', self.save_recording)
         # keyboard.add_hotkey('ctrl+shift+c', self.clear_recording)
 
     def setup_welcome_message(self):
         """显示欢迎信息"""
-        print("setup_welcome_message called")
+        logger.debug("setup_welcome_message called")
         welcome_message = (
             "------------------------------\n"
             "欢迎使用键盘记录回放工具！\n"
             "本工具可以记录您的键盘输入，并能将记录的内容进行回放，支持多次回放和不同速度设置。适用于需要重复性操作的场景。\n"
             "------------------------------\n"
             "使用说明:\n"
-            "1. 点击“开始记录”按钮开始记录键盘输入，按ESC键停止记录。\n"
+            "1. 点击“开始记录”按钮开始记录键盘输入，按ESC键停止记录（可以在“记录设置”里改）。\n"
             "2. 设置回放次数和速度，点击“开始回放”按钮进行回放。\n"
             "3. 可以保存记录到文件，或从文件加载记录。\n"
             "4. 使用“清空记录”按钮清除当前记录。\n"
@@ -140,62 +237,117 @@ class KeyboardRecorderApp:
             "快捷键说明:\n"
             "  F9 - 开始回放\n"
             "  F10 - 停止回放\n"
+            "  F11 - 暂停/继续回放\n"
             "------------------------------\n"
         )
         self.update_info(welcome_message)
 
+    @traced()
     def toggle_recording(self):
         """开始或停止记录"""
-        print("toggle_recording called")
-        print(self.is_recording)
+        logger.debug("toggle_recording called, is_recording=%s", self.is_recording)
 
         if not self.is_recording:
             self.start_recording()
         else:
             self.stop_recording()
     
+    @traced()
     def start_recording(self):
         """开始记录键盘事件"""
-        print("start_recording called")
+        logger.debug("start_recording called")
         if self.is_playing:
             messagebox.showwarning("警告", "请先停止回放")
             return
             
         self.is_recording = True
-        self.recorded_events = []
+        self.recorded_events = EventStore()
         
         # 更新UI
         self.record_button.config(state="disabled")
         self.stop_record_button.config(state="normal")
         self.record_status.config(text="状态: 记录中...", foreground="green")
         self.play_button.config(state="disabled")
-        self.status_label.config(text="记录中... 按ESC键停止记录")
+        stop_chord = self.capture_settings['stop_chord']
+        self.status_label.config(text=f"记录中... 按{stop_chord.upper()}停止记录")
         
-        # 在后台线程中记录
-        self.record_thread = threading.Thread(target=self._record_thread)
-        self.record_thread.daemon = True
-        self.record_thread.start()
+        # 事件在钩子里过滤后边记录边写入日志文件，停止组合键本身不会被记录
+        self.analytics.reset()
+        self.recorder = JournalRecorder(
+            JOURNAL_FILE,
+            capture=CaptureFilter(**self.capture_settings),
+            on_event=self.analytics.feed_event,
+            on_finished=lambda: self.root.after(0, self._on_recording_finished),
+            on_error=lambda error_msg: self.root.after(0, lambda: self._on_recording_error(error_msg)))
+        try:
+            self.recorder.start()
+        except Exception as e:
+            self._on_recording_error(str(e))
+            return
         
         self.update_info("\n开始记录键盘输入...")
+        self._refresh_live_stats()
     
-    def _record_thread(self):
-        """记录线程"""
-        print("_record_thread called")
-        try:
-            # 开始记录，按ESC停止
-            self.recorded_events = keyboard.record(until='esc')
-            self.root.after(0, self._on_recording_finished)
-        except Exception as e:
-            error_msg = str(e)
-            self.root.after(0, lambda: self._on_recording_error(error_msg))
+    def edit_capture_settings(self):
+        """记录设置：停止组合键、只记录/不记录哪些键、是否忽略自动重复"""
+        logger.debug("edit_capture_settings called")
+        if self.is_recording:
+            messagebox.showwarning("警告", "请先停止记录")
+            return
+        settings = self.capture_settings
+        
+        window = tk.Toplevel(self.root)
+        window.title("记录设置")
+        frame = ttk.Frame(window, padding="10")
+        frame.grid(row=0, column=0)
+        
+        ttk.Label(frame, text="停止组合键(如 esc、ctrl+shift+q):").grid(row=0, column=0, sticky=tk.W)
+        stop_chord = tk.StringVar(value=settings['stop_chord'])
+        ttk.Entry(frame, textvariable=stop_chord, width=24).grid(row=0, column=1, sticky=tk.W)
+        ttk.Label(frame, text="只记录这些键(逗号分隔，空为全部):").grid(row=1, column=0, sticky=tk.W)
+        allow = tk.StringVar(value=", ".join(settings['allow']))
+        ttk.Entry(frame, textvariable=allow, width=24).grid(row=1, column=1, sticky=tk.W)
+        ttk.Label(frame, text="不记录这些键(逗号分隔):").grid(row=2, column=0, sticky=tk.W)
+        deny = tk.StringVar(value=", ".join(settings['deny']))
+        ttk.Entry(frame, textvariable=deny, width=24).grid(row=2, column=1, sticky=tk.W)
+        suppress_repeats = tk.BooleanVar(value=settings['suppress_repeats'])
+        ttk.Checkbutton(frame, text="忽略按住不放时的自动重复", variable=suppress_repeats).grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        
+        def apply():
+            chord = stop_chord.get().strip().lower()
+            try:
+                parse_chord(chord)
+            except ValueError as e:
+                messagebox.showerror("错误", f"{e}", parent=window)
+                return
+            self.capture_settings = {
+                'stop_chord': chord,
+                'allow': [k.strip() for k in allow.get().split(",") if k.strip()],
+                'deny': [k.strip() for k in deny.get().split(",") if k.strip()],
+                'suppress_repeats': suppress_repeats.get(),
+            }
+            self.stop_record_button.config(text=f"按{chord.upper()}停止记录")
+            window.destroy()
+        
+        ttk.Button(frame, text="确定", command=apply).grid(row=4, column=0, columnspan=2, pady=(10, 0))
+
+    @traced()
+    def _refresh_live_stats(self):
+        """记录过程中每0.5秒刷新一次实时统计"""
+        self.record_stats.config(text=self.analytics.summary_line())
+        if self.is_recording:
+            self.root.after(500, self._refresh_live_stats)
     
+    @traced()
     def _on_recording_finished(self):
         """记录完成回调"""
-        print("_on_recording_finished called")
+        logger.debug("_on_recording_finished called")
         self.is_recording = False
 
-        # 删除最后一个ESC事件
-        self.recorded_events.pop()
+        # 从日志读回记录，日志里不含停止组合键，不用再删最后的事件
+        records, _ = read_journal(JOURNAL_FILE)
+        self.recorded_events = EventStore.from_records(records)
+        os.remove(JOURNAL_FILE)
         
         # 更新UI
         self.record_button.config(state="normal")
@@ -208,20 +360,15 @@ class KeyboardRecorderApp:
         self.update_info(f"\n记录完成！")
         self.update_info(f"\n总按键事件数: {len(self.recorded_events)}")
         
-        # 分析记录内容
-        key_counts = {}
-        for event in self.recorded_events:
-            if event.event_type == keyboard.KEY_DOWN:
-                key_name = event.name
-                key_counts[key_name] = key_counts.get(key_name, 0) + 1
-        
-        self.update_info("\n按键统计:")
-        for key, count in key_counts.items():
-            self.update_info(f"\n  {key}: {count}次")
+        # 统计在记录过程中已经增量算好了，直接显示
+        self.record_stats.config(text=self.analytics.summary_line())
+        self.update_info(self.analytics.report())
     
+    @traced()
     def _on_recording_error(self, error_msg):
         """记录错误回调"""
-        print("_on_recording_error called")
+        logger.debug("_on_recording_error called")
+        logger.error("记录错误: %s", error_msg)
         self.is_recording = False
         
         # 更新UI
@@ -233,43 +380,38 @@ class KeyboardRecorderApp:
         
         messagebox.showerror("记录错误", f"记录过程中发生错误:\n{error_msg}")
     
+    @traced()
     def stop_recording(self):
         """停止记录"""
-        print("stop_recording called")
-        print(self.is_recording)
+        logger.debug("stop_recording called, is_recording=%s", self.is_recording)
 
 
-        if self.is_recording:
-            # 模拟按下ESC键来停止记录
-            try:
-                # keyboard.send('esc') #send也不行，还是没反应
-                # print("sent esc")
-
-                # time.sleep(3) #延时一会，方便我切换到其他窗口来测试这个esc是否被按下（切换到win应用程序页面，能识别到esc）
-                keyboard.press('esc') #经测试，这里esc确实是被按下了，电脑系统也识别到了，但是就是_record_thread中的record函数没有结束
-                print("pressed esc")
-                time.sleep(0.3)
-                keyboard.release('esc')
-                print("released esc")
-
-                # time.sleep(3)
-                # keyboard.write("test")
-                # keyboard.press("ctrl")
-                # keyboard.press('esc') #ctrl+esc == windows键 ——这里电脑是识别到了，但是监听线程没有识别到
-
-
-                # time.sleep(2)
-                # keyboard.press('esc') #按一次不行？多按几次？ ——还是不行，就是监听的线程没有捕捉到
-                # print("pressed esc")
-                # time.sleep(0.3)
-                # keyboard.release('esc')
-                # print("released esc")
-            except Exception as e:
-                print(f"停止记录时发生错误: {e}")
+        if self.is_recording and self.recorder is not None:
+            # 以前是模拟按下ESC，但keyboard.record监听不到自己发出的按键；现在直接通知记录器停止
+            self.recorder.stop()
     
+    def recover_unfinished_journal(self):
+        """启动时发现上次没有正常结束的记录日志，询问是否恢复"""
+        if not os.path.exists(JOURNAL_FILE):
+            return
+        try:
+            records = recover_journal(JOURNAL_FILE)
+        except Exception:
+            logger.exception("恢复记录日志时发生错误")
+            return
+        if records and messagebox.askyesno(
+                "恢复记录", f"发现上次未正常结束的记录（{len(records)} 个按键事件），是否恢复？"):
+            self.recorded_events = EventStore.from_records(records)
+            self.record_status.config(text="状态: 记录已恢复", foreground="blue")
+            self.update_info(f"\n已恢复上次中断的记录，共 {len(records)} 个按键事件")
+            self.analytics = RecordingAnalytics.from_store(self.recorded_events)
+            self.update_info(self.analytics.report())
+        os.remove(JOURNAL_FILE)
+
+    @traced()
     def start_playback(self):
         """开始回放"""
-        print("start_playback called")
+        logger.debug("start_playback called")
         if not self.recorded_events:
             messagebox.showwarning("警告", "没有可回放的记录")
             return
@@ -277,23 +419,41 @@ class KeyboardRecorderApp:
         if self.is_recording:
             messagebox.showwarning("警告", "请先停止记录")
             return
+
+        if slot_names(self.recorded_events):
+            messagebox.showwarning("警告", "记录里有模板槽位，请用批量回放")
+            return
             
         try:
             replay_count = int(self.replay_count.get())
-            replay_speed = int(self.replay_speed.get())
             if replay_count <= 0:
                 raise ValueError("回放次数必须大于0")
-            if replay_speed <= 0 or replay_speed > 3:
-                raise ValueError("回放速度只有1、2、3")
+            profile = self._current_timing_profile()
         except ValueError as e:
             messagebox.showerror("错误", f"{e}")
             return
+
+        # 同一个记录上次没回放完时，可以从断点继续
+        checksum = self.recorded_events.checksum()
+        start_iteration, start_index = 1, 0
+        resume = load_checkpoint(CHECKPOINT_FILE, checksum)
+        if (resume is not None and resume.row is None and resume.iteration <= replay_count
+                and messagebox.askyesno("从断点继续",
+                                        f"上次回放停在{resume.describe()}，是否从这里继续？\n选“否”从头开始")):
+            start_iteration, start_index = resume.iteration, resume.index
         
         self.is_playing = True
+        self.cancel_playback.clear()
+        self.playback_engine.resume()
+        self.playback_progress = PlaybackProgress(replay_count)
+        self.playback_checksum = checksum
+        self.batch_data_path = None
         
         # 更新UI
         self.play_button.config(state="disabled")
+        self.batch_button.config(state="disabled")
         self.stop_play_button.config(state="normal")
+        self.pause_button.config(state="normal")
         self.record_button.config(state="disabled")
         current_count = 0
         total_count = replay_count
@@ -301,72 +461,103 @@ class KeyboardRecorderApp:
         self.status_label.config(text=f"开始回放，共 {replay_count} 次...")
         
         # 在后台线程中回放
-        self.play_thread = threading.Thread(target=self._playback_thread, args=(replay_count, replay_speed,))
+        self.play_thread = threading.Thread(target=self._playback_thread,
+                                            args=(replay_count, profile, start_iteration, start_index))
         self.play_thread.daemon = True
         self.play_thread.start()
+        self._poll_playback_progress()
     
-    def _playback_thread(self, replay_count, replay_speed):
-        """回放线程"""
-        print("_playback_thread called")
+    def _playback_thread(self, replay_count, profile, start_iteration=1, start_index=0):
+        """回放线程，从第 start_iteration 轮的第 start_index 个事件开始"""
+        logger.debug("_playback_thread called")
 
-        self.update_info("\n-----回放即将开始，正式回放前会等待5秒钟，方便您准备回放的环境-----\n")
+        self.update_info(f"\n-----回放即将开始，正式回放前会等待{profile.lead_in:g}秒钟，方便您准备回放的环境-----\n")
 
         try:
-            time.sleep(5)  # 等待5秒以便用户准备
-
-            #每次回放前会检测一下is_playing状态，如果被设为False就停止回放，所以停止回放也是要等当前这一轮回放结束才真正停止
+            # 等待几秒以便用户准备（时长在时序配置里设置），期间按停止会立即生效
             user_stop_playback_flag = 0
-            for i in range(replay_count):
-                if not self.is_playing:
-                    user_stop_playback_flag = 1 #表示是被用户停止的
-                    break
-                    
-                current_iteration = i + 1
-                # 更新回放状态
-                self.root.after(0, lambda iter=current_iteration: self._update_playback_status(iter, replay_count))
+            if self.cancel_playback.wait(profile.lead_in):
+                user_stop_playback_flag = 1
+
+            locked = not user_stop_playback_flag and self._acquire_injection()
+            if not locked:
+                user_stop_playback_flag = 1
+            try:
+                # 记录只编译一次，每轮回放直接遍历时间线，不再改写原始时间戳
+                timeline = self.timeline_cache.get(self.recorded_events, profile)
+                progress = self.playback_progress
+                progress.begin()
+
+                #回放引擎在每个事件之间都会检查取消标志，停止回放几毫秒内生效，还按着的键也会被抬起
+                for i in range(start_iteration - 1, replay_count):
+                    if user_stop_playback_flag:
+                        break
                 
-                # 清除记录的时间戳
-                t = 1.0
-                t1 = 0.1 * (4 - replay_speed)  #根据回放速度调整时间间隔，速度档位越大，间隔越小，越快
-                for my_event in self.recorded_events:
-                    print(my_event)
-                    print(my_event.time)
-                    # print(my_event.scan_code)
-                    # print(my_event.name)
-                    # print(my_event.scan_code or my_event.name) 
-                    # # or返回第一个非零参数，但是好像没有scan_code是0的情况啊？没搞懂
-                    my_event.time = t  # 重置时间戳，避免时间间隔过大影响回放速度
-                    t += t1 #重置时间间隔为t1秒
-                    print(my_event.time)
+                    first_index = start_index if i == start_iteration - 1 else 0
+                    # 先设置事件序号再设置轮数，见 PlaybackProgress.position
+                    progress.index = first_index
+                    progress.iteration = i + 1
                 
-
-                # 回放记录
-                #第二个参数0表示以系统允许的最快速度回放，输入文本还行，录成绩就不行了，切换窗口反应不过来
-                # keyboard.play(self.recorded_events, 0) 
-                keyboard.play(self.recorded_events)
+                    # 回放记录，被取消时返回False
+                    if not self.playback_engine.play_timeline(timeline, self.cancel_playback, progress,
+                                                              first_index):
+                        user_stop_playback_flag = 1 #表示是被用户停止的
+                        break
                 
-                # 等待0.3秒，间隔开多轮回放
-                time.sleep(0.3)
+                    # 等待一会儿（默认0.3秒），间隔开多轮回放，暂停的时间不算
+                    if not self.playback_engine.wait(profile.iteration_gap, self.cancel_playback):
+                        user_stop_playback_flag = 1
+            finally:
+                if locked:
+                    self.injection_lock.release()
             
-            self.root.after(0, self._on_playback_finished(user_stop_playback_flag))
+            self.root.after(0, lambda: self._on_playback_finished(user_stop_playback_flag))
             
         except Exception as e:
+            logger.exception("回放线程出错")
             error_msg = str(e)
             self.root.after(0, lambda: self._on_playback_error(error_msg))
     
-    def _update_playback_status(self, current, total):
+    def _acquire_injection(self):
+        """回放线程里等注入锁，计划任务正在运行时等它结束；等待期间被停止返回 False"""
+        if self.injection_lock.locked():
+            self.update_info("\n计划任务正在发送按键，等它结束后开始...")
+        return acquire_injection(self.injection_lock, self.cancel_playback)
+    
+    @traced()
+    def _poll_playback_progress(self):
+        """回放过程中每0.2秒读取一次回放进度"""
+        if not self.is_playing:
+            return
+        iteration, index, total, percent, eta = self.playback_progress.snapshot()
+        if iteration:
+            self._update_playback_status(iteration, self.playback_progress.iterations,
+                                         index, total, percent, eta)
+        self._save_checkpoint(periodic=True)
+        self.root.after(200, self._poll_playback_progress)
+    
+    def _update_playback_status(self, current, total, index, event_total, percent, eta):
         """更新回放状态"""
-        print("_update_playback_status called")
+        if self.playback_engine.paused:
+            self.play_status.config(text=f"状态: 已暂停 ({current}/{total})")
+            self.status_label.config(text=f"回放已暂停在第 {current}/{total} 次的第 {index} 个事件，按F11继续")
+            return
         self.play_status.config(text=f"状态: 回放中 ({current}/{total})")
-        self.status_label.config(text=f"回放第 {current}/{total} 次...")
+        text = f"回放第 {current}/{total} 次，事件 {index}/{event_total}，总进度 {percent:.0f}%"
+        if eta is not None:
+            text += f"，预计剩余 {eta:.0f} 秒"
+        self.status_label.config(text=text)
     
+    @traced()
     def _on_playback_finished(self, user_stop_playback_flag=0):
         """回放完成回调"""
-        print("_on_playback_finished called")
+        logger.debug("_on_playback_finished called")
         self.is_playing = False
+        self._end_playback(completed=user_stop_playback_flag != 1)
         
         # 更新UI
         self.play_button.config(state="normal")
+        self.batch_button.config(state="normal")
         self.stop_play_button.config(state="disabled")
         self.record_button.config(state="normal")
         self.play_status.config(text="状态: 回放完成", foreground="blue")
@@ -379,13 +570,17 @@ class KeyboardRecorderApp:
         else:
             self.update_info("\n回放完成！")
     
+    @traced()
     def _on_playback_error(self, error_msg):
         """回放错误回调"""
-        print("_on_playback_error called")
+        logger.debug("_on_playback_error called")
+        logger.error("回放错误: %s", error_msg)
         self.is_playing = False
+        self._end_playback(completed=False)
         
         # 更新UI
         self.play_button.config(state="normal")
+        self.batch_button.config(state="normal")
         self.stop_play_button.config(state="disabled")
         self.record_button.config(state="normal")
         self.play_status.config(text="状态: 回放错误", foreground="red")
@@ -393,117 +588,954 @@ class KeyboardRecorderApp:
         
         messagebox.showerror("回放错误", f"回放过程中发生错误:\n{error_msg}")
     
+    def _end_playback(self, completed):
+        """回放结束：完整回放删除断点，否则把停下的位置写进断点"""
+        self.playback_engine.resume()
+        self.pause_button.config(state="disabled", text="暂停回放")
+        if completed:
+            clear_checkpoint(CHECKPOINT_FILE)
+        else:
+            self._save_checkpoint()
+            if os.path.exists(CHECKPOINT_FILE):
+                self.update_info("\n已记下回放停下的位置，下次开始回放时可以从这里继续")
+    
+    def _save_checkpoint(self, periodic=False):
+        """把当前回放位置写进断点文件，periodic 为 True 时最多每 CHECKPOINT_INTERVAL 秒写一次"""
+        if self.playback_checksum is None:
+            return
+        now = time.monotonic()
+        if periodic and now - self._last_checkpoint < CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint = now
+        if self.batch_data_path is not None:
+            row, index = self.batch_progress.position()
+            if not row:
+                return
+            checkpoint = Checkpoint(self.playback_checksum, 1, index, row, self.batch_data_path)
+        else:
+            iteration, index = self.playback_progress.position()
+            if not iteration:
+                return
+            checkpoint = Checkpoint(self.playback_checksum, iteration, index)
+        try:
+            save_checkpoint(CHECKPOINT_FILE, checkpoint)
+        except OSError:
+            logger.exception("写回放断点出错")
+    
+    def toggle_pause(self):
+        """暂停或继续回放，暂停时回放按着的键会被抬起，继续时重新按下"""
+        logger.debug("toggle_pause called, paused=%s", self.playback_engine.paused)
+        if not self.is_playing:
+            return
+        if self.playback_engine.paused:
+            self.playback_engine.resume()
+            self.pause_button.config(text="暂停回放")
+            self.play_status.config(foreground="green")
+            self.update_info("\n回放继续")
+        else:
+            self.playback_engine.pause()
+            self.pause_button.config(text="继续回放")
+            self.play_status.config(text="状态: 已暂停", foreground="orange")
+            self._save_checkpoint()
+            self.update_info("\n回放已暂停")
+    
+    @traced()
     def stop_playback(self):
         """停止回放"""
-        print("stop_playback called")
+        logger.debug("stop_playback called")
+        self.cancel_playback.set()
         self.is_playing = False
         self.status_label.config(text="回放已停止")
     
-    def save_recording(self):
-        """保存记录到文件"""
-        print("save_recording called")
+    @traced()
+    def start_batch_playback(self):
+        """批量回放：逐行读取数据文件，每行填进模板槽位回放一遍"""
+        logger.debug("start_batch_playback called")
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+        if not slot_names(self.recorded_events):
+            messagebox.showwarning("警告", "记录里没有模板槽位，请先用\"设置槽位\"把要替换的输入换成槽位")
+            return
+
+        filename = filedialog.askopenfilename(
+            filetypes=[("CSV/TSV 数据", "*.csv *.tsv *.txt"), ("所有文件", "*.*")])
+        if not filename:
+            return
+        # 上次同一个文件没回放完时，默认从没完成的那一行继续；程序重启过时从断点文件里找
+        checksum = self.recorded_events.checksum()
+        resume = load_checkpoint(CHECKPOINT_FILE, checksum)
+        if resume is not None and (resume.row is None or resume.data_path != filename):
+            resume = None
+        last = self.last_batch_result
+        if last is not None and last.path == filename and not last.completed:
+            initial_row = last.next_row
+        elif resume is not None:
+            initial_row = resume.row
+        else:
+            initial_row = 1
+        start_row = simpledialog.askinteger("批量回放", "从第几行开始（不算列名那一行）:",
+                                            initialvalue=initial_row, minvalue=1, parent=self.root)
+        if start_row is None:
+            return
+        # 从断点所在的行继续时，跳过这一行已经发送过的事件
+        start_index = resume.index if resume is not None and resume.row == start_row else 0
+
+        try:
+            profile = self._current_timing_profile()
+            template = MacroTemplate.compile(self.recorded_events, profile, self.timeline_cache)
+            source = RowSource(filename)
+            try:
+                template.check_columns(source.columns)
+            except ValueError:
+                source.close()
+                raise
+        except (ValueError, OSError) as e:
+            messagebox.showerror("错误", f"{e}")
+            return
+
+        self.is_playing = True
+        self.cancel_playback.clear()
+        self.playback_engine.resume()
+        self.batch_progress = BatchProgress()
+        self.playback_checksum = checksum
+        self.batch_data_path = filename
+        self.play_button.config(state="disabled")
+        self.batch_button.config(state="disabled")
+        self.stop_play_button.config(state="normal")
+        self.pause_button.config(state="normal")
+        self.record_button.config(state="disabled")
+        self.play_status.config(text="状态: 批量回放中", foreground="green")
+        self.status_label.config(text=f"开始批量回放 {os.path.basename(filename)}，从第 {start_row} 行开始...")
+
+        self.play_thread = threading.Thread(target=self._batch_thread,
+                                            args=(template, source, start_row, start_index, profile))
+        self.play_thread.daemon = True
+        self.play_thread.start()
+        self._poll_batch_progress()
+
+    def _batch_thread(self, template, source, start_row, start_index, profile):
+        """批量回放线程"""
+        logger.debug("_batch_thread called")
+        self.update_info(f"\n-----批量回放即将开始，正式回放前会等待{profile.lead_in:g}秒钟，方便您准备回放的环境-----\n")
+        try:
+            with source:
+                if self.cancel_playback.wait(profile.lead_in) or not self._acquire_injection():
+                    self.root.after(0, lambda: self._on_playback_finished(1))
+                    return
+                try:
+                    result = run_batch(self.playback_engine, template, source, start_row,
+                                       profile.iteration_gap, self.cancel_playback, self.batch_progress,
+                                       start_index)
+                finally:
+                    self.injection_lock.release()
+            self.root.after(0, lambda: self._on_batch_finished(result))
+        except Exception as e:
+            logger.exception("回放线程出错")
+            error_msg = str(e)
+            self.root.after(0, lambda: self._on_playback_error(error_msg))
+
+    @traced()
+    def _poll_batch_progress(self):
+        """批量回放过程中每0.2秒读取一次进度"""
+        if not self.is_playing:
+            return
+        row, rows_done, rows_per_minute = self.batch_progress.snapshot()
+        if row:
+            paused = "（已暂停，按F11继续）" if self.playback_engine.paused else ""
+            self.status_label.config(text=f"批量回放第 {row} 行，已完成 {rows_done} 行，"
+                                          f"每分钟 {rows_per_minute:.1f} 行{paused}")
+        self._save_checkpoint(periodic=True)
+        self.root.after(200, self._poll_batch_progress)
+
+    @traced()
+    def _on_batch_finished(self, result):
+        """批量回放结束回调"""
+        logger.debug("_on_batch_finished called")
+        self.last_batch_result = result
+        self.update_info(result.describe())
+        if result.error is not None:
+            self._on_playback_error(f"第 {result.next_row} 行: {result.error}\n修正后可以从第 {result.next_row} 行继续")
+        else:
+            self._on_playback_finished(0 if result.completed else 1)
+
+    def add_template_slot(self):
+        """把记录里的一段输入换成命名的槽位，批量回放时用数据文件里同名列的值填进去"""
+        logger.debug("add_template_slot called")
+        if not self.recorded_events:
+            messagebox.showwarning("警告", "没有可设置槽位的记录")
+            return
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("设置槽位")
+        frame = ttk.Frame(window, padding="10")
+        frame.grid(row=0, column=0)
+
+        # 列出合并出来的文本输入，选中一段就把它换成槽位（先用"优化记录"合并连续输入的文字）
+        ttk.Label(frame, text="记录里的文本输入:").grid(row=0, column=0, columnspan=2, sticky=tk.W)
+        tree = ttk.Treeview(frame, columns=("index", "text"), show="headings", height=8)
+        tree.heading("index", text="事件序号")
+        tree.heading("text", text="文本")
+        tree.column("index", width=80)
+        tree.column("text", width=240)
+        tree.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        for index, (name, event_type, _scan_code, _t) in enumerate(self.recorded_events.iter_records()):
+            if event_type in ("text", "slot"):
+                tree.insert("", tk.END, values=(index, name if event_type == "text" else f"[槽位] {name}"))
+
+        ttk.Label(frame, text="起始事件序号:").grid(row=2, column=0, sticky=tk.W)
+        start = tk.StringVar()
+        ttk.Entry(frame, textvariable=start, width=8).grid(row=2, column=1, sticky=tk.W)
+        ttk.Label(frame, text="结束事件序号(含):").grid(row=3, column=0, sticky=tk.W)
+        end = tk.StringVar()
+        ttk.Entry(frame, textvariable=end, width=8).grid(row=3, column=1, sticky=tk.W)
+        ttk.Label(frame, text="槽位名(数据文件列名):").grid(row=4, column=0, sticky=tk.W)
+        name = tk.StringVar()
+        ttk.Entry(frame, textvariable=name, width=20).grid(row=4, column=1, sticky=tk.W)
+
+        def select(*_):
+            selection = tree.selection()
+            if selection:
+                index = tree.item(selection[0], "values")[0]
+                start.set(index)
+                end.set(index)
+
+        def apply():
+            try:
+                first = int(start.get())
+                make_slot(self.recorded_events, first, int(end.get()) + 1, name.get())
+            except (ValueError, IndexError) as e:
+                messagebox.showerror("错误", f"无法设置槽位: {e}", parent=window)
+                return
+            self.update_info(f"\n已把第 {first} 到 {end.get()} 个事件换成槽位 {name.get().strip()}，"
+                             f"模板现在的槽位: {', '.join(slot_names(self.recorded_events))}")
+            window.destroy()
+
+        tree.bind("<<TreeviewSelect>>", select)
+        ttk.Button(frame, text="设置", command=apply).grid(row=5, column=0, columnspan=2, pady=(10, 0))
+
+    def auto_tune_speed(self):
+        """反复回放并用键盘钩子校验送达的事件，二分查找不丢键的最快速度，找到后填进回放速度"""
+        logger.debug("auto_tune_speed called")
+        if not self.recorded_events:
+            messagebox.showwarning("警告", "没有可回放的记录")
+            return
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+        if slot_names(self.recorded_events):
+            messagebox.showwarning("警告", "记录里有模板槽位，请用\"批量回放\"")
+            return
+        try:
+            profile = self._current_timing_profile()
+        except ValueError as e:
+            messagebox.showerror("错误", f"{e}")
+            return
+        if not messagebox.askyesno("自动调速", "会以不同速度多次回放记录，校验每次送达的按键，"
+                                               "找出不丢键的最快速度。\n请准备好回放的环境，期间不要碰键盘。"
+                                               "按F10可以停止。\n是否开始？"):
+            return
+
+        self.is_playing = True
+        self.cancel_playback.clear()
+        self.playback_engine.resume()
+        self.play_button.config(state="disabled")
+        self.batch_button.config(state="disabled")
+        self.tune_button.config(state="disabled")
+        self.stop_play_button.config(state="normal")
+        self.record_button.config(state="disabled")
+        self.play_status.config(text="状态: 自动调速中", foreground="green")
+        self.status_label.config(text="自动调速中，按F10停止...")
+
+        self.play_thread = threading.Thread(target=self._tune_thread, args=(profile,))
+        self.play_thread.daemon = True
+        self.play_thread.start()
+
+    def _tune_thread(self, profile):
+        """自动调速线程"""
+        logger.debug("_tune_thread called")
+        self.update_info(f"\n-----自动调速即将开始，正式回放前会等待{profile.lead_in:g}秒钟，方便您准备回放的环境-----\n")
+        try:
+            result = None
+            if not self.cancel_playback.wait(profile.lead_in) and self._acquire_injection():
+                try:
+                    verify = live_verifier(self.playback_engine, self.cancel_playback, profile.iteration_gap)
+                    result = tune_scale(self.recorded_events, verify, profile, cancel=self.cancel_playback)
+                finally:
+                    self.injection_lock.release()
+            self.root.after(0, lambda: self._on_tune_finished(result))
+        except Exception as e:
+            logger.exception("自动调速出错")
+            error_msg = str(e)
+            self.root.after(0, lambda: self._on_tune_finished(None, error_msg))
+
+    @traced()
+    def _on_tune_finished(self, result, error_msg=None):
+        """自动调速结束回调"""
+        logger.debug("_on_tune_finished called")
+        self.is_playing = False
+        self.play_button.config(state="normal")
+        self.batch_button.config(state="normal")
+        self.tune_button.config(state="normal")
+        self.stop_play_button.config(state="disabled")
+        self.record_button.config(state="normal")
+        if error_msg is not None:
+            self.play_status.config(text="状态: 回放错误", foreground="red")
+            self.status_label.config(text=f"自动调速出错: {error_msg}")
+            messagebox.showerror("自动调速", f"自动调速时发生错误:\n{error_msg}")
+            return
+        if result is None or not result.trials:
+            self.play_status.config(text="状态: 回放停止", foreground="red")
+            self.status_label.config(text="自动调速已停止")
+            return
+        self.update_info(result.describe())
+        for report in result.trials:
+            if not report.clean:
+                self.update_info(report.describe())
+        if self.cancel_playback.is_set():
+            self.play_status.config(text="状态: 回放停止", foreground="red")
+            self.status_label.config(text="自动调速已停止，结果可能不是最快的")
+        else:
+            self.play_status.config(text="状态: 回放完成", foreground="blue")
+        if result.scale is None:
+            self.status_label.config(text="最低速度也有丢键，请检查回放环境或调大时序配置里的最小延迟")
+            return
+        self.replay_speed.set(str(result.scale))
+        self.status_label.config(text=f"最快的安全速度是 {result.scale:g}，已填进回放速度")
+
+    def open_scheduler(self):
+        """打开任务计划窗口：排队运行多个宏，查看队列和每个任务的统计，取消任务"""
+        logger.debug("open_scheduler called")
+        if self.scheduler is None:
+            engine = PlaybackEngine(KeyboardBackend(), sync_context=SyncContext(self._read_clipboard))
+            self.scheduler = JobScheduler(engine, self.injection_lock)
+            self.scheduler.start()
+        scheduler = self.scheduler
+
+        window = tk.Toplevel(self.root)
+        window.title("任务计划")
+        window.geometry("820x360")
+
+        columns = ("id", "name", "priority", "next_run", "repeat", "state", "runs", "stats")
+        tree = ttk.Treeview(window, columns=columns, show="headings", selectmode="browse")
+        for column, heading, width in zip(columns,
+                                          ("编号", "名称", "优先级", "下次运行", "重复", "状态", "已运行", "统计"),
+                                          (40, 140, 50, 80, 90, 60, 60, 300)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+
+        def describe_repeat(job):
+            if job.interval is None:
+                return "不重复"
+            times = "不限次数" if job.count is None else f"共 {job.count} 次"
+            return f"每 {job.interval / 60:g} 分钟，{times}"
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            selection = tree.selection()
+            tree.delete(*tree.get_children())
+            for job in scheduler.jobs():
+                next_run = "" if job.finished else time.strftime("%H:%M:%S", time.localtime(job.next_run))
+                stats = job.last_error or job.describe_stats()
+                if job.missed:
+                    stats = f"错过 {job.missed} 次，{stats}"
+                tree.insert("", tk.END, iid=str(job.id),
+                            values=(job.id, job.name, job.priority, next_run, describe_repeat(job),
+                                    JOB_STATE_LABELS[job.state], job.runs, stats))
+            if selection and tree.exists(selection[0]):
+                tree.selection_set(selection[0])
+            window.after(1000, refresh)
+
+        def add_job(name, store):
+            """设置优先级、开始时间和重复，把记录编译好加入队列"""
+            if slot_names(store):
+                messagebox.showwarning("警告", "记录里有模板槽位，不能加入任务计划", parent=window)
+                return
+            dialog = tk.Toplevel(window)
+            dialog.title("添加任务")
+            frame = ttk.Frame(dialog, padding="10")
+            frame.grid(row=0, column=0)
+            fields = {}
+            for row, (key, label, value) in enumerate((
+                    ("name", "名称:", name),
+                    ("priority", "优先级（大的先运行）:", "0"),
+                    ("start", "开始时间（时:分，空表示现在）:", ""),
+                    ("interval", "重复间隔（分钟，0 表示不重复）:", "0"),
+                    ("count", "运行次数（0 表示不限）:", "0"))):
+                ttk.Label(frame, text=label).grid(row=row, column=0, sticky=tk.W)
+                fields[key] = tk.StringVar(value=value)
+                ttk.Entry(frame, textvariable=fields[key], width=20).grid(row=row, column=1, sticky=tk.W)
+
+            def apply():
+                try:
+                    interval = float(fields["interval"].get()) * 60
+                    count = int(fields["count"].get())
+                    profile = TimingProfile.from_dict(store.meta.get("timing"))
+                    job = Job(fields["name"].get().strip() or name, compile_timeline(store, profile),
+                              priority=int(fields["priority"].get()),
+                              start_at=parse_start_time(fields["start"].get()),
+                              interval=interval if interval > 0 else None,
+                              count=count if count > 0 else None)
+                except ValueError as e:
+                    messagebox.showerror("错误", f"{e}", parent=dialog)
+                    return
+                scheduler.submit(job)
+                self.update_info(f"\n任务 {job.id}（{job.name}）已加入任务计划")
+                dialog.destroy()
+
+            ttk.Button(frame, text="加入队列", command=apply).grid(row=5, column=0, columnspan=2, pady=(10, 0))
+
+        def add_current():
+            if not self.recorded_events:
+                messagebox.showwarning("警告", "没有可回放的记录", parent=window)
+                return
+            try:
+                # 保存界面上的回放速度到当前记录的时序配置
+                self._current_timing_profile()
+            except ValueError as e:
+                messagebox.showerror("错误", f"{e}", parent=window)
+                return
+            add_job("当前记录", self.recorded_events)
+
+        def add_file():
+            filename = filedialog.askopenfilename(
+                parent=window, filetypes=[("记录文件", "*.json *.kbr"), ("所有文件", "*.*")])
+            if not filename:
+                return
+            try:
+                store = load_store(filename)
+            except Exception as e:
+                logger.exception("加载任务记录出错")
+                messagebox.showerror("错误", f"加载记录时发生错误:\n{e}", parent=window)
+                return
+            add_job(os.path.basename(filename), store)
+
+        def cancel_selected():
+            selection = tree.selection()
+            if selection and scheduler.cancel(int(selection[0])):
+                self.update_info(f"\n任务 {selection[0]} 已取消")
+
+        button_frame = ttk.Frame(window, padding="10")
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="添加当前记录", command=add_current).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="添加记录文件", command=add_file).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="取消任务", command=cancel_selected).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="清除已结束", command=scheduler.remove_finished).pack(side=tk.LEFT)
+        refresh()
+
+    def open_editor(self):
+        """打开编辑窗口：删除、插入、替换、剪切粘贴和调整一段事件的时间，可以撤销和重做"""
+        logger.debug("open_editor called")
+        if not self.recorded_events:
+            messagebox.showwarning("警告", "没有可编辑的记录")
+            return
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+
+        editor = MacroEditor(self.recorded_events)
+        clipboard = []
+        type_labels = {"down": "按下", "up": "抬起", "text": "文本", "sync": "同步点", "slot": "槽位"}
+
+        window = tk.Toplevel(self.root)
+        window.title("编辑记录")
+        window.geometry("640x560")
+
+        def fetch(start, stop):
+            # 事件全删光时列表也会来取 [0, 0)，这时没有第一个事件可以当时间原点
+            if start >= stop:
+                return []
+            # 多取前一个事件，用来算第一行的间隔
+            first = max(start - 1, 0)
+            origin = editor.time(0)
+            rows = []
+            previous = None
+            for index, (name, event_type, scan_code, t) in enumerate(editor.records(first, stop), first):
+                if index >= start:
+                    gap = "" if previous is None else f"{(t - previous) * 1000:.0f}"
+                    rows.append((index, f"{t - origin:.3f}", gap, type_labels.get(event_type, event_type),
+                                 name, "" if scan_code is None else scan_code))
+                previous = t
+            return rows
+
+        view = VirtualList(window, ("index", "time", "gap", "type", "key", "scan_code"),
+                           ("序号", "时间(秒)", "间隔(毫秒)", "类型", "键/文本", "扫描码"),
+                           (70, 90, 80, 70, 200, 70), lambda: len(editor), fetch)
+        view.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+        status = ttk.Label(window, text="")
+        status.pack(fill=tk.X, padx=10)
+
+        def changed(message):
+            status.config(text=f"{message}，共 {len(editor)} 个事件")
+            view.refresh()
+
+        def selected():
+            selection = view.selection()
+            if selection is None:
+                messagebox.showwarning("警告", "请先选中事件（按住Shift点击可以选中一段）", parent=window)
+            return selection
+
+        def edit(action):
+            # 编辑方法的参数错误统一在这里提示
+            try:
+                message = action()
+            except (ValueError, IndexError) as e:
+                messagebox.showerror("错误", f"{e}", parent=window)
+                return
+            if message:
+                changed(message)
+
+        def delete():
+            selection = selected()
+            if selection:
+                editor.delete(*selection)
+                view.select(selection[0])
+                return f"删除了 {selection[1] - selection[0]} 个事件"
+
+        def insert_key():
+            selection = view.selection()
+            index = selection[0] if selection else len(editor)
+            key = simpledialog.askstring("插入按键", "键名（比如 a、enter、ctrl）:", parent=window)
+            if key and key.strip():
+                key = key.strip().lower()
+                editor.insert(index, [(key, "down", None, 0.0), (key, "up", None, 0.05)])
+                view.select(index, index + 2)
+                return f"在第 {index} 个事件前插入了 {key}"
+
+        def replace_text():
+            # 选中的一段换成一段文本，用来改正打错的字
+            selection = selected()
+            if selection:
+                text = simpledialog.askstring("替换为文本", "要输入的文本:", parent=window)
+                if text:
+                    editor.splice(*selection, [(text, "text", None, 0.0)])
+                    view.select(selection[0])
+                    return f"把第 {selection[0]} 到 {selection[1] - 1} 个事件换成了文本"
+
+        def cut():
+            selection = selected()
+            if selection:
+                clipboard[:] = [editor.cut(*selection)]
+                view.select(selection[0])
+                return f"剪切了 {selection[1] - selection[0]} 个事件"
+
+        def copy():
+            selection = selected()
+            if selection:
+                clipboard[:] = [editor.copy(*selection)]
+                return f"复制了 {selection[1] - selection[0]} 个事件"
+
+        def paste():
+            if not clipboard:
+                return None
+            selection = view.selection()
+            index = selection[0] if selection else len(editor)
+            editor.paste(index, clipboard[0])
+            view.select(index, index + len(clipboard[0]))
+            return f"在第 {index} 个事件前粘贴了 {len(clipboard[0])} 个事件"
+
+        def retime():
+            selection = selected()
+            if not selection:
+                return None
+            factor = simpledialog.askfloat("调整时间", "间隔倍率（2 表示慢一倍，0.5 表示快一倍）:",
+                                           initialvalue=1.0, minvalue=0.01, parent=window)
+            if factor is None:
+                return None
+            delta = simpledialog.askfloat("调整时间", "整体推迟的秒数（负数表示提前）:",
+                                          initialvalue=0.0, parent=window)
+            if delta is None:
+                return None
+            editor.retime(*selection, factor, delta)
+            return f"调整了第 {selection[0]} 到 {selection[1] - 1} 个事件的时间"
+
+        def undo(*_):
+            label = editor.undo()
+            if label:
+                changed(f"已撤销: {label}")
+
+        def redo(*_):
+            label = editor.redo()
+            if label:
+                changed(f"已重做: {label}")
+
+        def apply():
+            if editor.stale:
+                messagebox.showerror("错误", "记录在编辑期间被修改过，请关闭编辑窗口后重新打开", parent=window)
+                return
+            if self.is_recording or self.is_playing:
+                messagebox.showwarning("警告", "请先停止记录和回放", parent=window)
+                return
+            if editor.modified:
+                self.recorded_events = editor.to_store()
+                self.update_info(f"\n编辑后的记录共 {len(self.recorded_events)} 个事件")
+                self.status_label.config(text="记录已按编辑结果更新")
+            window.destroy()
+
+        def close():
+            if editor.modified and not messagebox.askyesno("放弃修改", "编辑还没有应用，确定要关闭吗？",
+                                                           parent=window):
+                return
+            window.destroy()
+
+        button_frame = ttk.Frame(window, padding="10")
+        button_frame.pack(fill=tk.X)
+        for column, (text, command) in enumerate((
+                ("删除", lambda: edit(delete)), ("插入按键", lambda: edit(insert_key)),
+                ("替换为文本", lambda: edit(replace_text)), ("剪切", lambda: edit(cut)),
+                ("复制", lambda: edit(copy)), ("粘贴", lambda: edit(paste)),
+                ("调整时间", lambda: edit(retime)))):
+            ttk.Button(button_frame, text=text, command=command).grid(row=0, column=column, padx=(0, 5))
+        for column, (text, command) in enumerate((("撤销", undo), ("重做", redo),
+                                                  ("应用", apply), ("关闭", close))):
+            ttk.Button(button_frame, text=text, command=command).grid(row=1, column=column, padx=(0, 5),
+                                                                      pady=(5, 0))
+        window.bind("<Control-z>", undo)
+        window.bind("<Control-y>", redo)
+        window.bind("<Delete>", lambda e: edit(delete))
+        window.protocol("WM_DELETE_WINDOW", close)
+        view.select(0)
+        changed("点击选中事件，按住Shift点击选中一段")
+
+    def toggle_tracing(self):
+        """开始跟踪，或者停止跟踪并导出 Chrome/Perfetto 跟踪文件"""
+        logger.debug("toggle_tracing called, enabled=%s", tracer.enabled)
+        if not tracer.enabled:
+            tracer.enable()
+            self.trace_button.config(text="导出跟踪")
+            self.update_info("\n已开始跟踪：记录和回放的计时、界面回调耗时都会被记下")
+            return
+
+        tracer.disable()
+        self.trace_button.config(text="开始跟踪")
+        self.update_info(tracer.summary())
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Chrome 跟踪文件", "*.json"), ("所有文件", "*.*")],
+            initialfile=f"keyboard_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        if not filename:
+            return
+        try:
+            tracer.export(filename)
+        except OSError as e:
+            logger.exception("导出跟踪出错")
+            messagebox.showerror("导出错误", f"导出跟踪时发生错误:\n{e}")
+            return
+        self.update_info(f"\n跟踪已导出到: {filename}（在 chrome://tracing 或 ui.perfetto.dev 里打开）")
+
+    @traced()
+    def save_recording(self, binary=False):
+        """保存记录到文件，binary为True时保存为紧凑的二进制格式(.kbr)"""
+        logger.debug("save_recording called")
         if not self.recorded_events:
             messagebox.showwarning("警告", "没有可保存的记录")
             return
-        print("recorded_events:(before saving)")
-        print("--------------------")
-        print(self.recorded_events)
-        print("--------------------")
+        logger.debug("recorded_events (before saving): %r", self.recorded_events)
         try:
-            # 转换为可序列化的格式
-            events_data = []
-            for event in self.recorded_events:
-                events_data.append({
-                    'name': event.name,
-                    'event_type': event.event_type,
-                    'scan_code': event.scan_code,
-                    'time': event.time
-                })
-            
-            filename = f"keyboard_record_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            extension = "kbr" if binary else "json"
+            filename = f"keyboard_record_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(events_data, f, indent=2)
+            save_store(filename, self.recorded_events, binary=binary)
             
             self.status_label.config(text=f"记录已保存到: {filename}")
             messagebox.showinfo("成功", f"记录已保存到: {filename}")
             
         except Exception as e:
+            logger.exception("保存记录出错")
             messagebox.showerror("保存错误", f"保存记录时发生错误:\n{e}")
     
+    @traced()
     def load_recording(self):
         """从文件加载记录"""
-        print("load_recording called")
+        logger.debug("load_recording called")
         try:
             filename = filedialog.askopenfilename(
                 title="选择记录文件",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+                filetypes=[("Recording files", "*.json *.kbr"), ("JSON files", "*.json"),
+                           ("Binary files", "*.kbr"), ("All files", "*.*")]
             )
             
             if not filename:
                 return
                 
-            with open(filename, 'r', encoding='utf-8') as f:
-                events_data = json.load(f)
+            # 根据文件头自动识别JSON或二进制格式，按列存进EventStore
+            self.recorded_events = load_store(filename)
             
-            # 转换回keyboard事件对象
-            self.recorded_events = []
-            for event_data in events_data:
-                # # 创建类似keyboard事件的对象
-                # class SimpleEvent:
-                #     pass
-                # event = SimpleEvent()
-                # event.name = event_data['name']
-                # event.event_type = event_data['event_type']
-                # event.scan_code = event_data['scan_code']
-                # event.time = event_data['time']
-
-                # 直接创建keyboard.KeyboardEvent对象就行了，不用自己造个类SimpleEvent
-                event = keyboard.KeyboardEvent(name = event_data['name'],
-                                               event_type = event_data['event_type'],
-                                               scan_code = event_data['scan_code'],
-                                               time = event_data['time'])
-                self.recorded_events.append(event)
-            
-            print("recorded_events:(after loading)")
-            print("--------------------")
-            print(self.recorded_events)
-            print("--------------------")
+            logger.debug("recorded_events (after loading): %r", self.recorded_events)
 
 
-            self.status_label.config(text=f"已加载记录: {os.path.basename(filename)}")
-            self.update_info(f"\n已从文件加载记录: {filename}")
-            self.update_info(f"\n加载了 {len(self.recorded_events)} 个按键事件")
+            self._on_recording_loaded(filename)
             
             messagebox.showinfo("成功", f"记录加载成功！\n共加载 {len(self.recorded_events)} 个按键事件")
             
         except Exception as e:
+            logger.exception("加载记录出错")
             messagebox.showerror("加载错误", f"加载记录时发生错误:\n{e}")
     
+    def _on_recording_loaded(self, filename):
+        """加载记录后更新界面和统计"""
+        self.status_label.config(text=f"已加载记录: {os.path.basename(filename)}")
+        self.update_info(f"\n已从文件加载记录: {filename}")
+        self.update_info(f"\n加载了 {len(self.recorded_events)} 个按键事件")
+        self.analytics = RecordingAnalytics.from_store(self.recorded_events)
+        self.record_stats.config(text=self.analytics.summary_line())
+        self.update_info(self.analytics.report())
+        # 记录里保存了时序配置时，回放速度用记录里的
+        timing = self.recorded_events.meta.get("timing")
+        if timing:
+            self.replay_speed.set(str(TimingProfile.from_dict(timing).scale))
+    
+    def _current_timing_profile(self):
+        """当前记录的时序配置，速度取界面上的回放速度，并保存回记录的附加信息里"""
+        profile = TimingProfile.from_dict(self.recorded_events.meta.get("timing"))
+        profile.scale = float(self.replay_speed.get())
+        if profile.scale <= 0:
+            raise ValueError("回放速度必须大于0")
+        self.recorded_events.meta["timing"] = profile.to_dict()
+        return profile
+    
+    def edit_timing_profile(self):
+        """编辑当前记录的时序配置：最大间隔和各类按键之后的最小延迟，随记录一起保存"""
+        logger.debug("edit_timing_profile called")
+        profile = TimingProfile.from_dict(self.recorded_events.meta.get("timing"))
+        
+        window = tk.Toplevel(self.root)
+        window.title("时序配置")
+        frame = ttk.Frame(window, padding="10")
+        frame.grid(row=0, column=0)
+        
+        ttk.Label(frame, text="回放按记录下来的间隔进行，间隔除以回放速度；\n"
+                              "超过最大间隔的空闲会被截短，每类按键之后至少等待对应的最小延迟。").grid(
+            row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 10))
+        ttk.Label(frame, text="最大间隔(毫秒):").grid(row=1, column=0, sticky=tk.W)
+        max_gap = tk.StringVar(value=f"{profile.max_gap * 1000:g}")
+        ttk.Entry(frame, textvariable=max_gap, width=8).grid(row=1, column=1, sticky=tk.W)
+        ttk.Label(frame, text="回放前等待(秒):").grid(row=2, column=0, sticky=tk.W)
+        lead_in = tk.StringVar(value=f"{profile.lead_in:g}")
+        ttk.Entry(frame, textvariable=lead_in, width=8).grid(row=2, column=1, sticky=tk.W)
+        ttk.Label(frame, text="每轮之间等待(秒):").grid(row=3, column=0, sticky=tk.W)
+        iteration_gap = tk.StringVar(value=f"{profile.iteration_gap:g}")
+        ttk.Entry(frame, textvariable=iteration_gap, width=8).grid(row=3, column=1, sticky=tk.W)
+        
+        min_delays = {}
+        for row, key_class in enumerate(KEY_CLASSES, start=4):
+            ttk.Label(frame, text=f"{KEY_CLASS_LABELS[key_class]}之后最小延迟(毫秒):").grid(row=row, column=0, sticky=tk.W)
+            min_delays[key_class] = tk.StringVar(value=f"{profile.min_delays[key_class] * 1000:g}")
+            ttk.Entry(frame, textvariable=min_delays[key_class], width=8).grid(row=row, column=1, sticky=tk.W)
+        
+        def apply():
+            try:
+                new_profile = TimingProfile(
+                    scale=profile.scale,
+                    max_gap=float(max_gap.get()) / 1000,
+                    min_delays={c: float(v.get()) / 1000 for c, v in min_delays.items()},
+                    lead_in=float(lead_in.get()),
+                    iteration_gap=float(iteration_gap.get()))
+                if any(delay < 0 for delay in new_profile.min_delays.values()):
+                    raise ValueError("最小延迟不能小于0")
+            except ValueError as e:
+                messagebox.showerror("错误", f"{e}", parent=window)
+                return
+            self.recorded_events.meta["timing"] = new_profile.to_dict()
+            self.update_info("\n时序配置已更新，保存记录时会一起保存")
+            window.destroy()
+        
+        ttk.Button(frame, text="确定", command=apply).grid(
+            row=len(KEY_CLASSES) + 4, column=0, columnspan=2, pady=(10, 0))
+    
+    def _read_clipboard(self):
+        """在回放线程里读取剪贴板：交给Tk主线程去读，最多等1秒"""
+        result = {}
+        done = threading.Event()
+        
+        def read():
+            try:
+                result["text"] = self.root.clipboard_get()
+            except tk.TclError:
+                # 剪贴板为空或不是文本
+                result["text"] = ""
+            done.set()
+        
+        self.root.after(0, read)
+        done.wait(1.0)
+        return result.get("text")
+    
+    def add_sync_point(self):
+        """在记录里插入同步点：回放到这里暂停，等条件成立再继续"""
+        logger.debug("add_sync_point called")
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("插入同步点")
+        frame = ttk.Frame(window, padding="10")
+        frame.grid(row=0, column=0)
+        
+        labels = [SYNC_KIND_LABELS[kind] for kind in STANDALONE_SYNC_KINDS]
+        ttk.Label(frame, text="等待条件:").grid(row=0, column=0, sticky=tk.W)
+        kind = tk.StringVar(value=labels[0])
+        ttk.Combobox(frame, textvariable=kind, values=labels, state="readonly", width=14).grid(row=0, column=1, sticky=tk.W)
+        ttk.Label(frame, text="标记文件路径:").grid(row=1, column=0, sticky=tk.W)
+        arg = tk.StringVar()
+        ttk.Entry(frame, textvariable=arg, width=30).grid(row=1, column=1, sticky=tk.W)
+        ttk.Label(frame, text="超时(秒):").grid(row=2, column=0, sticky=tk.W)
+        timeout = tk.StringVar(value="30")
+        ttk.Entry(frame, textvariable=timeout, width=8).grid(row=2, column=1, sticky=tk.W)
+        ttk.Label(frame, text="检查间隔(毫秒):").grid(row=3, column=0, sticky=tk.W)
+        poll = tk.StringVar(value="50")
+        ttk.Entry(frame, textvariable=poll, width=8).grid(row=3, column=1, sticky=tk.W)
+        ttk.Label(frame, text="插入位置(事件序号):").grid(row=4, column=0, sticky=tk.W)
+        position = tk.StringVar(value=str(len(self.recorded_events)))
+        ttk.Entry(frame, textvariable=position, width=8).grid(row=4, column=1, sticky=tk.W)
+        keep_going = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="超时后继续回放", variable=keep_going).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+        
+        def apply():
+            try:
+                point = SyncPoint(STANDALONE_SYNC_KINDS[labels.index(kind.get())], arg.get().strip(),
+                                  timeout=float(timeout.get()), poll=float(poll.get()) / 1000,
+                                  on_timeout="continue" if keep_going.get() else "fail")
+                index = int(position.get())
+                insert_sync_point(self.recorded_events, index, point)
+            except (ValueError, IndexError) as e:
+                messagebox.showerror("错误", f"无法插入同步点: {e}", parent=window)
+                return
+            self.update_info(f"\n已在第 {index} 个事件处插入同步点: {point.describe()}")
+            window.destroy()
+        
+        ttk.Button(frame, text="插入", command=apply).grid(row=6, column=0, columnspan=2, pady=(10, 0))
+    
+    def open_library(self):
+        """打开宏库窗口：搜索、按标签筛选、加载记录"""
+        logger.debug("open_library called")
+        try:
+            if self.library is None:
+                self.library = MacroLibrary()
+            self.library.scan()
+        except Exception as e:
+            logger.exception("打开宏库出错")
+            messagebox.showerror("宏库错误", f"打开宏库时发生错误:\n{e}")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("宏库")
+        window.geometry("600x400")
+        
+        search_frame = ttk.Frame(window, padding="10")
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="搜索:").pack(side=tk.LEFT, padx=(0, 5))
+        search_text = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=search_text, width=20).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(search_frame, text="标签:").pack(side=tk.LEFT, padx=(0, 5))
+        search_tag = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=search_tag, width=10).pack(side=tk.LEFT)
+        
+        columns = ("name", "events", "duration", "tags")
+        tree = ttk.Treeview(window, columns=columns, show="headings", selectmode="browse")
+        for column, heading, width in zip(columns, ("名称", "事件数", "时长(秒)", "标签"), (240, 70, 80, 150)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        def refresh(*_):
+            tree.delete(*tree.get_children())
+            for row in self.library.search(search_text.get().strip(), search_tag.get().strip()):
+                tree.insert("", tk.END, iid=row["path"],
+                            values=(row["name"], row["event_count"], f"{row['duration']:.1f}", row["tags"]))
+        
+        def rescan():
+            self.library.scan()
+            refresh()
+        
+        def load_selected(*_):
+            selection = tree.selection()
+            if selection:
+                self.load_from_library(selection[0])
+        
+        def edit_tags():
+            selection = tree.selection()
+            if not selection:
+                return
+            row = self.library.get(selection[0])
+            tags = simpledialog.askstring("设置标签", "标签（用逗号分隔）:",
+                                          initialvalue=row["tags"], parent=window)
+            if tags is not None:
+                self.library.set_tags(selection[0], tags.split(","))
+                refresh()
+        
+        search_text.trace_add("write", refresh)
+        search_tag.trace_add("write", refresh)
+        tree.bind("<Double-1>", load_selected)
+        
+        button_frame = ttk.Frame(window, padding="10")
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="加载", command=load_selected).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="设置标签", command=edit_tags).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="重新扫描", command=rescan).pack(side=tk.LEFT)
+        refresh()
+    
+    def load_from_library(self, path):
+        """从宏库加载记录，最近用过的记录直接从缓存取，不重新解析文件"""
+        logger.debug("load_from_library called")
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+        try:
+            self.recorded_events = self.library.load(path)
+        except Exception as e:
+            logger.exception("加载记录出错")
+            messagebox.showerror("加载错误", f"加载记录时发生错误:\n{e}")
+            return
+        self._on_recording_loaded(path)
+    
+    @traced()
+    def optimize_recording(self):
+        """优化当前记录：去掉自动重复、无效的修饰键、不配对的按下抬起，合并连续输入的文字"""
+        logger.debug("optimize_recording called")
+        if not self.recorded_events:
+            messagebox.showwarning("警告", "没有可优化的记录")
+            return
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止记录和回放")
+            return
+        try:
+            profile = self._current_timing_profile()
+        except ValueError as e:
+            messagebox.showerror("错误", f"{e}")
+            return
+        self.recorded_events, report = optimize(self.recorded_events, profile)
+        self.status_label.config(text=f"优化完成，减少 {report.events_saved} 个事件")
+        self.update_info(report.describe())
+    
+    @traced()
     def clear_recording(self):
         """清空记录"""
-        print("clear_recording called")
+        logger.debug("clear_recording called")
         if self.recorded_events and not self.is_recording and not self.is_playing:
-            self.recorded_events = []
-            self.info_text.delete(1.0, tk.END)
+            self.recorded_events = EventStore()
+            self.log_pane.clear()
             self.status_label.config(text="记录已清空")
             self.record_status.config(text="状态: 未记录", foreground="red")
         else:
             messagebox.showwarning("警告", "无法清空记录：请先停止记录和回放")
     
     def update_info(self, message):
-        """更新信息文本框"""
-        print("update_info called")
-        self.info_text.insert(tk.END, message)
-        self.info_text.see(tk.END)
-        self.root.update_idletasks()
+        """更新信息文本框，可以在任何线程调用，实际显示由log_pane定时批量刷新"""
+        self.log_pane.write(message)
 
 def main():
-    print("main called")
+    setup_logging(LOG_FILE)
+    logger.debug("main called")
     root = tk.Tk()
     app = KeyboardRecorderApp(root)
     root.mainloop()
-    print("end of main")
+    logger.debug("end of main")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""键名相关的常量和小工具，统计、优化、时序配置共用"""
+
+# keyboard 模块报告的修饰键名，左右键统一归到同一个名字
+_MODIFIER_ALIASES = {
+    'ctrl': 'ctrl', 'left ctrl': 'ctrl', 'right ctrl': 'ctrl',
+    'shift': 'shift', 'left shift': 'shift', 'right shift': 'shift',
+    'alt': 'alt', 'left alt': 'alt', 'right alt': 'alt', 'alt gr': 'alt',
+    'windows': 'windows', 'left windows': 'windows', 'right windows': 'windows',
+    'command': 'windows', 'left command': 'windows', 'right command': 'windows',
+    'option': 'alt', 'left option': 'alt', 'right option': 'alt',
+}
+
+# 组合键里修饰键的书写顺序
+_MODIFIER_ORDER = ('ctrl', 'alt', 'shift', 'windows')
+
+
+def is_modifier(name):
+    return name in _MODIFIER_ALIASES
+
+
+def key_id(name, scan_code):
+    """配对按下和抬起用的键标识：有扫描码时用扫描码，否则用键名
+
+    键名会随 shift 变化，按住 shift 按下时是 'A'，先松开 shift 再松开时是 'a'，不能用来配对。
+    """
+    return scan_code if scan_code is not None else name
+
+
+def normalize_modifier(name):
+    """left ctrl -> ctrl，非修饰键返回 None"""
+    return _MODIFIER_ALIASES.get(name)
+
+
+def chord_name(modifiers, name):
+    """把按住的修饰键集合和主键拼成 ctrl+c 这样的名字"""
+    parts = [m for m in _MODIFIER_ORDER if m in modifiers]
+    parts.append(name)
+    return '+'.join(parts)
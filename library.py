@@ -0,0 +1,138 @@
+"""宏库：用 SQLite 给目录里的记录文件建索引，按需加载并缓存记录内容"""
+import glob
+import os
+import sqlite3
+from collections import OrderedDict
+
+from recording_format import load_store
+
+# 保存记录时文件名的前缀，显示名称时去掉
+RECORD_PREFIX = "keyboard_record_"
+RECORD_PATTERNS = ("*.json", "*.kbr")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '',
+    event_count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    keys TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_name ON recordings (name);
+"""
+
+
+class MacroLibrary:
+    """记录目录的索引
+
+    索引里有名称、标签、事件数、时长、用到的键和校验和，搜索只查数据库；
+    记录内容只在 load 时才读取，最近用过的记录按总事件数有上限地缓存在内存里。
+    """
+
+    def __init__(self, directory=".", db_path="keyboard_library.db", max_cached_events=1000000):
+        self.directory = directory
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+        self.max_cached_events = max_cached_events
+        self._cache = OrderedDict()
+        self._cached_events = 0
+
+    def close(self):
+        self.conn.close()
+
+    def scan(self):
+        """重新扫描目录：新文件和改过的文件重建索引，删掉的文件移出索引
+
+        返回 (新增或更新数, 删除数, 读取失败的文件列表)。
+        """
+        paths = set()
+        for pattern in RECORD_PATTERNS:
+            paths.update(os.path.abspath(p) for p in glob.glob(os.path.join(self.directory, pattern)))
+        known = {row['path']: (row['mtime'], row['size'])
+                 for row in self.conn.execute("SELECT path, mtime, size FROM recordings")}
+        updated = 0
+        failed = []
+        with self.conn:
+            for path in sorted(paths):
+                stat = os.stat(path)
+                if known.get(path) == (stat.st_mtime, stat.st_size):
+                    continue
+                try:
+                    store = load_store(path)
+                except Exception:
+                    # 目录里不是记录的 JSON 文件直接跳过
+                    failed.append(path)
+                    continue
+                self._index(path, stat, store)
+                updated += 1
+            removed = [path for path in known if path not in paths]
+            self.conn.executemany("DELETE FROM recordings WHERE path = ?",
+                                  [(path,) for path in removed])
+        return updated, len(removed), failed
+
+    def _index(self, path, stat, store):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name.startswith(RECORD_PREFIX):
+            name = name[len(RECORD_PREFIX):]
+        keys = ' '.join(sorted(n for n in store.key_counts() if n is not None))
+        self.conn.execute(
+            "INSERT INTO recordings (path, name, event_count, duration, keys, checksum, mtime, size)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(path) DO UPDATE SET name = excluded.name,"
+            " event_count = excluded.event_count, duration = excluded.duration,"
+            " keys = excluded.keys, checksum = excluded.checksum,"
+            " mtime = excluded.mtime, size = excluded.size",
+            (path, name, len(store), store.duration(), keys, store.checksum(),
+             stat.st_mtime, stat.st_size))
+
+    def search(self, text="", tag=None, limit=500):
+        """按名称、标签或用到的键模糊搜索，tag 指定时只返回带这个标签的记录"""
+        sql = "SELECT * FROM recordings WHERE 1 = 1"
+        params = []
+        if text:
+            like = f"%{text}%"
+            sql += " AND (name LIKE ? OR tags LIKE ? OR keys LIKE ?)"
+            params += [like, like, like]
+        if tag:
+            sql += " AND (',' || tags || ',') LIKE ?"
+            params.append(f"%,{tag},%")
+        sql += " ORDER BY name LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def get(self, path):
+        return self.conn.execute("SELECT * FROM recordings WHERE path = ?", (path,)).fetchone()
+
+    def set_tags(self, path, tags):
+        """设置标签，tags 是字符串列表"""
+        cleaned = ','.join(t.strip() for t in tags if t.strip())
+        with self.conn:
+            self.conn.execute("UPDATE recordings SET tags = ? WHERE path = ?", (cleaned, path))
+
+    def load(self, path):
+        """读取记录内容，最近用过且文件没改过的直接从缓存复制
+
+        返回的总是一份副本，调用方修改它（编辑、优化、录制追加）不会弄脏缓存。
+        """
+        mtime = os.stat(path).st_mtime
+        entry = self._cache.get(path)
+        if entry is not None and entry[0] == mtime:
+            self._cache.move_to_end(path)
+            return entry[1].copy()
+        if entry is not None:
+            self._evict(path)
+        store = load_store(path)
+        self._cache[path] = (mtime, store)
+        self._cached_events += len(store)
+        while self._cached_events > self.max_cached_events and len(self._cache) > 1:
+            self._evict(next(iter(self._cache)))
+        return store.copy()
+
+    def _evict(self, path):
+        _, store = self._cache.pop(path)
+        self._cached_events -= len(store)
@@ -0,0 +1,62 @@
+"""有上限的日志面板：任何线程都可以写，Tk 线程定时批量刷新"""
+import tkinter as tk
+from collections import deque
+
+from tracing import traced
+
+
+class LogPane:
+    """包装一个 Text/ScrolledText 控件
+
+    write 只把消息追加到 deque（append/popleft 本身是线程安全的，不需要加锁），
+    Tk 线程每 interval 毫秒把攒下的消息合并成一次 insert，
+    文本超过 max_lines 行就删掉最早的行，待刷新的消息最多保留 max_pending 条。
+    """
+
+    def __init__(self, root, text, interval=100, max_lines=2000, max_pending=10000):
+        self.root = root
+        self.text = text
+        self.interval = interval
+        self.max_lines = max_lines
+        self._pending = deque(maxlen=max_pending)
+        self._after_id = None
+
+    def start(self):
+        """开始定时刷新"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def write(self, message):
+        """追加一条消息，可以在任何线程调用"""
+        self._pending.append(message)
+
+    def clear(self):
+        self._pending.clear()
+        self.text.delete(1.0, tk.END)
+
+    @traced('LogPane._drain')
+    def _drain(self):
+        pending = self._pending
+        chunks = []
+        try:
+            while True:
+                chunks.append(pending.popleft())
+        except IndexError:
+            pass
+        if chunks:
+            self.text.insert(tk.END, ''.join(chunks))
+            self._trim()
+            self.text.see(tk.END)
+        self._after_id = self.root.after(self.interval, self._drain)
+
+    def _trim(self):
+        """只保留最后 max_lines 行"""
+        line_count = int(self.text.index('end-1c').split('.')[0])
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.text.delete(1.0, f"{excess + 1}.0")
@@ -0,0 +1,157 @@
+"""记录优化：去掉回放时没有用的事件，让回放更短、更不容易丢键"""
+from event_store import EventStore
+from keynames import key_id, normalize_modifier
+from timeline import compile_timeline
+
+# 单独按一下再松开没有任何效果的修饰键。
+# alt 和 windows 单独按一下会激活菜单栏、打开开始菜单，不能当成无效操作去掉
+NOOP_TOGGLE_MODIFIERS = ('ctrl', 'shift')
+
+# 可以合并成文本直接输入的非单字符键
+_TEXT_KEYS = {'space': ' '}
+
+
+class OptimizeReport:
+    """优化结果统计"""
+
+    def __init__(self):
+        self.events_before = 0
+        self.events_after = 0
+        self.repeats_collapsed = 0
+        self.toggles_dropped = 0
+        self.unmatched_ups_dropped = 0
+        self.ups_added = 0
+        self.text_runs = 0
+        self.seconds_before = 0.0
+        self.seconds_after = 0.0
+
+    @property
+    def events_saved(self):
+        return self.events_before - self.events_after
+
+    @property
+    def seconds_saved(self):
+        return self.seconds_before - self.seconds_after
+
+    def describe(self):
+        return (f"\n优化完成: {self.events_before} -> {self.events_after} 个事件"
+                f"（减少 {self.events_saved} 个），回放时间缩短 {self.seconds_saved:.1f} 秒"
+                f"\n  合并自动重复按下: {self.repeats_collapsed}"
+                f"\n  去掉单独按一下的修饰键: {self.toggles_dropped} 次"
+                f"\n  去掉没有对应按下的抬起: {self.unmatched_ups_dropped}"
+                f"\n  补上缺少的抬起: {self.ups_added}"
+                f"\n  合并成文本输入: {self.text_runs} 段")
+
+
+def optimize(store, profile=None, merge_text=True, min_text_length=2):
+    """返回 (优化后的新 EventStore, OptimizeReport)，原记录不变
+
+    依次做：合并自动重复的按下、配平按下和抬起、去掉单独按一下的 ctrl/shift、
+    把没有按住修饰键时连续输入的字符合并成一段文本。
+    """
+    report = OptimizeReport()
+    report.events_before = len(store)
+    records = _balance(list(store.iter_records()), report)
+    records = _drop_noop_toggles(records, report)
+    if merge_text:
+        records = _merge_text(records, report, min_text_length)
+    optimized = EventStore.from_records(records)
+    optimized.meta = dict(store.meta)
+    report.events_after = len(optimized)
+    report.seconds_before = compile_timeline(store, profile).duration
+    report.seconds_after = compile_timeline(optimized, profile).duration
+    return optimized, report
+
+
+def _balance(records, report):
+    """去掉自动重复的按下和没有对应按下的抬起，最后补上还按着的键的抬起"""
+    result = []
+    held = {}
+    for record in records:
+        name, event_type, scan_code, t = record
+        key = key_id(name, scan_code)
+        if event_type == 'down':
+            if key in held:
+                report.repeats_collapsed += 1
+                continue
+            held[key] = record
+        elif event_type == 'up':
+            if key not in held:
+                report.unmatched_ups_dropped += 1
+                continue
+            del held[key]
+        result.append(record)
+    end_time = result[-1][3] if result else 0.0
+    for name, _event_type, scan_code, _t in held.values():
+        result.append((name, 'up', scan_code, end_time))
+        report.ups_added += 1
+    return result
+
+
+def _drop_noop_toggles(records, report):
+    """去掉紧挨着的 ctrl/shift 按下+抬起"""
+    result = []
+    i = 0
+    n = len(records)
+    while i < n:
+        name, event_type, scan_code, _t = records[i]
+        if (event_type == 'down' and i + 1 < n
+                and normalize_modifier(name) in NOOP_TOGGLE_MODIFIERS
+                and records[i + 1][1] == 'up'
+                and key_id(records[i + 1][0], records[i + 1][2]) == key_id(name, scan_code)):
+            report.toggles_dropped += 1
+            i += 2
+            continue
+        result.append(records[i])
+        i += 1
+    return result
+
+
+def _text_char(name):
+    """能直接当文本输入的键返回对应字符，否则返回 None"""
+    if name is None:
+        return None
+    if len(name) == 1 and name.isprintable():
+        return name
+    return _TEXT_KEYS.get(name)
+
+
+def _merge_text(records, report, min_text_length):
+    """没有按住任何键时紧挨着的单字符按下+抬起，合并成一个文本事件"""
+    result = []
+    run = []
+    run_start = 0
+    held = 0
+
+    def flush():
+        if len(run) >= min_text_length:
+            result.append((''.join(run), 'text', None, records[run_start][3]))
+            report.text_runs += 1
+        else:
+            result.extend(records[run_start:run_start + 2 * len(run)])
+        run.clear()
+
+    i = 0
+    n = len(records)
+    while i < n:
+        name, event_type, scan_code, _t = records[i]
+        character = _text_char(name)
+        if (held == 0 and event_type == 'down' and character is not None and i + 1 < n
+                and records[i + 1][1] == 'up'
+                and key_id(records[i + 1][0], records[i + 1][2]) == key_id(name, scan_code)):
+            if not run:
+                run_start = i
+            run.append(character)
+            i += 2
+            continue
+        if run:
+            flush()
+        if event_type == 'down':
+            held += 1
+        elif event_type == 'up':
+            held -= 1
+        result.append(records[i])
+        i += 1
+    if run:
+        flush()
+    return result
@@ -0,0 +1,330 @@
+"""回放引擎：按 perf_counter 计划每个事件的发送时间，和 Tk 界面解耦"""
+import threading
+import time
+
+from event_store import UP, DOWN, TEXT, SYNC
+from sync import SyncContext, SyncTimeout
+from tracing import tracer as default_tracer
+
+
+class OutputBackend:
+    """输出后端接口，回放引擎只通过它发送按键"""
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+    def write(self, text):
+        """输入一段文本，默认逐个字符按下抬起"""
+        for character in text:
+            self.press(character)
+            self.release(character)
+
+    def stash_state(self):
+        """回放前记下当前按住的键，默认什么都不做"""
+        return None
+
+    def restore_modifiers(self, state):
+        """回放后恢复回放前按住的修饰键"""
+        pass
+
+
+class KeyboardBackend(OutputBackend):
+    """真实的 keyboard 模块，首次使用时才导入，方便在无界面的机器上导入本模块"""
+
+    def __init__(self):
+        self._keyboard = None
+
+    @property
+    def keyboard(self):
+        if self._keyboard is None:
+            import keyboard
+            self._keyboard = keyboard
+        return self._keyboard
+
+    def press(self, key):
+        self.keyboard.press(key)
+
+    def release(self, key):
+        self.keyboard.release(key)
+
+    def write(self, text):
+        self.keyboard.write(text, delay=0)
+
+    def stash_state(self):
+        return self.keyboard.stash_state()
+
+    def restore_modifiers(self, state):
+        self.keyboard.restore_modifiers(state)
+
+
+class FakeBackend(OutputBackend):
+    """内存里的假后端，只记录发送了什么、什么时候发送的，用于测试"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.sent = []
+
+    def press(self, key):
+        self.sent.append((self.clock(), 'down', key))
+
+    def release(self, key):
+        self.sent.append((self.clock(), 'up', key))
+
+    def write(self, text):
+        self.sent.append((self.clock(), 'text', text))
+
+
+def held_before(ops, keys, index):
+    """回放到第 index 个事件之前按下、还没抬起的键，按按下的顺序"""
+    held = {}
+    for i in range(index):
+        if ops[i] == DOWN:
+            held[keys[i]] = None
+        elif ops[i] == UP:
+            held.pop(keys[i], None)
+    return list(held)
+
+
+class PlaybackProgress:
+    """回放进度，回放线程只做属性赋值，界面线程定时读取，不需要每个事件回调一次"""
+
+    def __init__(self, iterations=1):
+        self.iterations = iterations
+        self.iteration = 0
+        self.index = 0
+        self.total = 0
+        self.start_time = None
+        self.clock = time.perf_counter
+
+    def begin(self):
+        self.start_time = self.clock()
+
+    def position(self):
+        """返回一致的 (第几轮, 下一个事件序号)，用来写断点
+
+        回放线程换轮时先设置 index 再设置 iteration，这里前后各读一次 iteration，
+        读的过程中换了轮就重读。
+        """
+        while True:
+            iteration = self.iteration
+            index = self.index
+            if self.iteration == iteration:
+                return iteration, index
+
+    def snapshot(self):
+        """返回 (第几轮, 事件序号, 事件总数, 总体百分比, 预计剩余秒数)"""
+        iteration, index, total = self.iteration, self.index, self.total
+        done = max(iteration - 1, 0) * total + index
+        whole = self.iterations * total
+        percent = 100.0 * done / whole if whole else 0.0
+        eta = None
+        if done and self.start_time is not None:
+            elapsed = self.clock() - self.start_time
+            eta = elapsed / done * (whole - done)
+        return iteration, index, total, percent, eta
+
+
+class PlaybackEngine:
+    """高精度回放引擎
+
+    先用 sleep 粗睡到截止时间前 spin 秒，再忙等到截止时间，
+    所有事件都按回放开始时刻加偏移量来计划，误差不会随事件数累积。
+    粗睡按 max_slice 分段，每段之间和每个事件之前都检查取消标志，
+    所以从取消到停止最多大约 max_slice + spin 秒。
+    暂停时抬起回放按着的键，恢复时按原来的顺序重新按下，后面的事件整体顺延暂停的时长。
+    """
+
+    def __init__(self, backend=None, spin=0.002, max_slice=0.005,
+                 clock=time.perf_counter, sleep=time.sleep, sync_context=None, tracer=None):
+        self.backend = backend if backend is not None else KeyboardBackend()
+        # 同步点用到的剪贴板、回调、信号
+        self.sync_context = sync_context if sync_context is not None else SyncContext()
+        # 跟踪打开时记录每个事件的迟到时间，默认用 tracing 模块的全局跟踪器
+        self.tracer = tracer if tracer is not None else default_tracer
+        self.spin = spin
+        self.max_slice = max_slice
+        self.clock = clock
+        self.sleep = sleep
+        # 最近一次回放每个事件的迟到时间（实际发送时刻 - 计划时刻）的最大值
+        self.max_lateness = 0.0
+        # 最近一次回放偏移量 0 对应的时刻，没有暂停和同步点时每个事件的计划时刻是它加上偏移量
+        self.scheduled_start = None
+        # 被清除时回放暂停，见 pause/resume
+        self._running = threading.Event()
+        self._running.set()
+
+    def pause(self):
+        """暂停回放，可以在任何线程调用，在下一个事件之前生效"""
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def play_timeline(self, timeline, cancel=None, progress=None, start_index=0):
+        """回放预先编译好的时间线（见 timeline.compile_timeline）
+
+        cancel 是 threading.Event，被设置后尽快停止并抬起所有还按着的键；
+        progress 是 PlaybackProgress，回放过程中更新其中的事件序号；
+        start_index 大于 0 时从这个事件继续，先按下在它之前按下、还没抬起的键。
+        完整回放返回 True，被取消返回 False。
+        """
+        return self._run(timeline.offsets, timeline.ops, timeline.keys, cancel, progress,
+                         start_index)
+
+    def wait(self, seconds, cancel=None):
+        """等待 seconds 秒，暂停的时间不算在内，期间被取消返回 False"""
+        return self._wait(self.clock() + seconds, cancel, {}) is not None
+
+    def _run(self, offsets, ops, keys, cancel=None, progress=None, start_index=0):
+        """按偏移量（秒，相对回放开始时刻）发送事件"""
+        backend = self.backend
+        clock = self.clock
+        tracer = self.tracer
+        # 跟踪关闭时循环里只多一次局部变量判断
+        tracing = tracer.enabled
+        max_lateness = 0.0
+        # 已按下还没抬起的键，中途停止时要抬起，否则目标窗口会以为键一直按着；
+        # 用 dict 保留按下的顺序，暂停后恢复时按原来的顺序重新按下
+        held = {}
+        if progress is not None:
+            progress.total = len(offsets)
+            progress.index = start_index
+
+        # 每次回放开始时为同步点创建条件，记下剪贴板等的初始状态
+        sync_points = {}
+        if SYNC in ops:
+            sync_points = self.sync_context.prepare(
+                key for op, key in zip(ops, keys) if op == SYNC)
+
+        state = backend.stash_state()
+        run_start = clock()
+        try:
+            for key in held_before(ops, keys, start_index):
+                backend.press(key)
+                held[key] = None
+            start = run_start - (offsets[start_index] if start_index < len(offsets) else 0.0)
+            self.scheduled_start = start
+            for index in range(start_index, len(offsets)):
+                offset = offsets[index]
+                op = ops[index]
+                key = keys[index]
+                deadline = start + offset
+                paused = self._wait(deadline, cancel, held)
+                if paused is None:
+                    return False
+                if paused:
+                    start += paused
+                    deadline += paused
+                if op == DOWN:
+                    backend.press(key)
+                    held[key] = None
+                elif op == UP:
+                    backend.release(key)
+                    held.pop(key, None)
+                elif op == SYNC:
+                    point, predicate = sync_points[key]
+                    sync_start = clock()
+                    if not self._wait_sync(point, predicate, cancel, held):
+                        return False
+                    if tracing:
+                        tracer.complete('sync', sync_start, clock(), 'playback',
+                                        {'point': point.describe()})
+                    # 后面的事件从同步点实际结束的时刻重新计时
+                    start = clock() - offset
+                    deadline = clock()
+                elif op == TEXT:
+                    backend.write(key)
+                else:
+                    # 模板槽位要先用 template.MacroTemplate.fill 填上数据
+                    raise ValueError(f"模板槽位 {key} 没有填值")
+                sent = clock()
+                lateness = sent - deadline
+                if lateness > max_lateness:
+                    max_lateness = lateness
+                if tracing:
+                    tracer.playback_event(index, key, deadline, sent)
+                if progress is not None:
+                    progress.index = index + 1
+            return True
+        finally:
+            for key in held:
+                backend.release(key)
+            backend.restore_modifiers(state)
+            self.max_lateness = max_lateness
+            if tracing:
+                tracer.complete('playback', run_start, clock(), 'playback',
+                                {'events': len(offsets), 'max_late_ms': round(max_lateness * 1000, 3)})
+
+    def _wait(self, deadline, cancel, held):
+        """等到 deadline；中途暂停时抬起 held 里的键，恢复后重新按下
+
+        返回暂停了多少秒（deadline 要顺延这么多），被取消返回 None。
+        """
+        paused_total = 0.0
+        while not self._wait_until(deadline + paused_total, cancel):
+            if cancel is not None and cancel.is_set():
+                return None
+            paused = self._hold_pause(held, cancel)
+            if paused is None:
+                return None
+            paused_total += paused
+        return paused_total
+
+    def _hold_pause(self, held, cancel):
+        """暂停中：抬起按着的键，等到恢复或取消；返回暂停的秒数，被取消返回 None"""
+        backend = self.backend
+        pause_start = self.clock()
+        for key in reversed(list(held)):
+            backend.release(key)
+        while not self._running.wait(self.max_slice):
+            if cancel is not None and cancel.is_set():
+                # 键已经抬起了，不用在 finally 里再抬起一次
+                held.clear()
+                return None
+        for key in held:
+            backend.press(key)
+        if self.tracer.enabled:
+            self.tracer.complete('pause', pause_start, self.clock(), 'playback')
+        return self.clock() - pause_start
+
+    def _wait_sync(self, point, predicate, cancel=None, held=None):
+        """等待同步条件成立；被取消返回 False，超时按 point.on_timeout 处理，暂停的时间不算超时"""
+        clock = self.clock
+        give_up = clock() + point.timeout
+        while not predicate.check():
+            now = clock()
+            if now >= give_up:
+                if point.on_timeout == 'continue':
+                    break
+                raise SyncTimeout(f"同步点等待超时: {point.describe()}")
+            paused = self._wait(min(now + point.poll, give_up), cancel, held if held is not None else {})
+            if paused is None:
+                return False
+            give_up += paused
+        # 同一个同步条件后面可能还会用到，重新记下当前状态
+        predicate.arm()
+        return True
+
+    def _wait_until(self, deadline, cancel=None):
+        """分段粗睡 + 忙等，直到 deadline；等待期间被取消或暂停返回 False"""
+        clock = self.clock
+        running = self._running
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            if not running.is_set():
+                return False
+            remaining = deadline - clock() - self.spin
+            if remaining <= 0:
+                break
+            self.sleep(min(remaining, self.max_slice))
+        while clock() < deadline:
+            pass
+        return True
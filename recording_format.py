@@ -0,0 +1,268 @@
+"""记录文件格式：原来的 JSON 格式和紧凑的二进制格式（.kbr）
+
+两种格式之间的转换是无损的。记录读进 EventStore，也可以按
+(name, event_type, scan_code, time) 元组逐个读写，都不依赖 keyboard 模块。
+
+.kbr 文件结构（小端）：
+    文件头   magic 'KBRF'、版本、标志、事件数、键名数、基准时间、元数据长度
+    元数据   UTF-8 JSON，比如时序配置
+    键名表   每个键名：u32 长度 + UTF-8 字节
+    事件记录 每条 16 字节定长：u16 扫描码、u16 事件类型、u32 键名序号、f64 相对基准时间的偏移
+
+优化后的记录把每段文本都存成一个键名，键名种类可能有几万个，所以键名序号和长度都是 32 位。
+"""
+import json
+import mmap
+import struct
+
+from event_store import EventStore, EVENT_TYPES, NO_SCAN_CODE
+
+KBR_MAGIC = b'KBRF'
+KBR_VERSION = 1
+
+_HEADER = struct.Struct('<4sHHIIdI')
+_NAME_LEN = struct.Struct('<I')
+_RECORD = struct.Struct('<HHId')
+
+# 键名或扫描码为 None 时使用的占位值
+_NO_NAME = 0xFFFFFFFF
+_NO_SCAN_CODE = 0xFFFF
+
+
+class RecordingFormatError(ValueError):
+    """记录文件格式不对或内容超出格式能表示的范围"""
+
+
+def _read_json(path):
+    """读取 JSON 记录文件，返回 (事件列表, 附加信息)
+
+    没有附加信息的记录是一个事件列表，和以前保存的文件一样；
+    有附加信息时是 {"version": 1, "meta": {...}, "events": [...]}。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and isinstance(data.get('events'), list):
+        return data['events'], data.get('meta') or {}
+    if not isinstance(data, list):
+        raise RecordingFormatError("不是键盘记录文件")
+    return data, {}
+
+
+def load_json_records(path):
+    """读取 JSON 记录文件里的事件"""
+    events_data, _ = _read_json(path)
+    return [(d['name'], d['event_type'], d['scan_code'], d['time']) for d in events_data]
+
+
+def save_json_records(path, records, meta=None):
+    """保存为 JSON 记录文件，没有附加信息时格式和以前保存的文件完全一样"""
+    events_data = [{'name': name, 'event_type': event_type, 'scan_code': scan_code, 'time': t}
+                   for name, event_type, scan_code, t in records]
+    data = {'version': 1, 'meta': meta, 'events': events_data} if meta else events_data
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def _base_time(times):
+    """选一个基准时间，保证 base + (t - base) == t，这样存偏移也不会丢精度"""
+    if not times:
+        return 0.0
+    base = times[0]
+    for t in times:
+        if base + (t - base) != t:
+            return 0.0
+    return base
+
+
+def save_kbr_records(path, records, meta=None):
+    """保存为二进制记录文件"""
+    save_kbr_store(path, EventStore.from_records(records), meta)
+
+
+def save_kbr_store(path, store, meta=None):
+    """把 EventStore 保存为二进制记录文件，直接按列写出，meta 默认用 store.meta"""
+    if meta is None:
+        meta = store.meta
+    # EventStore 的键名表里可能有 None，写文件时换成占位值
+    names = []
+    name_map = []
+    for name in store.names:
+        if name is None:
+            name_map.append(_NO_NAME)
+        else:
+            name_map.append(len(names))
+            names.append(name.encode('utf-8'))
+    if len(names) >= _NO_NAME:
+        raise RecordingFormatError("键名种类太多，无法保存为二进制格式")
+
+    body = bytearray(_RECORD.size * len(store))
+    base = _base_time(store.times)
+    for i, (scan_code, type_code, name_id, t) in enumerate(
+            zip(store.scan_codes, store.types, store.name_ids, store.times)):
+        if scan_code == NO_SCAN_CODE:
+            scan_code = _NO_SCAN_CODE
+        elif not 0 <= scan_code < _NO_SCAN_CODE:
+            raise RecordingFormatError(f"扫描码超出范围: {scan_code}")
+        _RECORD.pack_into(body, i * _RECORD.size, scan_code, type_code, name_map[name_id], t - base)
+
+    meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(KBR_MAGIC, KBR_VERSION, 0, len(store), len(names), base,
+                             len(meta_bytes)))
+        f.write(meta_bytes)
+        for encoded in names:
+            f.write(_NAME_LEN.pack(len(encoded)))
+            f.write(encoded)
+        f.write(body)
+
+
+class KbrRecording:
+    """通过 mmap 打开的二进制记录
+
+    打开时只解析文件头和键名表，事件记录留在映射的文件里，
+    访问到某个事件时才解码成元组或 KeyboardEvent。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_header()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _parse_header(self):
+        mm = self._mm
+        if len(mm) < _HEADER.size:
+            raise RecordingFormatError("文件太短，不是有效的 .kbr 记录")
+        magic, version, _flags, count, name_count, base, meta_len = _HEADER.unpack_from(mm, 0)
+        if magic != KBR_MAGIC:
+            raise RecordingFormatError("不是 .kbr 记录文件")
+        if version != KBR_VERSION:
+            raise RecordingFormatError(f"不支持的 .kbr 版本: {version}")
+        pos = _HEADER.size
+        self.meta = json.loads(mm[pos:pos + meta_len].decode('utf-8'))
+        pos += meta_len
+        names = []
+        for _ in range(name_count):
+            (length,) = _NAME_LEN.unpack_from(mm, pos)
+            pos += _NAME_LEN.size
+            if pos + length > len(mm):
+                raise RecordingFormatError("文件不完整，键名表被截断")
+            names.append(mm[pos:pos + length].decode('utf-8'))
+            pos += length
+        if pos + count * _RECORD.size > len(mm):
+            raise RecordingFormatError("文件不完整，事件记录被截断")
+        self.names = names
+        self.base_time = base
+        self._count = count
+        self._records_start = pos
+
+    def __len__(self):
+        return self._count
+
+    def record(self, index):
+        """解码第 index 个事件，返回 (name, event_type, scan_code, time)"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._decode(*_RECORD.unpack_from(self._mm, self._records_start + index * _RECORD.size))
+
+    def _iter_raw(self):
+        end = self._records_start + self._count * _RECORD.size
+        view = memoryview(self._mm)[self._records_start:end]
+        try:
+            yield from _RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def _decode(self, scan_code, type_code, name_id, offset):
+        return (None if name_id == _NO_NAME else self.names[name_id],
+                EVENT_TYPES[type_code],
+                None if scan_code == _NO_SCAN_CODE else scan_code,
+                self.base_time + offset)
+
+    def iter_records(self):
+        """按顺序解码全部事件"""
+        for raw in self._iter_raw():
+            yield self._decode(*raw)
+
+    def to_store(self):
+        """把全部事件直接解码进 EventStore 的各列"""
+        store = EventStore()
+        store.meta = self.meta
+        store.names = list(self.names)
+        store._name_index = {name: i for i, name in enumerate(store.names)}
+        none_id = None
+        base_time = self.base_time
+        for scan_code, type_code, name_id, offset in self._iter_raw():
+            if name_id == _NO_NAME:
+                if none_id is None:
+                    none_id = store._name_id(None)
+                name_id = none_id
+            store.scan_codes.append(NO_SCAN_CODE if scan_code == _NO_SCAN_CODE else scan_code)
+            store.types.append(type_code)
+            store.name_ids.append(name_id)
+            store.times.append(base_time + offset)
+        return store
+
+    def __getitem__(self, index):
+        """按需创建 keyboard.KeyboardEvent"""
+        import keyboard
+        name, event_type, scan_code, t = self.record(index)
+        return keyboard.KeyboardEvent(name=name, event_type=event_type,
+                                      scan_code=scan_code, time=t)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_kbr_records(path):
+    """一次性读出二进制记录里的全部事件"""
+    with KbrRecording(path) as recording:
+        return list(recording.iter_records())
+
+
+def load_store(path):
+    """自动识别格式，把记录文件读进 EventStore"""
+    if is_kbr_file(path):
+        with KbrRecording(path) as recording:
+            return recording.to_store()
+    events_data, meta = _read_json(path)
+    store = EventStore.from_records(
+        (d['name'], d['event_type'], d['scan_code'], d['time']) for d in events_data)
+    store.meta = meta
+    return store
+
+
+def save_store(path, store, binary=False):
+    """把 EventStore 保存为 JSON 或二进制记录文件"""
+    if binary:
+        save_kbr_store(path, store)
+    else:
+        save_json_records(path, store.iter_records(), store.meta)
+
+
+def is_kbr_file(path):
+    """根据文件头判断是不是 .kbr 文件"""
+    with open(path, 'rb') as f:
+        return f.read(len(KBR_MAGIC)) == KBR_MAGIC
+
+
+def json_to_kbr(src, dst):
+    """JSON 记录转二进制，附加信息一起转换"""
+    save_store(dst, load_store(src), binary=True)
+
+
+def kbr_to_json(src, dst):
+    """二进制记录转 JSON，附加信息一起转换"""
+    save_store(dst, load_store(src))
@@ -0,0 +1,254 @@
+"""任务计划：排队运行多个宏，按优先级、开始时间和重复间隔调度
+
+所有任务都交给同一个注入线程按顺序回放，不同任务的按键不会交错。
+界面上的回放和计划任务共用一把注入锁（injection lock），谁拿到锁谁发送按键，另一方等它结束。
+"""
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from analytics import QuantileSketch
+from playback import PlaybackProgress
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+WAITING = 'waiting'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+JOB_STATE_LABELS = {
+    WAITING: '等待',
+    RUNNING: '运行中',
+    DONE: '完成',
+    CANCELLED: '已取消',
+    FAILED: '失败',
+}
+
+
+def acquire_injection(lock, cancel=None, poll=0.05):
+    """等待注入锁，等待期间被取消返回 False，拿到锁返回 True"""
+    while not lock.acquire(timeout=poll):
+        if cancel is not None and cancel.is_set():
+            return False
+    return True
+
+
+def parse_start_time(text, now=None):
+    """'HH:MM' 或 'HH:MM:SS' -> 时间戳，今天这个时刻已经过了就取明天；空字符串表示现在"""
+    now = time.time() if now is None else now
+    text = text.strip()
+    if not text:
+        return now
+    parts = text.split(':')
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"开始时间格式不对: {text}，应该是 时:分 或 时:分:秒")
+    try:
+        clock_time = datetime.time(*(int(part) for part in parts))
+    except ValueError:
+        raise ValueError(f"开始时间不对: {text}") from None
+    today = datetime.datetime.fromtimestamp(now).date()
+    start = datetime.datetime.combine(today, clock_time).timestamp()
+    return start if start >= now else start + 86400
+
+
+class Job:
+    """一个计划任务
+
+    timeline: 编译好的时间线，提交后不受原记录修改的影响
+    priority: 同时到期时数字大的先运行
+    start_at: 第一次运行的时间戳，None 表示提交后立即运行
+    interval: 重复间隔（秒），None 表示只运行一次
+    count:    一共运行几次，None 表示一直重复
+    """
+
+    def __init__(self, name, timeline, priority=0, start_at=None, interval=None, count=None):
+        if interval is not None and interval <= 0:
+            raise ValueError("重复间隔必须大于0")
+        if count is not None and count <= 0:
+            raise ValueError("运行次数必须大于0")
+        self.id = None
+        self.name = name
+        self.timeline = timeline
+        self.priority = priority
+        self.start_at = start_at
+        self.interval = interval
+        self.count = count if interval is not None else 1
+        self.state = WAITING
+        self.next_run = start_at
+        self.cancel = threading.Event()
+        # 统计
+        self.runs = 0
+        self.missed = 0
+        self.events_sent = 0
+        self.busy_time = 0.0
+        self.max_lateness = 0.0
+        # 从计划时间到真正开始发送的延迟（秒），包括排队和等待注入锁的时间
+        self.start_delay = QuantileSketch(min_value=1e-3)
+        self.last_error = None
+
+    @property
+    def finished(self):
+        return self.state in (DONE, CANCELLED, FAILED)
+
+    @property
+    def throughput(self):
+        """回放期间平均每秒发送的事件数"""
+        return self.events_sent / self.busy_time if self.busy_time > 0 else 0.0
+
+    def describe_stats(self):
+        if not self.start_delay.count:
+            return ""
+        p50, p95 = (self.start_delay.quantile(q) for q in (0.5, 0.95))
+        return (f"{self.throughput:.1f} 事件/秒，启动延迟 p50/p95 {p50:.2f}/{p95:.2f}秒，"
+                f"最大迟到 {self.max_lateness * 1000:.1f}ms")
+
+
+class JobScheduler:
+    """任务队列和唯一的注入线程
+
+    到期的任务先从按时间排序的堆移到按优先级排序的堆，注入线程每次取优先级最高的任务，
+    拿到注入锁后回放一遍。重复的任务回放完后按间隔算出下次时间重新排队，
+    回放时间超过间隔错过的次数只计数，不补跑。取消的任务在出堆时丢掉。
+    """
+
+    def __init__(self, engine, lock=None, clock=time.time, gap=0.3):
+        self.engine = engine
+        self.lock = lock if lock is not None else threading.Lock()
+        self.clock = clock
+        # 两个任务之间至少间隔的秒数，让目标程序处理完上一个任务的输入
+        self.gap = gap
+        self.current = None
+        self._jobs = {}
+        self._timed = []
+        self._ready = []
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name='injection-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止注入线程，正在运行的任务被取消"""
+        self._stopping.set()
+        with self._condition:
+            current = self.current
+            if current is not None:
+                current.state = CANCELLED
+                current.cancel.set()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, job):
+        """加入队列，返回 job"""
+        with self._condition:
+            job.id = next(self._ids)
+            if job.next_run is None:
+                job.next_run = self.clock()
+            self._jobs[job.id] = job
+            heapq.heappush(self._timed, (job.next_run, next(self._sequence), job))
+            self._condition.notify()
+        return job
+
+    def cancel(self, job_id):
+        """取消任务，正在运行的任务尽快停止；任务不存在或已经结束返回 False"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.state = CANCELLED
+            job.cancel.set()
+            self._condition.notify()
+            return True
+
+    def jobs(self):
+        """所有任务，按提交顺序"""
+        with self._condition:
+            return list(self._jobs.values())
+
+    def remove_finished(self):
+        with self._condition:
+            for job_id in [job.id for job in self._jobs.values() if job.finished]:
+                del self._jobs[job_id]
+
+    def _next_job(self):
+        """等到有任务可以运行，返回它；停止时返回 None"""
+        timed = self._timed
+        ready = self._ready
+        with self._condition:
+            while not self._stopping.is_set():
+                now = self.clock()
+                while timed and timed[0][0] <= now:
+                    next_run, sequence, job = heapq.heappop(timed)
+                    if job.state == WAITING:
+                        heapq.heappush(ready, (-job.priority, next_run, sequence, job))
+                while ready:
+                    job = heapq.heappop(ready)[-1]
+                    if job.state == WAITING:
+                        job.state = RUNNING
+                        self.current = job
+                        return job
+                self._condition.wait(timed[0][0] - now if timed else None)
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(job)
+            with self._condition:
+                self.current = None
+                self._reschedule(job)
+            if self._stopping.wait(self.gap):
+                return
+
+    def _run(self, job):
+        if not acquire_injection(self.lock, job.cancel):
+            return
+        try:
+            job.start_delay.add(max(self.clock() - job.next_run, 0.0))
+            progress = PlaybackProgress()
+            started = time.perf_counter()
+            try:
+                completed = self.engine.play_timeline(job.timeline, job.cancel, progress)
+            finally:
+                job.busy_time += time.perf_counter() - started
+                job.events_sent += progress.index
+                job.max_lateness = max(job.max_lateness, self.engine.max_lateness)
+            if completed:
+                job.runs += 1
+        except Exception as e:
+            logger.exception("计划任务 %s 出错", job.name)
+            job.last_error = str(e)
+            job.state = FAILED
+        finally:
+            self.lock.release()
+
+    def _reschedule(self, job):
+        if job.state != RUNNING:
+            return
+        if job.interval is None or (job.count is not None and job.runs >= job.count):
+            job.state = DONE
+            return
+        now = self.clock()
+        next_run = job.next_run + job.interval
+        if next_run <= now:
+            missed = int((now - next_run) // job.interval) + 1
+            job.missed += missed
+            next_run += missed * job.interval
+        job.next_run = next_run
+        job.state = WAITING
+        heapq.heappush(self._timed, (next_run, next(self._sequence), job))
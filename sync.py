@@ -0,0 +1,196 @@
+"""同步点：回放到这里先暂停，等某个条件成立再继续，代替按最坏情况设置的固定等待
+
+同步点在记录里是一个 event_type 为 'sync' 的事件，键名里存的是 SyncPoint 的 JSON。
+条件通过可插拔的 Predicate 判断，内置：
+    clipboard  剪贴板内容和进入等待前相比发生了变化
+    file       标记文件出现（或者在进入等待后被更新）
+    callback   注册过的回调函数返回 True
+    signal     进程内信号，没有界面的环境下测试用
+"""
+import json
+import os
+import threading
+
+SYNC_KINDS = ('clipboard', 'file', 'callback', 'signal')
+# 不需要别的代码配合就能用的条件；回调和信号要由嵌入回放引擎的代码注册、触发，界面上只提供这两种
+STANDALONE_SYNC_KINDS = ('clipboard', 'file')
+
+SYNC_KIND_LABELS = {
+    'clipboard': '剪贴板变化',
+    'file': '标记文件出现',
+    'callback': '回调返回真',
+    'signal': '进程内信号',
+}
+
+
+class SyncTimeout(Exception):
+    """同步点等待超时"""
+
+
+class SyncPoint:
+    """同步点的配置
+
+    kind:       条件类型，见 SYNC_KINDS
+    arg:        条件参数，file 是文件路径，callback/signal 是名字
+    timeout:    最多等待多少秒
+    poll:       多久检查一次条件（秒）
+    on_timeout: 超时后 'fail' 停止回放，'continue' 继续回放
+    """
+
+    def __init__(self, kind, arg='', timeout=30.0, poll=0.05, on_timeout='fail'):
+        if kind not in SYNC_KINDS:
+            raise ValueError(f"未知的同步条件: {kind}")
+        if timeout <= 0 or poll <= 0:
+            raise ValueError("超时和检查间隔必须大于0")
+        self.kind = kind
+        self.arg = arg
+        self.timeout = timeout
+        self.poll = poll
+        self.on_timeout = on_timeout
+
+    def to_name(self):
+        """编码成记录里的键名"""
+        return json.dumps({'kind': self.kind, 'arg': self.arg, 'timeout': self.timeout,
+                           'poll': self.poll, 'on_timeout': self.on_timeout},
+                          ensure_ascii=False, sort_keys=True)
+
+    @classmethod
+    def from_name(cls, name):
+        return cls(**json.loads(name))
+
+    def describe(self):
+        text = SYNC_KIND_LABELS[self.kind]
+        if self.arg:
+            text += f" {self.arg}"
+        return f"{text}（最多等 {self.timeout:g} 秒）"
+
+
+class Predicate:
+    """同步条件：arm 记下进入等待前的状态，check 判断条件是否已经成立"""
+
+    def arm(self):
+        pass
+
+    def check(self):
+        raise NotImplementedError
+
+
+class ClipboardChanged(Predicate):
+    """剪贴板内容和 arm 时相比发生了变化"""
+
+    def __init__(self, read_clipboard):
+        self.read_clipboard = read_clipboard
+        self._baseline = None
+
+    def arm(self):
+        self._baseline = self.read_clipboard()
+
+    def check(self):
+        return self.read_clipboard() != self._baseline
+
+
+class FileAppeared(Predicate):
+    """标记文件出现，或者在 arm 之后被重新写过"""
+
+    def __init__(self, path):
+        self.path = path
+        self._baseline = None
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def arm(self):
+        self._baseline = self._mtime()
+
+    def check(self):
+        mtime = self._mtime()
+        return mtime is not None and mtime != self._baseline
+
+
+class CallbackPredicate(Predicate):
+    """调用回调函数，返回 True 表示可以继续"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def check(self):
+        return bool(self.callback())
+
+
+class InProcessClipboard:
+    """内存里的剪贴板，没有界面的环境下代替系统剪贴板"""
+
+    def __init__(self, text=''):
+        self.text = text
+
+    def read(self):
+        return self.text
+
+    def write(self, text):
+        self.text = text
+
+
+class SignalPredicate(Predicate):
+    """进程内信号：arm 时清掉旧信号，之后 signal.set() 就成立"""
+
+    def __init__(self, signal):
+        self.signal = signal
+
+    def arm(self):
+        self.signal.clear()
+
+    def check(self):
+        return self.signal.is_set()
+
+
+class SyncContext:
+    """根据同步点创建条件对象，回调和信号按名字注册在这里"""
+
+    def __init__(self, read_clipboard=None):
+        self.read_clipboard = read_clipboard or InProcessClipboard().read
+        self.callbacks = {}
+        self.signals = {}
+
+    def register_callback(self, name, callback):
+        self.callbacks[name] = callback
+
+    def signal(self, name):
+        """取得名为 name 的进程内信号（threading.Event）"""
+        event = self.signals.get(name)
+        if event is None:
+            event = self.signals[name] = threading.Event()
+        return event
+
+    def make_predicate(self, point):
+        if point.kind == 'clipboard':
+            return ClipboardChanged(self.read_clipboard)
+        if point.kind == 'file':
+            return FileAppeared(point.arg)
+        if point.kind == 'callback':
+            try:
+                return CallbackPredicate(self.callbacks[point.arg])
+            except KeyError:
+                raise ValueError(f"没有注册名为 {point.arg} 的回调")
+        return SignalPredicate(self.signal(point.arg))
+
+    def prepare(self, names):
+        """为时间线里的每个同步点创建条件并 arm，返回 键名 -> (SyncPoint, Predicate)"""
+        prepared = {}
+        for name in names:
+            if name not in prepared:
+                point = SyncPoint.from_name(name)
+                predicate = self.make_predicate(point)
+                predicate.arm()
+                prepared[name] = (point, predicate)
+        return prepared
+
+
+def insert_sync_point(store, index, point):
+    """在记录的 index 位置插入同步点，时间取前一个事件的时间，不改变原来的间隔"""
+    if index < 0 or index > len(store):
+        raise IndexError(index)
+    t = store.times[index - 1] if index > 0 else (store.times[0] if len(store) else 0.0)
+    store.insert(index, point.to_name(), 'sync', None, t)
@@ -0,0 +1,64 @@
+"""宏模板：把记录里的一段输入换成命名的槽位，回放时用数据行里对应列的文本填进去"""
+from array import array
+
+from event_store import SLOT, TEXT
+from timeline import Timeline, compile_timeline
+
+
+def make_slot(store, start, end, name):
+    """把记录里第 start 到 end-1 个事件换成名为 name 的槽位，槽位的时间取第一个被替换的事件"""
+    name = name.strip()
+    if not name:
+        raise ValueError("槽位名不能为空")
+    if not 0 <= start < end <= len(store):
+        raise IndexError(f"事件范围不对: {start}-{end}")
+    t = store.times[start]
+    for _ in range(end - start):
+        store.pop(start)
+    store.insert(start, name, 'slot', None, t)
+
+
+def slot_names(store):
+    """记录里用到的槽位名，按第一次出现的顺序"""
+    names = store.names
+    return list(dict.fromkeys(names[name_id]
+                              for type_code, name_id in zip(store.types, store.name_ids)
+                              if type_code == SLOT))
+
+
+class MacroTemplate:
+    """编译好的模板
+
+    时间线只编译一次，每行数据只替换槽位位置上的键，偏移量和操作类型数组所有行共用。
+    """
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        # (事件序号, 槽位名)
+        self.slots = [(index, key) for index, (op, key) in enumerate(zip(timeline.ops, timeline.keys))
+                      if op == SLOT]
+        self.slot_names = list(dict.fromkeys(name for _, name in self.slots))
+        # 填好值的槽位就是一段普通的文本输入
+        self._ops = array('b', timeline.ops)
+        for index, _ in self.slots:
+            self._ops[index] = TEXT
+
+    @classmethod
+    def compile(cls, store, profile=None, cache=None):
+        """编译记录，传入 timeline.TimelineCache 时从缓存里取时间线"""
+        timeline = cache.get(store, profile) if cache is not None else compile_timeline(store, profile)
+        return cls(timeline)
+
+    def check_columns(self, columns):
+        """数据文件的列必须包含所有槽位名"""
+        missing = [name for name in self.slot_names if name not in (columns or ())]
+        if missing:
+            raise ValueError(f"数据文件缺少列: {', '.join(missing)}")
+
+    def fill(self, row):
+        """用一行数据（列名 -> 文本）填好槽位，返回可以直接回放的时间线"""
+        keys = list(self.timeline.keys)
+        for index, name in self.slots:
+            # csv.DictReader 对缺少的列给 None，当作空文本
+            keys[index] = row.get(name) or ''
+        return Timeline(self.timeline.offsets, self._ops, tuple(keys))
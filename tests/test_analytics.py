@@ -0,0 +1,52 @@
+import pytest
+
+from analytics import QuantileSketch, RecordingAnalytics
+from event_store import EventStore
+
+
+def test_quantile_sketch_relative_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for i in range(1, 1001):
+        sketch.add(i / 1000)
+    assert sketch.quantile(0.5) == pytest.approx(0.5, rel=0.02)
+    assert sketch.quantile(0.99) == pytest.approx(0.99, rel=0.02)
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_counts_holds_chords_and_repeats():
+    analytics = RecordingAnalytics.from_store(EventStore.from_records([
+        ('ctrl', 'down', 29, 0.0),
+        ('c', 'down', 46, 0.1),
+        ('c', 'down', 46, 0.15),
+        ('c', 'up', 46, 0.3),
+        ('ctrl', 'up', 29, 0.4),
+        ('x', 'down', 45, 1.0),
+        ('x', 'up', 45, 1.05),
+    ]))
+    assert analytics.key_counts == {'ctrl': 1, 'c': 1, 'x': 1}
+    assert analytics.repeat_count == 1
+    assert analytics.chord_counts == {'ctrl+c': 1}
+    assert analytics.holds['c'].mean == pytest.approx(0.2)
+    assert analytics.chord_holds['ctrl+c'].count == 1
+    assert 'ctrl+c' in analytics.report()
+
+
+def test_shifted_key_pairs_by_scan_code():
+    analytics = RecordingAnalytics()
+    for record in [('shift', 'down', 42, 0.0), ('A', 'down', 30, 0.1), ('shift', 'up', 42, 0.2),
+                   ('a', 'up', 30, 0.3), ('a', 'down', 30, 0.5), ('a', 'up', 30, 0.6)]:
+        name, event_type, scan_code, t = record
+        analytics.feed(name, event_type, t, scan_code)
+    assert analytics.repeat_count == 0
+    assert analytics.key_counts == {'shift': 1, 'A': 1, 'a': 1}
+    assert analytics.holds['A'].mean == pytest.approx(0.2)
+    assert analytics.chord_counts == {'shift+A': 1}
+
+
+def test_reset_clears_everything():
+    analytics = RecordingAnalytics()
+    analytics.feed('a', 'down', 0.0)
+    analytics.reset()
+    assert analytics.event_count == 0
+    assert analytics.key_counts == {}
+    assert analytics.gap_percentiles()[50] is None
@@ -0,0 +1,107 @@
+import pytest
+
+from batch import RowSource, run_batch
+from event_store import EventStore
+from playback import PlaybackEngine, FakeBackend
+from template import MacroTemplate, make_slot, slot_names
+from timing import KEY_CLASSES, TimingProfile
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+class FailingBackend(FakeBackend):
+    """输入 fail 时抛出异常，模拟回放中途出错"""
+
+    def write(self, text):
+        if text == 'fail':
+            raise RuntimeError("目标窗口不见了")
+        super().write(text)
+
+
+def make_engine(backend_class=FakeBackend):
+    clock = FakeClock()
+    backend = backend_class(clock)
+    return PlaybackEngine(backend, spin=0.0, clock=clock, sleep=clock.sleep), backend
+
+
+def make_template():
+    # 输入 "xy"、回车，把 "xy" 换成槽位 name
+    store = EventStore.from_records([('x', 'down', 45, 0.0), ('x', 'up', 45, 0.1),
+                                     ('y', 'down', 21, 0.2), ('y', 'up', 21, 0.3),
+                                     ('enter', 'down', 28, 0.4), ('enter', 'up', 28, 0.5)])
+    make_slot(store, 0, 4, ' name ')
+    return store, MacroTemplate.compile(store, TimingProfile(min_delays={c: 0.0 for c in KEY_CLASSES}))
+
+
+def typed(backend):
+    return [(event_type, key) for _, event_type, key in backend.sent]
+
+
+def test_make_slot_replaces_events():
+    store, template = make_template()
+    assert list(store.iter_records())[0] == ('name', 'slot', None, 0.0)
+    assert len(store) == 3
+    assert slot_names(store) == template.slot_names == ['name']
+    with pytest.raises(ValueError):
+        make_slot(store, 0, 1, '  ')
+    with pytest.raises(IndexError):
+        make_slot(store, 2, 5, 'other')
+
+
+def test_fill_shares_offsets_and_keeps_template():
+    _, template = make_template()
+    first = template.fill({'name': '张三'})
+    second = template.fill({})
+    assert first.offsets is second.offsets is template.timeline.offsets
+    assert first.keys[0] == '张三' and second.keys[0] == ''
+    assert template.timeline.keys[0] == 'name'
+    with pytest.raises(ValueError):
+        template.check_columns(['other'])
+
+
+def test_row_source_guesses_delimiter_and_skips_rows(tmp_path):
+    path = tmp_path / 'data.txt'
+    path.write_text('\ufeffname\tage\na\t1\nb\t2\nc\t3\n', encoding='utf-8')
+    with RowSource(str(path)) as source:
+        assert source.columns == ['name', 'age']
+        assert [(n, row['name']) for n, row in source.rows(2)] == [(2, 'b'), (3, 'c')]
+
+
+def test_run_batch_plays_every_row(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('name\nalice\nbob\n', encoding='utf-8')
+    engine, backend = make_engine()
+    _, template = make_template()
+    with RowSource(str(path)) as source:
+        result = run_batch(engine, template, source)
+    assert result.completed and result.rows_done == 2 and result.next_row == 3
+    assert typed(backend) == [('text', 'alice'), ('down', 28), ('up', 28),
+                              ('text', 'bob'), ('down', 28), ('up', 28)]
+
+
+def test_run_batch_stops_at_failing_row_and_resumes(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('name\nalice\nfail\ncarol\n', encoding='utf-8')
+    engine, backend = make_engine(FailingBackend)
+    _, template = make_template()
+    with RowSource(str(path)) as source:
+        result = run_batch(engine, template, source)
+    assert not result.completed
+    assert (result.rows_done, result.next_row) == (1, 2)
+    assert '目标窗口不见了' in result.error and '第 2 行' in result.describe()
+
+    path.write_text('name\nalice\nbob\ncarol\n', encoding='utf-8')
+    engine, backend = make_engine(FailingBackend)
+    with RowSource(str(path)) as source:
+        result = run_batch(engine, template, source, start_row=result.next_row)
+    assert result.completed and result.rows_done == 2
+    assert [key for event_type, key in typed(backend) if event_type == 'text'] == ['bob', 'carol']
@@ -0,0 +1,37 @@
+import bench
+
+
+def test_synthetic_store_is_deterministic():
+    store = bench.synthetic_store(500, seed=3)
+    assert len(store) == 500
+    assert store.checksum() == bench.synthetic_store(500, seed=3).checksum()
+    assert store.checksum() != bench.synthetic_store(500, seed=4).checksum()
+    assert list(store.times) == sorted(store.times)
+
+
+def test_compare_ignores_noise_and_new_metrics():
+    baseline = {'load/1000': {'value': 0.010, 'unit': 's'},
+                'compile/1000': {'value': 0.0001, 'unit': 's'},
+                'size/1000': {'value': 2.0, 'unit': 'MB'}}
+    results = {'load/1000': {'value': 0.020, 'unit': 's'},
+               # 变慢一倍但差值在噪声下限以内
+               'compile/1000': {'value': 0.0002, 'unit': 's'},
+               'size/1000': {'value': 2.4, 'unit': 'MB'},
+               'new/1000': {'value': 9.0, 'unit': 's'}}
+    assert bench.compare(results, baseline) == [('load/1000', 0.010, 0.020, 's')]
+    assert bench.compare(results, baseline, tolerance=1.5) == []
+
+
+def test_main_writes_results_and_flags_regressions(tmp_path, capsys):
+    output = str(tmp_path / 'results.json')
+    baseline = str(tmp_path / 'baseline.json')
+    argv = ['--sizes', '200', '--no-memory', '--no-jitter', '--output', output]
+    assert bench.main(argv + ['--save-baseline', baseline]) == 0
+    results = bench.load_results(output)
+    assert {'save_kbr/200', 'load_json/200', 'compile/200'} <= set(results)
+
+    # 基准里的加载时间比这次快 1 秒，重新运行一定算退步
+    results['load_json/200']['value'] -= 1.0
+    bench.save_results(baseline, results)
+    assert bench.main(argv + ['--baseline', baseline]) == 1
+    assert '退步: load_json/200' in capsys.readouterr().err
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+from capture import CaptureFilter, RingBuffer, parse_chord
+
+
+def event(name, event_type, scan_code=None):
+    return SimpleNamespace(name=name, event_type=event_type, scan_code=scan_code)
+
+
+def run(capture, events):
+    """返回 (记录下来的 (name, event_type), 是否按了停止组合键)"""
+    emitted = []
+    stopped = False
+    for e in events:
+        if capture.process(e, emitted.append):
+            stopped = True
+            break
+    return [(e.name, e.event_type) for e in emitted], stopped
+
+
+def test_parse_chord():
+    assert parse_chord('Ctrl+Shift+Q') == (frozenset({'ctrl', 'shift'}), 'q')
+    assert parse_chord('esc') == (frozenset(), 'esc')
+    with pytest.raises(ValueError):
+        parse_chord('a+b')
+
+
+def test_drops_auto_repeats():
+    capture = CaptureFilter()
+    emitted, _ = run(capture, [event('a', 'down', 30), event('a', 'down', 30),
+                               event('a', 'up', 30), event('a', 'down', 30)])
+    assert emitted == [('a', 'down'), ('a', 'up'), ('a', 'down')]
+    assert capture.repeats_dropped == 1
+
+
+def test_shifted_key_released_after_shift_is_not_a_repeat():
+    capture = CaptureFilter()
+    emitted, _ = run(capture, [event('shift', 'down', 42), event('A', 'down', 30),
+                               event('shift', 'up', 42), event('a', 'up', 30),
+                               event('a', 'down', 30)])
+    assert emitted[-1] == ('a', 'down')
+    assert capture.repeats_dropped == 0
+
+
+def test_allow_and_deny():
+    emitted, _ = run(CaptureFilter(deny=['Windows', 'a']),
+                     [event('left windows', 'down', 91), event('A', 'down', 30), event('b', 'down', 48)])
+    assert emitted == [('b', 'down')]
+    emitted, _ = run(CaptureFilter(allow=['ctrl', 'c']),
+                     [event('right ctrl', 'down', 29), event('c', 'down', 46), event('v', 'down', 47)])
+    assert emitted == [('right ctrl', 'down'), ('c', 'down')]
+
+
+def test_stop_chord_is_not_recorded():
+    capture = CaptureFilter(stop_chord='ctrl+shift+q')
+    emitted, stopped = run(capture, [event('a', 'down', 30), event('a', 'up', 30),
+                                     event('ctrl', 'down', 29), event('shift', 'down', 42),
+                                     event('Q', 'down', 16)])
+    assert stopped
+    assert emitted == [('a', 'down'), ('a', 'up')]
+
+
+def test_held_stop_modifier_is_released_for_other_keys():
+    capture = CaptureFilter(stop_chord='ctrl+shift+q')
+    emitted, stopped = run(capture, [event('ctrl', 'down', 29), event('c', 'down', 46)])
+    assert not stopped
+    assert emitted == [('ctrl', 'down'), ('c', 'down')]
+
+
+def test_ring_buffer():
+    ring = RingBuffer(capacity=3)
+    assert ring.capacity == 4
+    assert all(ring.push(i) for i in range(4))
+    assert not ring.push(4)
+    out = []
+    assert ring.drain(out) == 4
+    assert out == [0, 1, 2, 3]
+    assert len(ring) == 0
+    assert ring.push(5)
@@ -0,0 +1,81 @@
+import json
+import threading
+
+from checkpoint import Checkpoint, clear_checkpoint, load_checkpoint, save_checkpoint
+from event_store import DOWN, UP
+from playback import FakeBackend
+from test_playback import make_engine, make_timeline
+
+
+def test_checkpoint_round_trip_and_checksum(tmp_path):
+    path = str(tmp_path / 'rec.checkpoint')
+    save_checkpoint(path, Checkpoint('abc', iteration=3, index=17))
+    checkpoint = load_checkpoint(path, 'abc')
+    assert (checkpoint.iteration, checkpoint.index, checkpoint.row) == (3, 17, None)
+    assert checkpoint.describe() == "第 3 轮的第 17 个事件"
+    # 记录改过以后断点作废
+    assert load_checkpoint(path, 'changed') is None
+    assert not (tmp_path / 'rec.checkpoint.tmp').exists()
+    clear_checkpoint(path)
+    clear_checkpoint(path)
+    assert load_checkpoint(path) is None
+
+
+def test_batch_checkpoint_and_corrupt_file(tmp_path):
+    path = tmp_path / 'batch.checkpoint'
+    save_checkpoint(str(path), Checkpoint('abc', index=2, row=40, data_path='data.csv'))
+    assert load_checkpoint(str(path)).describe() == "数据第 40 行的第 2 个事件"
+    path.write_text(json.dumps({'iteration': 2}), encoding='utf-8')
+    assert load_checkpoint(str(path)) is None
+    path.write_text('{"checksum": "ab', encoding='utf-8')
+    assert load_checkpoint(str(path)) is None
+
+
+def pressing(key, action):
+    """第一次按下 key 时在回放线程里执行 action，恢复暂停时重新按下不再执行"""
+
+    class Backend(FakeBackend):
+        def press(self, pressed):
+            super().press(pressed)
+            if pressed == key and not done:
+                done.append(pressed)
+                action()
+
+    done = []
+    return Backend
+
+
+def test_pause_releases_held_keys_and_shifts_schedule():
+    engine = clock = None
+
+    def pause():
+        engine.pause()
+
+        def resume():
+            # 暂停了 5 秒
+            clock.now += 5.0
+            engine.resume()
+        threading.Timer(0.05, resume).start()
+
+    engine, backend, clock = make_engine(pressing(30, pause))
+    timeline = make_timeline([(0.0, DOWN, 42), (0.1, DOWN, 30), (0.2, UP, 30), (0.3, UP, 42)])
+    assert engine.play_timeline(timeline)
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [
+        ('down', 42), ('down', 30), ('up', 30), ('up', 42), ('down', 42), ('down', 30),
+        ('up', 30), ('up', 42)]
+    assert backend.sent[-1][0] - engine.scheduled_start >= 5.3 - 1e-6
+
+
+def test_cancel_while_paused_releases_once():
+    cancel = threading.Event()
+    engine = None
+
+    def pause():
+        engine.pause()
+        threading.Timer(0.05, cancel.set).start()
+
+    engine, backend, clock = make_engine(pressing(30, pause))
+    timeline = make_timeline([(0.0, DOWN, 42), (0.1, DOWN, 30), (0.2, UP, 30), (0.3, UP, 42)])
+    assert not engine.play_timeline(timeline, cancel)
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [
+        ('down', 42), ('down', 30), ('up', 30), ('up', 42)]
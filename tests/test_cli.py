@@ -0,0 +1,61 @@
+import sys
+
+import cli
+from event_store import EventStore
+from recording_format import is_kbr_file, load_store, save_store
+from template import make_slot
+
+
+def make_recording(path):
+    store = EventStore.from_records([('a', 'down', 30, 1.0), ('a', 'up', 30, 1.01),
+                                     ('enter', 'down', 28, 1.02), ('enter', 'up', 28, 1.03)])
+    save_store(str(path), store)
+    return store
+
+
+def test_convert_round_trips_through_kbr(tmp_path, capsys):
+    store = make_recording(tmp_path / 'rec.json')
+    assert cli.main(['convert', str(tmp_path / 'rec.json'), str(tmp_path / 'rec.kbr')]) == 0
+    assert is_kbr_file(str(tmp_path / 'rec.kbr'))
+    assert cli.main(['convert', str(tmp_path / 'rec.kbr'), str(tmp_path / 'back.json')]) == 0
+    assert load_store(str(tmp_path / 'back.json')).checksum() == store.checksum()
+
+
+def test_stats_reports_events_and_slots(tmp_path, capsys):
+    store = make_recording(tmp_path / 'rec.json')
+    make_slot(store, 0, 2, 'name')
+    save_store(str(tmp_path / 'slot.kbr'), store, binary=True)
+    assert cli.main(['stats', str(tmp_path / 'slot.kbr')]) == 0
+    out = capsys.readouterr().out
+    assert '3 个事件' in out and '模板槽位: name' in out
+
+
+def test_dry_run_plays_without_keyboard(tmp_path, capsys, monkeypatch):
+    # 试运行不能导入 keyboard
+    monkeypatch.setitem(sys.modules, 'keyboard', None)
+    make_recording(tmp_path / 'rec.json')
+    assert cli.main(['play', str(tmp_path / 'rec.json'), '--dry-run', '--count', '2',
+                     '--speed', '10']) == 0
+    assert '试运行发送了 8 个事件' in capsys.readouterr().err
+
+
+def test_play_rejects_template_without_data(tmp_path, capsys):
+    store = make_recording(tmp_path / 'rec.json')
+    make_slot(store, 0, 2, 'name')
+    save_store(str(tmp_path / 'slot.json'), store)
+    assert cli.main(['play', str(tmp_path / 'slot.json'), '--dry-run']) == 2
+    assert '--data' in capsys.readouterr().err
+
+
+def test_bad_arguments_and_missing_files(tmp_path, capsys):
+    make_recording(tmp_path / 'rec.json')
+    assert cli.main(['play', str(tmp_path / 'rec.json'), '--count', '0']) == 2
+    assert cli.main(['stats', str(tmp_path / 'missing.json')]) == 1
+    assert '错误' in capsys.readouterr().err
+
+
+def test_gui_without_tk_build_prints_help(capsys, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'keyboard_app', None)
+    assert cli.main([]) == 2
+    err = capsys.readouterr().err
+    assert '这个版本不带界面' in err and 'usage' in err
@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from editor import MacroEditor
+from event_store import EventStore
+
+
+def make_editor(count=10):
+    return MacroEditor(EventStore.from_records(
+        (f'k{i}', 'down', i + 1, i * 0.1) for i in range(count)))
+
+
+def names(editor):
+    return [name for name, _, _, _ in editor.records()]
+
+
+def times(editor):
+    return [round(t, 9) for _, _, _, t in editor.records()]
+
+
+def test_delete_ripples_later_events():
+    editor = make_editor(5)
+    editor.delete(1, 3)
+    assert names(editor) == ['k0', 'k3', 'k4']
+    assert times(editor) == [0.0, 0.1, 0.2]
+    editor.undo()
+    assert names(editor) == [f'k{i}' for i in range(5)]
+
+
+def test_delete_without_ripple_keeps_times():
+    editor = make_editor(5)
+    editor.delete(1, 3, ripple=False)
+    assert times(editor) == [0.0, 0.3, 0.4]
+
+
+def test_insert_uses_the_gap_at_the_insertion_point():
+    editor = make_editor(3)
+    editor.insert(1, [('x', 'down', None, 50.0), ('x', 'up', None, 50.05)])
+    assert names(editor) == ['k0', 'x', 'x', 'k1', 'k2']
+    assert times(editor) == [0.0, 0.1, 0.15, 0.25, 0.35]
+
+
+def test_copy_paste_retime_and_redo():
+    editor = make_editor(4)
+    clip = editor.copy(0, 2)
+    editor.paste(4, clip)
+    editor.paste(4, clip)
+    assert names(editor) == ['k0', 'k1', 'k2', 'k3', 'k0', 'k1', 'k0', 'k1']
+    editor.retime(0, 2, factor=2.0)
+    assert times(editor)[:3] == [0.0, 0.2, 0.3]
+    assert editor.undo() is not None
+    assert editor.can_redo
+    editor.redo()
+    assert times(editor)[:3] == [0.0, 0.2, 0.3]
+    with pytest.raises(ValueError):
+        editor.retime(0, 2, factor=0)
+
+
+def test_delete_everything():
+    editor = make_editor(3)
+    editor.delete(0, 3)
+    assert len(editor) == 0
+    assert list(editor.records(0, 0)) == []
+    assert len(editor.to_store()) == 0
+    with pytest.raises(IndexError):
+        editor.record(0)
+    editor.undo()
+    assert len(editor) == 3
+
+
+def test_to_store_and_original_untouched():
+    store = make_editor(4).base
+    editor = MacroEditor(store)
+    editor.splice(1, 2, [('y', 'text', None, 0.0)])
+    edited = editor.to_store()
+    assert [r[:3] for r in edited.iter_records()] == [
+        ('k0', 'down', 1), ('y', 'text', None), ('k2', 'down', 3), ('k3', 'down', 4)]
+    assert len(store) == 4 and store.record(1)[0] == 'k1'
+    assert editor.modified and not editor.stale
+    store.append('z', 'down', 9, 1.0)
+    assert editor.stale
+
+
+def test_random_edits_match_a_list():
+    rng = random.Random(1)
+    editor = make_editor(200)
+    reference = names(editor)
+    # 每一步编辑之前的状态，和编辑器的撤销栈一一对应
+    history = []
+    for _ in range(300):
+        n = len(reference)
+        action = rng.choice(['insert', 'delete', 'cut_paste', 'undo'])
+        if action == 'undo':
+            if history:
+                editor.undo()
+                reference = history.pop()
+        elif action == 'insert':
+            index = rng.randint(0, n)
+            history.append(list(reference))
+            editor.insert(index, [('new', 'down', None, 0.0)])
+            reference[index:index] = ['new']
+        elif action == 'delete' and n > 1:
+            start = rng.randrange(n)
+            end = rng.randint(start + 1, min(n, start + 5))
+            history.append(list(reference))
+            editor.delete(start, end)
+            del reference[start:end]
+        elif action == 'cut_paste' and n > 2:
+            start = rng.randrange(n)
+            end = rng.randint(start + 1, min(n, start + 5))
+            history.append(list(reference))
+            clip = editor.cut(start, end)
+            segment = reference[start:end]
+            del reference[start:end]
+            index = rng.randint(0, len(reference))
+            history.append(list(reference))
+            editor.paste(index, clip)
+            reference[index:index] = segment
+        assert names(editor) == reference
+    assert [name for name, _, _, _ in editor.to_store().iter_records()] == reference
@@ -0,0 +1,55 @@
+from event_store import EventStore
+
+RECORDS = [
+    ('shift', 'down', 42, 1.0),
+    ('A', 'down', 30, 1.1),
+    ('a', 'up', 30, 1.2),
+    ('shift', 'up', 42, 1.3),
+    ('hello', 'text', None, 1.5),
+    (None, 'sync', None, 1.6),
+    ('name', 'slot', None, 1.7),
+]
+
+
+def test_records_round_trip():
+    store = EventStore.from_records(RECORDS)
+    assert len(store) == len(RECORDS)
+    assert list(store.iter_records()) == RECORDS
+    assert store.record(-1) == RECORDS[-1]
+    assert store.duration() == 1.7 - 1.0
+
+
+def test_names_are_interned():
+    store = EventStore.from_records(RECORDS)
+    assert store.names.count('shift') == 1
+    assert store.key_counts() == {'shift': 1, 'A': 1}
+
+
+def test_slice_and_copy_are_independent():
+    store = EventStore.from_records(RECORDS)
+    store.meta = {'timing': {'scale': 2.0}}
+    part = store[1:3]
+    assert list(part.iter_records()) == RECORDS[1:3]
+    copy = store.copy()
+    copy.append('b', 'down', 48, 2.0)
+    copy.meta['note'] = 'x'
+    assert len(store) == len(RECORDS)
+    assert 'note' not in store.meta
+
+
+def test_insert_pop_and_version():
+    store = EventStore.from_records(RECORDS)
+    version = store.version
+    store.insert(0, 'b', 'down', 48, 0.5)
+    assert store.record(0) == ('b', 'down', 48, 0.5)
+    assert store.pop(0) == ('b', 'down', 48, 0.5)
+    assert list(store.iter_records()) == RECORDS
+    assert store.version == version + 2
+
+
+def test_checksum_follows_content():
+    store = EventStore.from_records(RECORDS)
+    assert store.checksum() == EventStore.from_records(RECORDS).checksum()
+    other = store.copy()
+    other.pop()
+    assert other.checksum() != store.checksum()
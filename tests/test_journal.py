@@ -0,0 +1,82 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from journal import JournalRecorder, read_journal, recover_journal
+
+
+def event(name, event_type, scan_code, t):
+    return SimpleNamespace(name=name, event_type=event_type, scan_code=scan_code, time=t)
+
+
+class FakeHook:
+    """代替 keyboard 的全局钩子，测试里直接把事件喂给记录器"""
+
+    def __init__(self):
+        self.callback = None
+
+    def hook(self, callback):
+        self.callback = callback
+
+    def unhook(self, callback):
+        assert callback == self.callback
+        self.callback = None
+
+
+def record(path, events, **kwargs):
+    hook = FakeHook()
+    finished = threading.Event()
+    recorder = JournalRecorder(str(path), hook=hook.hook, unhook=hook.unhook,
+                               on_finished=finished.set, flush_interval=0.01,
+                               poll_interval=0.001, **kwargs)
+    recorder.start()
+    for event in events:
+        hook.callback(event)
+    recorder.wait(5)
+    assert finished.is_set()
+    assert hook.callback is None
+    return recorder
+
+
+def test_stop_key_ends_recording_and_is_not_written(tmp_path):
+    path = tmp_path / 'rec.journal'
+    events = [event('a', 'down', 30, 1.0), event('a', 'up', 30, 1.1),
+              event('esc', 'down', 1, 1.2), event('b', 'down', 48, 1.3)]
+    recorder = record(path, events)
+    records, _ = read_journal(str(path))
+    assert records == [('a', 'down', 30, 1.0), ('a', 'up', 30, 1.1)]
+    assert recorder.event_count == 2
+
+
+def test_repeats_are_not_journaled(tmp_path):
+    path = tmp_path / 'rec.journal'
+    events = [event('a', 'down', 30, 1.0), event('a', 'down', 30, 1.03),
+              event('a', 'up', 30, 1.1), event('esc', 'down', 1, 1.2)]
+    recorder = record(path, events)
+    assert [r[1] for r in read_journal(str(path))[0]] == ['down', 'up']
+    assert recorder.capture.repeats_dropped == 1
+
+
+def test_recover_truncates_partial_tail(tmp_path):
+    path = tmp_path / 'crash.journal'
+    complete = json.dumps(['a', 'down', 30, 1.0]) + '\n' + json.dumps(['a', 'up', 30, 1.1]) + '\n'
+    path.write_bytes(complete.encode() + b'["b", "do')
+    assert recover_journal(str(path)) == [('a', 'down', 30, 1.0), ('a', 'up', 30, 1.1)]
+    assert path.read_bytes() == complete.encode()
+    # 已经完整的日志不再改动
+    assert recover_journal(str(path)) == [('a', 'down', 30, 1.0), ('a', 'up', 30, 1.1)]
+
+
+def test_hook_failure_propagates_without_finishing(tmp_path):
+    finished = []
+
+    def broken_hook(callback):
+        raise OSError("no hook")
+
+    recorder = JournalRecorder(str(tmp_path / 'rec.journal'), hook=broken_hook,
+                               unhook=lambda callback: None, on_finished=lambda: finished.append(1))
+    with pytest.raises(OSError):
+        recorder.start()
+    assert finished == []
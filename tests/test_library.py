@@ -0,0 +1,87 @@
+import os
+
+from event_store import EventStore
+from library import MacroLibrary
+from recording_format import save_store
+from timeline import TimelineCache
+from timing import TimingProfile
+
+
+def save(path, records, binary=False):
+    save_store(str(path), EventStore.from_records(records), binary=binary)
+    return os.path.abspath(path)
+
+
+def make_library(tmp_path, **kwargs):
+    return MacroLibrary(str(tmp_path), str(tmp_path / 'library.db'), **kwargs)
+
+
+def test_scan_search_and_tags(tmp_path):
+    save(tmp_path / 'keyboard_record_copy.json', [('ctrl', 'down', 29, 0.0), ('c', 'down', 46, 0.1)])
+    save(tmp_path / 'login.kbr', [('tab', 'down', 15, 0.0), ('tab', 'up', 15, 0.1)], binary=True)
+    (tmp_path / 'notes.json').write_text('{"not": "a recording"}', encoding='utf-8')
+    library = make_library(tmp_path)
+    updated, removed, failed = library.scan()
+    assert (updated, removed) == (2, 0)
+    assert [os.path.basename(path) for path in failed] == ['notes.json']
+    assert [row['name'] for row in library.search()] == ['copy', 'login']
+    assert [row['name'] for row in library.search('tab')] == ['login']
+
+    path = os.path.abspath(tmp_path / 'login.kbr')
+    library.set_tags(path, [' work ', '', 'daily'])
+    assert [row['name'] for row in library.search(tag='daily')] == ['login']
+    assert library.get(path)['tags'] == 'work,daily'
+
+    assert library.scan()[:2] == (0, 0)
+    os.remove(path)
+    assert library.scan()[:2] == (0, 1)
+    library.close()
+
+
+def test_load_returns_independent_copies(tmp_path):
+    path = save(tmp_path / 'a.json', [('a', 'down', 30, 0.0), ('a', 'up', 30, 0.1)])
+    library = make_library(tmp_path)
+    first = library.load(path)
+    first.append('b', 'down', 48, 0.2)
+    assert len(library.load(path)) == 2
+    library.close()
+
+
+def test_load_rereads_changed_files_and_evicts(tmp_path):
+    a = save(tmp_path / 'a.json', [('a', 'down', 30, 0.0), ('a', 'up', 30, 0.1)])
+    b = save(tmp_path / 'b.json', [('b', 'down', 48, 0.0), ('b', 'up', 48, 0.1)])
+    library = make_library(tmp_path, max_cached_events=3)
+    library.load(a)
+    library.load(b)
+    assert list(library._cache) == [b]
+    save(a, [('x', 'down', 45, 0.0)])
+    os.utime(a, (1, 1))
+    assert library.load(a).record(0)[0] == 'x'
+    library.close()
+
+
+def test_timeline_cache_hits_across_library_loads(tmp_path):
+    path = save(tmp_path / 'a.json', [('a', 'down', 30, 0.0), ('a', 'up', 30, 0.1)])
+    library = make_library(tmp_path)
+    cache = TimelineCache()
+    profile = TimingProfile()
+    first = cache.get(library.load(path), profile)
+    assert cache.get(library.load(path), profile) is first
+    assert len(cache) == 1
+
+    edited = library.load(path)
+    edited.append('b', 'down', 48, 0.2)
+    assert cache.get(edited, profile) is not first
+    assert cache.get(library.load(path), TimingProfile(scale=2.0)) is not first
+    assert len(cache) == 3
+    library.close()
+
+
+def test_timeline_cache_evicts_by_event_count():
+    cache = TimelineCache(max_events=3)
+    profile = TimingProfile()
+    stores = [EventStore.from_records([(name, 'down', None, 0.0), (name, 'up', None, 0.1)])
+              for name in 'abc']
+    for store in stores:
+        cache.get(store, profile)
+    assert len(cache) == 1
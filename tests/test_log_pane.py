@@ -0,0 +1,100 @@
+import threading
+
+from log_pane import LogPane
+
+
+class FakeRoot:
+    """记下 after 注册的回调，测试里手动触发"""
+
+    def __init__(self):
+        self.scheduled = {}
+        self._next_id = 0
+
+    def after(self, ms, callback):
+        self._next_id += 1
+        self.scheduled[self._next_id] = callback
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        del self.scheduled[after_id]
+
+    def tick(self):
+        for after_id, callback in list(self.scheduled.items()):
+            del self.scheduled[after_id]
+            callback()
+
+
+class FakeText:
+    """只实现 LogPane 用到的 Text 方法，行号从 1 开始，'end' 后面总有一个换行"""
+
+    def __init__(self):
+        self.content = ''
+        self.inserts = 0
+
+    def insert(self, index, text):
+        assert index == 'end'
+        self.content += text
+        self.inserts += 1
+
+    def index(self, index):
+        assert index == 'end-1c'
+        return f"{self.content.count(chr(10)) + 1}.{len(self.content.rsplit(chr(10), 1)[-1])}"
+
+    def delete(self, start, end):
+        if end == 'end':
+            self.content = ''
+            return
+        line = int(str(end).split('.')[0])
+        self.content = ''.join(self.content.splitlines(keepends=True)[line - 1:])
+
+    def see(self, index):
+        pass
+
+
+def make_pane(**kwargs):
+    root = FakeRoot()
+    text = FakeText()
+    pane = LogPane(root, text, **kwargs)
+    pane.start()
+    return pane, root, text
+
+
+def test_writes_are_batched_into_one_insert():
+    pane, root, text = make_pane()
+    threads = [threading.Thread(target=lambda i=i: [pane.write(f"{i}-{j}\n") for j in range(100)])
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert text.inserts == 0
+    root.tick()
+    assert text.inserts == 1
+    assert text.content.count('\n') == 400
+    # 刷新后继续定时
+    assert len(root.scheduled) == 1
+
+
+def test_keeps_only_last_max_lines():
+    pane, root, text = make_pane(max_lines=10)
+    for i in range(25):
+        pane.write(f"line {i}\n")
+    root.tick()
+    # 最后一行换行后面的空行也算一行
+    assert text.content.splitlines() == [f"line {i}" for i in range(16, 25)]
+
+
+def test_pending_messages_are_bounded():
+    pane, root, text = make_pane(max_pending=5)
+    for i in range(20):
+        pane.write(f"{i}\n")
+    root.tick()
+    assert text.content == '15\n16\n17\n18\n19\n'
+
+
+def test_stop_cancels_refresh():
+    pane, root, text = make_pane()
+    pane.stop()
+    pane.write("late\n")
+    root.tick()
+    assert text.content == '' and not root.scheduled
@@ -0,0 +1,57 @@
+from event_store import EventStore
+from optimizer import optimize
+
+
+def records_of(store):
+    return [(name, event_type, scan_code) for name, event_type, scan_code, _t in store.iter_records()]
+
+
+def test_collapses_repeats_and_balances_ups():
+    store = EventStore.from_records([
+        ('a', 'up', 30, 0.0),
+        ('b', 'down', 48, 0.1),
+        ('b', 'down', 48, 0.2),
+        ('b', 'down', 48, 0.3),
+        ('b', 'up', 48, 0.4),
+        ('enter', 'down', 28, 0.5),
+    ])
+    optimized, report = optimize(store, merge_text=False)
+    assert records_of(optimized) == [('b', 'down', 48), ('b', 'up', 48),
+                                     ('enter', 'down', 28), ('enter', 'up', 28)]
+    assert (report.repeats_collapsed, report.unmatched_ups_dropped, report.ups_added) == (2, 1, 1)
+    assert len(store) == 6
+
+
+def test_shifted_key_is_paired_by_scan_code():
+    store = EventStore.from_records([
+        ('shift', 'down', 42, 0.0), ('A', 'down', 30, 0.1),
+        ('shift', 'up', 42, 0.2), ('a', 'up', 30, 0.3),
+    ])
+    optimized, report = optimize(store, merge_text=False)
+    assert records_of(optimized) == records_of(store)
+    assert report.unmatched_ups_dropped == report.ups_added == 0
+
+
+def test_drops_lone_ctrl_and_shift_but_not_alt():
+    store = EventStore.from_records([
+        ('ctrl', 'down', 29, 0.0), ('ctrl', 'up', 29, 0.1),
+        ('alt', 'down', 56, 0.2), ('alt', 'up', 56, 0.3),
+    ])
+    optimized, report = optimize(store, merge_text=False)
+    assert records_of(optimized) == [('alt', 'down', 56), ('alt', 'up', 56)]
+    assert report.toggles_dropped == 1
+
+
+def test_merges_typed_characters_into_text():
+    records = []
+    t = 0.0
+    for name, scan_code in [('h', 35), ('i', 23), ('space', 57), ('x', 45)]:
+        records += [(name, 'down', scan_code, t), (name, 'up', scan_code, t + 0.05)]
+        t += 0.1
+    records += [('ctrl', 'down', 29, t), ('c', 'down', 46, t + 0.1),
+                ('c', 'up', 46, t + 0.2), ('ctrl', 'up', 29, t + 0.3)]
+    optimized, report = optimize(EventStore.from_records(records))
+    assert records_of(optimized) == [('hi x', 'text', None), ('ctrl', 'down', 29),
+                                     ('c', 'down', 46), ('c', 'up', 46), ('ctrl', 'up', 29)]
+    assert report.text_runs == 1
+    assert report.seconds_after <= report.seconds_before
@@ -0,0 +1,116 @@
+import threading
+from array import array
+
+import pytest
+
+from event_store import UP, DOWN, TEXT, SLOT
+from playback import PlaybackEngine, PlaybackProgress, FakeBackend
+from timeline import Timeline
+
+
+class FakeClock:
+    """sleep 只把时间往前拨，回放不用真的等待"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+def make_engine(backend_class=FakeBackend):
+    clock = FakeClock()
+    backend = backend_class(clock)
+    engine = PlaybackEngine(backend, spin=0.0, clock=clock, sleep=clock.sleep)
+    return engine, backend, clock
+
+
+def make_timeline(events):
+    """[(offset, op, key)] -> Timeline"""
+    return Timeline(array('d', [e[0] for e in events]), array('b', [e[1] for e in events]),
+                    tuple(e[2] for e in events))
+
+
+def test_events_sent_in_order_at_their_offsets():
+    engine, backend, clock = make_engine()
+    timeline = make_timeline([(0.0, DOWN, 30), (0.05, UP, 30), (0.2, TEXT, 'hello'),
+                              (0.5, DOWN, 'enter'), (0.6, UP, 'enter')])
+    progress = PlaybackProgress()
+    assert engine.play_timeline(timeline, progress=progress)
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [
+        ('down', 30), ('up', 30), ('text', 'hello'), ('down', 'enter'), ('up', 'enter')]
+    for (sent, _, _), offset in zip(backend.sent, timeline.offsets):
+        assert sent - engine.scheduled_start == pytest.approx(offset, abs=1e-5)
+    assert progress.index == progress.total == len(timeline)
+    assert engine.max_lateness < 1e-5
+
+
+def test_cancel_releases_held_keys():
+    cancel = threading.Event()
+
+    class CancellingBackend(FakeBackend):
+        def press(self, key):
+            super().press(key)
+            if key == 30:
+                cancel.set()
+
+    engine, backend, clock = make_engine(CancellingBackend)
+    timeline = make_timeline([(0.0, DOWN, 42), (0.1, DOWN, 30), (0.2, UP, 30), (0.3, UP, 42)])
+    progress = PlaybackProgress()
+    assert not engine.play_timeline(timeline, cancel, progress)
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [
+        ('down', 42), ('down', 30), ('up', 42), ('up', 30)]
+    assert progress.index == 2
+
+
+def test_resume_presses_keys_held_before_start_index():
+    engine, backend, clock = make_engine()
+    timeline = make_timeline([(0.0, DOWN, 42), (0.1, DOWN, 30), (0.2, UP, 30), (0.3, UP, 42)])
+    assert engine.play_timeline(timeline, start_index=2)
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [
+        ('down', 42), ('down', 30), ('up', 30), ('up', 42)]
+
+
+def test_unfilled_slot_raises_and_releases_keys():
+    engine, backend, clock = make_engine()
+    timeline = make_timeline([(0.0, DOWN, 42), (0.1, SLOT, 'name')])
+    with pytest.raises(ValueError):
+        engine.play_timeline(timeline)
+    assert backend.sent[-1][1:] == ('up', 42)
+
+
+def test_cancel_during_long_gap_stops_within_one_slice():
+    engine, backend, clock = make_engine()
+    cancel = threading.Event()
+    sleep = clock.sleep
+
+    def sleep_and_cancel(seconds):
+        sleep(seconds)
+        if clock.now >= 101.0:
+            cancel.set()
+
+    engine.sleep = sleep_and_cancel
+    timeline = make_timeline([(0.0, DOWN, 30), (60.0, UP, 30)])
+    assert not engine.play_timeline(timeline, cancel)
+    # 取消后不再等剩下的一分钟，按着的键被抬起
+    assert clock.now < 101.0 + 2 * engine.max_slice
+    assert [(event_type, key) for _, event_type, key in backend.sent] == [('down', 30), ('up', 30)]
+    assert not engine.wait(10.0, cancel)
+
+
+def test_progress_snapshot_reports_percent_and_eta():
+    progress = PlaybackProgress(iterations=2)
+    now = [0.0]
+    progress.clock = lambda: now[0]
+    progress.begin()
+    assert progress.snapshot() == (0, 0, 0, 0.0, None)
+    progress.iteration, progress.total, progress.index = 2, 10, 5
+    now[0] = 3.0
+    iteration, index, total, percent, eta = progress.snapshot()
+    assert (iteration, index, total) == (2, 5, 10)
+    assert percent == pytest.approx(75.0)
+    assert eta == pytest.approx(1.0)
+    assert progress.position() == (2, 5)
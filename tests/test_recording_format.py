@@ -0,0 +1,107 @@
+import json
+import struct
+
+import pytest
+
+import recording_format
+from event_store import EventStore
+from recording_format import (KbrRecording, RecordingFormatError, is_kbr_file, json_to_kbr,
+                              kbr_to_json, load_json_records, load_kbr_records, load_store,
+                              save_json_records, save_kbr_records, save_kbr_store, save_store)
+
+RECORDS = [
+    ('ctrl', 'down', 29, 1712345678.25),
+    ('c', 'down', 46, 1712345678.3),
+    ('c', 'up', 46, 1712345678.35),
+    ('ctrl', 'up', 29, 1712345678.4),
+    ('你好 world', 'text', None, 1712345679.0),
+    ('clipboard:changed', 'sync', None, 1712345679.5),
+    (None, 'down', None, 1712345680.0),
+    ('name', 'slot', None, 1712345680.1),
+]
+META = {'timing': {'scale': 2.0}}
+
+
+def test_json_round_trip_keeps_old_layout(tmp_path):
+    path = tmp_path / 'a.json'
+    save_json_records(path, RECORDS)
+    with open(path, encoding='utf-8') as f:
+        assert isinstance(json.load(f), list)
+    assert load_json_records(path) == RECORDS
+
+
+def test_json_store_round_trip_with_meta(tmp_path):
+    path = tmp_path / 'a.json'
+    store = EventStore.from_records(RECORDS)
+    store.meta = META
+    save_store(path, store)
+    loaded = load_store(path)
+    assert list(loaded.iter_records()) == RECORDS
+    assert loaded.meta == META
+
+
+def test_kbr_round_trip(tmp_path):
+    path = tmp_path / 'a.kbr'
+    store = EventStore.from_records(RECORDS)
+    store.meta = META
+    save_store(path, store, binary=True)
+    assert is_kbr_file(path)
+    loaded = load_store(path)
+    assert list(loaded.iter_records()) == RECORDS
+    assert loaded.meta == META
+    assert load_kbr_records(path) == RECORDS
+    with KbrRecording(path) as recording:
+        assert len(recording) == len(RECORDS)
+        assert recording.record(-1) == RECORDS[-1]
+        with pytest.raises(IndexError):
+            recording.record(len(RECORDS))
+
+
+def test_kbr_holds_many_long_names(tmp_path):
+    path = tmp_path / 'a.kbr'
+    records = [(f'text {i} ' + 'x' * (70000 if i == 0 else 0), 'text', None, float(i))
+               for i in range(20000)]
+    save_kbr_records(path, records)
+    assert load_kbr_records(path) == records
+
+
+def test_convert_both_ways(tmp_path):
+    src, kbr, back = tmp_path / 'a.json', tmp_path / 'a.kbr', tmp_path / 'b.json'
+    store = EventStore.from_records(RECORDS)
+    store.meta = META
+    save_store(src, store)
+    json_to_kbr(src, kbr)
+    kbr_to_json(kbr, back)
+    assert load_json_records(back) == RECORDS
+    assert load_store(back).meta == META
+
+
+def test_rejects_unknown_version(tmp_path):
+    path = tmp_path / 'a.kbr'
+    save_kbr_records(path, RECORDS)
+    data = bytearray(path.read_bytes())
+    struct.pack_into('<H', data, 4, recording_format.KBR_VERSION + 1)
+    path.write_bytes(bytes(data))
+    with pytest.raises(RecordingFormatError):
+        KbrRecording(path)
+
+
+def test_rejects_bad_files(tmp_path):
+    path = tmp_path / 'bad.kbr'
+    path.write_bytes(b'KBRF')
+    with pytest.raises(RecordingFormatError):
+        KbrRecording(path)
+
+    save_kbr_records(path, RECORDS)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(RecordingFormatError):
+        KbrRecording(path)
+
+    path.write_bytes(b'{"events": null}')
+    with pytest.raises(RecordingFormatError):
+        load_store(path)
+
+
+def test_scan_code_out_of_range(tmp_path):
+    with pytest.raises(RecordingFormatError):
+        save_kbr_store(tmp_path / 'a.kbr', EventStore.from_records([('x', 'down', 70000, 0.0)]))
@@ -0,0 +1,126 @@
+import datetime
+import threading
+import time
+from array import array
+
+import pytest
+
+from event_store import DOWN, UP, SLOT
+from playback import PlaybackEngine, FakeBackend
+from scheduler import (Job, JobScheduler, acquire_injection, parse_start_time,
+                       DONE, CANCELLED, FAILED)
+from timeline import Timeline
+
+
+def key_timeline(key, op=DOWN):
+    return Timeline(array('d', [0.0, 0.001]), array('b', [op, UP]), (key, key))
+
+
+def make_scheduler():
+    backend = FakeBackend()
+    scheduler = JobScheduler(PlaybackEngine(backend, spin=0.0), gap=0.0)
+    return scheduler, backend
+
+
+def wait_finished(jobs, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not all(job.finished for job in jobs):
+        assert time.monotonic() < deadline, [job.state for job in jobs]
+        time.sleep(0.005)
+
+
+def sent_keys(backend):
+    return [key for _, event_type, key in backend.sent if event_type == 'down']
+
+
+def test_parse_start_time():
+    now = datetime.datetime(2024, 5, 1, 12, 0, 0).timestamp()
+    assert parse_start_time('', now) == now
+    assert parse_start_time('13:30', now) == now + 5400
+    # 已经过了的时刻取明天
+    assert parse_start_time('11:59:30', now) == now - 30 + 86400
+    for bad in ('13', '25:00', 'a:b', '1:2:3:4'):
+        with pytest.raises(ValueError):
+            parse_start_time(bad, now)
+
+
+def test_acquire_injection_gives_up_on_cancel():
+    lock = threading.Lock()
+    lock.acquire()
+    cancel = threading.Event()
+    cancel.set()
+    assert not acquire_injection(lock, cancel, poll=0.01)
+    lock.release()
+    assert acquire_injection(lock, cancel)
+
+
+def test_job_validation():
+    with pytest.raises(ValueError):
+        Job('bad', key_timeline('a'), interval=0)
+    with pytest.raises(ValueError):
+        Job('bad', key_timeline('a'), interval=1, count=0)
+    # 不重复的任务只运行一次
+    assert Job('once', key_timeline('a'), count=5).count == 1
+
+
+def test_runs_by_priority_one_job_at_a_time():
+    scheduler, backend = make_scheduler()
+    jobs = [scheduler.submit(Job(key, key_timeline(key), priority=priority))
+            for key, priority in (('low', 0), ('high', 5), ('mid', 1))]
+    scheduler.start()
+    try:
+        wait_finished(jobs)
+    finally:
+        scheduler.stop(1)
+    assert sent_keys(backend) == ['high', 'mid', 'low']
+    # 每个任务的按下和抬起紧挨着，没有交错
+    assert [key for _, _, key in backend.sent] == ['high', 'high', 'mid', 'mid', 'low', 'low']
+    assert all(job.state == DONE and job.runs == 1 and job.events_sent == 2 for job in jobs)
+
+
+def test_repeating_job_runs_count_times():
+    scheduler, backend = make_scheduler()
+    job = scheduler.submit(Job('repeat', key_timeline('r'), interval=0.01, count=3))
+    scheduler.start()
+    try:
+        wait_finished([job])
+    finally:
+        scheduler.stop(1)
+    assert job.state == DONE and job.runs == 3
+    assert sent_keys(backend) == ['r', 'r', 'r']
+    assert job.describe_stats()
+
+
+def test_failed_and_cancelled_jobs_do_not_block_others():
+    scheduler, backend = make_scheduler()
+    broken = scheduler.submit(Job('broken', key_timeline('slot', SLOT), priority=2))
+    cancelled = scheduler.submit(Job('cancelled', key_timeline('c'), priority=1))
+    good = scheduler.submit(Job('good', key_timeline('g')))
+    assert scheduler.cancel(cancelled.id)
+    assert not scheduler.cancel(cancelled.id)
+    scheduler.start()
+    try:
+        wait_finished([broken, good])
+    finally:
+        scheduler.stop(1)
+    assert broken.state == FAILED and '槽位' in broken.last_error
+    assert cancelled.state == CANCELLED
+    assert good.state == DONE
+    assert sent_keys(backend) == ['g']
+    scheduler.remove_finished()
+    assert scheduler.jobs() == []
+
+
+def test_waits_for_injection_lock_held_elsewhere():
+    scheduler, backend = make_scheduler()
+    scheduler.lock.acquire()
+    job = scheduler.submit(Job('queued', key_timeline('q')))
+    scheduler.start()
+    try:
+        time.sleep(0.1)
+        assert backend.sent == [] and scheduler.current is job
+        scheduler.lock.release()
+        wait_finished([job])
+    finally:
+        scheduler.stop(1)
+    assert job.state == DONE and sent_keys(backend) == ['q']
@@ -0,0 +1,113 @@
+from array import array
+
+import pytest
+
+from event_store import EventStore, DOWN, UP, SYNC
+from playback import PlaybackEngine, FakeBackend
+from sync import (SyncContext, SyncPoint, SyncTimeout, InProcessClipboard, STANDALONE_SYNC_KINDS,
+                  insert_sync_point)
+from timeline import Timeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+def make_engine(context):
+    clock = FakeClock()
+    backend = FakeBackend(clock)
+    engine = PlaybackEngine(backend, spin=0.0, clock=clock, sleep=clock.sleep, sync_context=context)
+    return engine, backend, clock
+
+
+def sync_timeline(point):
+    name = point.to_name()
+    return Timeline(array('d', [0.0, 0.1, 0.2, 0.3]), array('b', [DOWN, UP, SYNC, DOWN]),
+                    (30, 30, name, 31))
+
+
+def test_sync_point_name_round_trip():
+    point = SyncPoint('file', '/tmp/标记', timeout=5, poll=0.5, on_timeout='continue')
+    restored = SyncPoint.from_name(point.to_name())
+    assert (restored.kind, restored.arg, restored.timeout, restored.poll, restored.on_timeout) == \
+        ('file', '/tmp/标记', 5, 0.5, 'continue')
+
+
+def test_sync_point_rejects_bad_config():
+    with pytest.raises(ValueError):
+        SyncPoint('window')
+    with pytest.raises(ValueError):
+        SyncPoint('file', 'x', timeout=0)
+
+
+def test_gui_kinds_need_no_registration():
+    context = SyncContext()
+    for kind in STANDALONE_SYNC_KINDS:
+        context.make_predicate(SyncPoint(kind, 'marker'))
+
+
+def test_unregistered_callback_is_an_error():
+    with pytest.raises(ValueError):
+        SyncContext().make_predicate(SyncPoint('callback', 'missing'))
+
+
+def test_file_predicate_waits_for_marker(tmp_path):
+    marker = tmp_path / 'done'
+    predicate = SyncContext().make_predicate(SyncPoint('file', str(marker)))
+    predicate.arm()
+    assert not predicate.check()
+    marker.write_text('ok')
+    assert predicate.check()
+
+
+def test_clipboard_predicate_fires_on_change():
+    clipboard = InProcessClipboard('before')
+    predicate = SyncContext(clipboard.read).make_predicate(SyncPoint('clipboard'))
+    predicate.arm()
+    assert not predicate.check()
+    clipboard.write('after')
+    assert predicate.check()
+
+
+def test_insert_sync_point_keeps_timing():
+    store = EventStore.from_records([('a', 'down', 30, 1.0), ('a', 'up', 30, 1.5)])
+    point = SyncPoint('clipboard')
+    insert_sync_point(store, 1, point)
+    assert list(store.iter_records()) == [('a', 'down', 30, 1.0), (point.to_name(), 'sync', None, 1.0),
+                                          ('a', 'up', 30, 1.5)]
+    with pytest.raises(IndexError):
+        insert_sync_point(store, 5, point)
+
+
+def test_playback_waits_for_sync_and_retimes_after_it():
+    checks = []
+    context = SyncContext()
+    context.register_callback('ready', lambda: len(checks) > 3 or checks.append(None))
+    engine, backend, _clock = make_engine(context)
+    assert engine.play_timeline(sync_timeline(SyncPoint('callback', 'ready', poll=1.0)))
+    (t_up, _, _), (t_down, op, key) = backend.sent[1], backend.sent[2]
+    assert (op, key) == ('down', 31)
+    # 同步点在抬起后 0.1 秒，条件检查了 4 次才成立，每次间隔 poll 秒；
+    # 之后的事件从同步点结束的时刻起再过 0.1 秒
+    assert t_down - t_up == pytest.approx(0.1 + 4.0 + 0.1, abs=0.01)
+
+
+def test_sync_timeout_fails_or_continues():
+    context = SyncContext()
+    context.register_callback('never', lambda: False)
+    engine, backend, _clock = make_engine(context)
+    with pytest.raises(SyncTimeout):
+        engine.play_timeline(sync_timeline(SyncPoint('callback', 'never', timeout=1.0)))
+    assert backend.sent[-1][1:] == ('up', 30)
+
+    engine, backend, _clock = make_engine(context)
+    assert engine.play_timeline(sync_timeline(
+        SyncPoint('callback', 'never', timeout=1.0, on_timeout='continue')))
+    assert [event[1:] for event in backend.sent[-2:]] == [('down', 31), ('up', 31)]
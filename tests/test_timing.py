@@ -0,0 +1,57 @@
+import pytest
+
+from event_store import EventStore
+from timeline import compile_timeline
+from timing import (KEY_CLASSES, KeyClassifier, TimingProfile, TYPING, NAVIGATION, MODIFIER,
+                    WINDOW_SWITCH, ENTER)
+
+NO_DELAYS = {c: 0.0 for c in KEY_CLASSES}
+
+
+def classify(events):
+    classifier = KeyClassifier()
+    return [classifier.classify(name, event_type) for name, event_type in events]
+
+
+def test_classifies_keys():
+    assert classify([('a', 'down'), ('left', 'down'), ('enter', 'down'), ('hello', 'text'),
+                     ('left shift', 'down'), ('left shift', 'up')]) == [
+        TYPING, NAVIGATION, ENTER, TYPING, MODIFIER, MODIFIER]
+
+
+def test_alt_tab_is_window_switch_until_alt_released():
+    assert classify([('alt', 'down'), ('tab', 'down'), ('tab', 'up'), ('alt', 'up'),
+                     ('tab', 'down')]) == [
+        MODIFIER, WINDOW_SWITCH, WINDOW_SWITCH, WINDOW_SWITCH, NAVIGATION]
+
+
+def test_repeated_modifier_down_is_cleared_by_one_up():
+    assert classify([('ctrl', 'down'), ('ctrl', 'down'), ('ctrl', 'up'), ('alt', 'down'),
+                     ('esc', 'down')])[-1] == WINDOW_SWITCH
+    assert classify([('alt', 'down'), ('alt', 'down'), ('alt', 'up'), ('tab', 'down')])[-1] == NAVIGATION
+
+
+def offsets(records, profile):
+    return list(compile_timeline(EventStore.from_records(records), profile).offsets)
+
+
+def test_gaps_are_capped_scaled_and_floored_per_class():
+    records = [('a', 'down', 30, 0.0), ('a', 'up', 30, 0.2), ('enter', 'down', 28, 5.0),
+               ('enter', 'up', 28, 5.001), ('b', 'down', 48, 5.002)]
+    profile = TimingProfile(scale=2.0, max_gap=1.0, min_delays=dict(NO_DELAYS, enter=0.1))
+    assert offsets(records, profile) == pytest.approx([0.0, 0.1, 0.6, 0.7, 0.8])
+    assert offsets(records, TimingProfile(scale=2.0, max_gap=1.0, min_delays=NO_DELAYS)) == \
+        pytest.approx([0.0, 0.1, 0.6, 0.6005, 0.601])
+
+
+def test_profile_round_trips_and_validates():
+    profile = TimingProfile(scale=1.5, max_gap=0.5, min_delays={ENTER: 0.2}, lead_in=0, iteration_gap=1)
+    restored = TimingProfile.from_dict(profile.to_dict())
+    assert restored.key() == profile.key()
+    assert (restored.lead_in, restored.iteration_gap) == (0, 1)
+    assert TimingProfile.from_dict(None).key() == TimingProfile().key()
+    # 不认识的类别直接忽略
+    assert TimingProfile.from_dict({'min_delays': {'mouse': 1.0}}).key() == TimingProfile().key()
+    for bad in ({'scale': 0}, {'max_gap': -1}, {'lead_in': -1}):
+        with pytest.raises(ValueError):
+            TimingProfile(**bad)
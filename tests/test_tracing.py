@@ -0,0 +1,97 @@
+import json
+from array import array
+
+import tracing
+from event_store import DOWN, UP
+from playback import PlaybackEngine, FakeBackend
+from timeline import Timeline
+from tracing import Tracer, traced
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+class LateBackend(FakeBackend):
+    """每次按下都让时钟多走 10 毫秒，模拟发送很慢"""
+
+    def press(self, key):
+        super().press(key)
+        self.clock.now += 0.01
+
+
+def play_traced(backend_class=FakeBackend):
+    tracer = Tracer()
+    tracer.enable()
+    clock = FakeClock()
+    engine = PlaybackEngine(backend_class(clock), spin=0.0, clock=clock, sleep=clock.sleep,
+                            tracer=tracer)
+    timeline = Timeline(array('d', [0.0, 0.001, 0.002, 0.003]), array('b', [DOWN, UP, DOWN, UP]),
+                        (30, 30, 31, 31))
+    assert engine.play_timeline(timeline)
+    return tracer
+
+
+def test_playback_lateness_is_recorded():
+    tracer = play_traced()
+    assert tracer.lateness.count == 4
+    assert tracer.late_events == 0
+    slow = play_traced(LateBackend)
+    assert slow.late_events == 4
+    assert slow.max_lateness >= 0.01
+    assert 'p50/p95/p99' in slow.summary() and '最大迟到' in slow.summary()
+
+
+def test_export_chrome_trace(tmp_path):
+    tracer = play_traced()
+    path = tmp_path / 'trace.json'
+    tracer.export(str(path))
+    data = json.loads(path.read_text(encoding='utf-8'))
+    events = data['traceEvents']
+    assert [e['args']['index'] for e in events if e['name'] == 'send'] == [0, 1, 2, 3]
+    playback = [e for e in events if e['name'] == 'playback']
+    assert len(playback) == 1 and playback[0]['ph'] == 'X' and 'dur' in playback[0]
+    assert any(e['ph'] == 'M' for e in events)
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    clock = FakeClock()
+    engine = PlaybackEngine(FakeBackend(clock), spin=0.0, clock=clock, sleep=clock.sleep,
+                            tracer=tracer)
+    engine.play_timeline(Timeline(array('d', [0.0]), array('b', [DOWN]), (30,)))
+    with tracer.span('nothing'):
+        pass
+    assert not tracer.events and not tracer.lateness.count
+
+
+def test_event_buffer_is_bounded():
+    tracer = Tracer(max_events=10)
+    tracer.enable()
+    for i in range(100):
+        tracer.instant('tick', 'test', {'i': i})
+    assert len(tracer.events) == 10
+    assert tracer.events[0][6] == {'i': 90}
+
+
+def test_traced_decorator_times_ui_callbacks(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, 'tracer', tracer)
+
+    @traced('refresh')
+    def refresh(x):
+        return x * 2
+
+    assert refresh(2) == 4
+    assert not tracer.events
+    tracer.enable()
+    assert refresh(3) == 6
+    assert tracer.ui_time.count == 1
+    assert tracer.events[0][:3] == ('X', 'refresh', 'ui')
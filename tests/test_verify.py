@@ -0,0 +1,134 @@
+import sys
+import types
+
+import pytest
+
+from event_store import EventStore
+from playback import OutputBackend, PlaybackEngine
+from timeline import compile_timeline
+from timing import KEY_CLASSES, TimingProfile
+from verify import (HookCapture, SimulatedClock, compare, expected_tokens, simulated_verifier,
+                    tune_scale, verify_timeline)
+
+# 假的系统键盘布局：扫描码 -> 键名
+SCAN_NAMES = {29: 'ctrl', 42: 'shift', 30: 'a', 48: 'b', 46: 'c'}
+SCAN_CODES = {name: code for code, name in SCAN_NAMES.items()}
+NO_DELAYS = {key_class: 0.0 for key_class in KEY_CLASSES}
+
+
+def tokens(text):
+    """'d:a u:a' -> [('down', 'a'), ('up', 'a')]"""
+    return [({'d': 'down', 'u': 'up'}[kind], key) for kind, key in
+            (item.split(':') for item in text.split())]
+
+
+def test_compare_finds_drops_duplicates_and_reorders():
+    expected = tokens('d:a u:a d:b u:b d:c u:c')
+    assert compare(expected, list(expected)).clean
+    report = compare(expected, tokens('d:a u:a d:b u:b u:b d:c'))
+    assert report.duplicated == [(4, ('up', 'b'))]
+    assert report.dropped == [(5, ('up', 'c'))]
+    report = compare(expected, tokens('d:a d:b u:a u:b d:c u:c'))
+    assert not report.dropped and not report.duplicated
+    assert len(report.reordered) == 1
+    report = compare(expected, tokens('d:a u:a d:c u:c d:x'))
+    assert report.dropped == [(2, ('down', 'b')), (3, ('up', 'b'))]
+    assert report.unexpected == [(4, ('down', 'x'))]
+
+
+def test_simulated_target_drops_events_when_too_fast():
+    records = []
+    for i in range(100):
+        records += [('a', 'down', 30, i * 0.01), ('a', 'up', 30, i * 0.01 + 0.005)]
+    store = EventStore.from_records(records)
+    verify = simulated_verifier(process_time=0.004, buffer=4)
+    assert verify(compile_timeline(store, TimingProfile(scale=1.0))).clean
+    fast = verify(compile_timeline(store, TimingProfile(scale=20.0, min_delays=NO_DELAYS)))
+    assert fast.dropped and not fast.clean
+
+
+def test_tuner_finds_fastest_clean_speed():
+    records = []
+    for i in range(50):
+        records += [('a', 'down', 30, i * 0.02), ('a', 'up', 30, i * 0.02 + 0.01)]
+    store = EventStore.from_records(records)
+    result = tune_scale(store, simulated_verifier(process_time=0.004, buffer=2),
+                        TimingProfile(min_delays=NO_DELAYS), low=1.0, high=16.0, tolerance=0.5)
+    assert result.scale is not None and 1.0 <= result.scale < 16.0
+    assert all(report.scale is not None for report in result.trials)
+    assert '最快的安全速度' in result.describe()
+
+
+class FakeSystem(OutputBackend):
+    """把回放发送的按键像系统一样送给键盘钩子：钩子事件同时有扫描码和键名，
+    write 按 keyboard.write 的方式输入，大写字母用 shift"""
+
+    def __init__(self):
+        self.hook = None
+
+    def _send(self, event_type, scan_code, name):
+        self.hook(types.SimpleNamespace(event_type=event_type, scan_code=scan_code, name=name))
+
+    def press(self, key):
+        self._send('down', key, SCAN_NAMES[key])
+
+    def release(self, key):
+        self._send('up', key, SCAN_NAMES[key])
+
+    def write(self, text):
+        for character in text:
+            scan_code = SCAN_CODES[character.lower()]
+            if character.isupper():
+                self._send('down', 42, 'shift')
+            self._send('down', scan_code, character)
+            self._send('up', scan_code, character)
+            if character.isupper():
+                self._send('up', 42, 'shift')
+
+
+@pytest.fixture
+def fake_system(monkeypatch):
+    system = FakeSystem()
+    keyboard = types.ModuleType('keyboard')
+
+    def hook(callback):
+        system.hook = callback
+        return callback
+
+    keyboard.hook = hook
+    keyboard.unhook = lambda callback: None
+    monkeypatch.setitem(sys.modules, 'keyboard', keyboard)
+    return system
+
+
+def test_hook_capture_keys_and_text_sharing_scan_codes(fake_system):
+    # ctrl+a 按扫描码回放，后面合并出来的文本里也有 a，系统报告的扫描码一样
+    store = EventStore.from_records([
+        ('ctrl', 'down', 29, 0.0), ('a', 'down', 30, 0.1), ('a', 'up', 30, 0.2),
+        ('ctrl', 'up', 29, 0.3), ('abC', 'text', None, 0.4), ('b', 'down', 48, 0.5),
+        ('b', 'up', 48, 0.6),
+    ])
+    timeline = compile_timeline(store, TimingProfile(min_delays=NO_DELAYS))
+    clock = SimulatedClock()
+    engine = PlaybackEngine(fake_system, spin=0.0, clock=clock, sleep=clock.sleep)
+    report = verify_timeline(engine, timeline, HookCapture(settle=0.0))
+    assert report.clean, report.describe()
+    assert report.actual_count == report.expected_count == len(expected_tokens(timeline))
+
+
+def test_hook_capture_still_reports_a_dropped_key(fake_system):
+    store = EventStore.from_records([
+        ('ctrl', 'down', 29, 0.0), ('a', 'down', 30, 0.1), ('a', 'up', 30, 0.2),
+        ('ctrl', 'up', 29, 0.3), ('ab', 'text', None, 0.4),
+    ])
+    timeline = compile_timeline(store, TimingProfile(min_delays=NO_DELAYS))
+    capture = HookCapture(settle=0.0)
+    expected = expected_tokens(timeline)
+    capture.start(expected)
+    for event_type, scan_code, name in [('down', 29, 'ctrl'), ('down', 30, 'a'), ('up', 30, 'a'),
+                                        ('up', 29, 'ctrl'), ('down', 30, 'a'), ('up', 30, 'a'),
+                                        ('up', 48, 'b')]:
+        fake_system._send(event_type, scan_code, name)
+    report = compare(expected, capture.stop())
+    assert report.dropped == [(6, ('down', 'b'))]
+    assert not report.duplicated and not report.unexpected
@@ -0,0 +1,96 @@
+"""把记录编译成不可变的回放时间线，回放时只需顺序遍历"""
+from array import array
+from collections import OrderedDict
+
+from event_store import EVENT_TYPES, SYNC
+from timing import TimingProfile, KeyClassifier
+
+class Timeline:
+    """预先算好的回放时间线
+
+    offsets: 每个事件相对回放开始的偏移（秒）
+    ops:     操作类型，和 EventStore 的事件类型编码相同（0 抬起、1 按下、2 输入文本、3 同步点、4 模板槽位）
+    keys:    发送用的键（扫描码或键名）
+    """
+
+    __slots__ = ('offsets', 'ops', 'keys')
+
+    def __init__(self, offsets, ops, keys):
+        self.offsets = offsets
+        self.ops = ops
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def duration(self):
+        """回放一遍需要的时间（秒）"""
+        return self.offsets[-1] if self.offsets else 0.0
+
+
+def compile_timeline(store, profile=None):
+    """按时序配置把 EventStore 编译成时间线，不修改原始事件的时间戳
+
+    相邻事件的间隔 = max(min(记录的间隔, max_gap) / scale, 前一个事件所属类别的最小延迟)
+    """
+    if profile is None:
+        profile = TimingProfile()
+    scale = profile.scale
+    max_gap = profile.max_gap
+    min_delays = profile.min_delays
+    classifier = KeyClassifier()
+    names = store.names
+    event_types = EVENT_TYPES
+
+    offsets = array('d')
+    offset = 0.0
+    previous_time = None
+    previous_delay = 0.0
+    for type_code, name_id, t in zip(store.types, store.name_ids, store.times):
+        if previous_time is not None:
+            gap = min(max(t - previous_time, 0.0), max_gap) / scale
+            offset += gap if gap > previous_delay else previous_delay
+        offsets.append(offset)
+        previous_time = t
+        if type_code == SYNC:
+            # 同步点结束时目标已经就绪，不需要再等最小延迟
+            previous_delay = 0.0
+        else:
+            previous_delay = min_delays[classifier.classify(names[name_id], event_types[type_code])]
+
+    ops = array('b', store.types)
+    # 和 keyboard.play 一样，优先用扫描码，没有扫描码才用键名；文本事件的扫描码是 -1，取到的是文本
+    keys = tuple([scan_code if scan_code > 0 else names[name_id]
+                  for scan_code, name_id in zip(store.scan_codes, store.name_ids)])
+    return Timeline(offsets, ops, keys)
+
+
+class TimelineCache:
+    """按最近使用顺序缓存编译好的时间线，总事件数超过 max_events 时淘汰最久没用的
+
+    缓存键是记录内容的校验和加上时序配置，同一个宏每次从宏库加载出来的副本也能命中，
+    记录被修改或时序配置变化都会重新编译；缓存里只有时间线，不持有 EventStore。
+    """
+
+    def __init__(self, max_events=1000000):
+        self.max_events = max_events
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get(self, store, profile):
+        key = (store.checksum(), profile.key())
+        timeline = self._entries.get(key)
+        if timeline is not None:
+            self._entries.move_to_end(key)
+            return timeline
+        timeline = compile_timeline(store, profile)
+        self._entries[key] = timeline
+        self._size += len(timeline)
+        while self._size > self.max_events and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self._size -= len(old)
+        return timeline
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,119 @@
+"""时序配置：按记录下来的间隔回放，按倍率缩放，并按键的类别设最小延迟"""
+from keynames import normalize_modifier
+
+# 键的类别
+TYPING = 'typing'
+NAVIGATION = 'navigation'
+MODIFIER = 'modifier'
+WINDOW_SWITCH = 'window_switch'
+ENTER = 'enter'
+KEY_CLASSES = (TYPING, NAVIGATION, MODIFIER, WINDOW_SWITCH, ENTER)
+
+KEY_CLASS_LABELS = {
+    TYPING: '普通输入',
+    NAVIGATION: '方向/翻页',
+    MODIFIER: '修饰键',
+    WINDOW_SWITCH: '切换窗口',
+    ENTER: '回车',
+}
+
+_NAVIGATION_KEYS = {
+    'up', 'down', 'left', 'right', 'home', 'end', 'page up', 'page down',
+    'tab', 'insert', 'delete', 'backspace', 'esc',
+}
+_ENTER_KEYS = {'enter', 'return'}
+# 和这些修饰键一起按下时会切换窗口
+_SWITCH_TRIGGERS = {('alt', 'tab'), ('alt', 'esc'), ('windows', 'tab')}
+
+# 各类别事件之后至少等多久（秒）再发下一个事件
+DEFAULT_MIN_DELAYS = {
+    TYPING: 0.01,
+    NAVIGATION: 0.03,
+    MODIFIER: 0.01,
+    WINDOW_SWITCH: 0.3,
+    ENTER: 0.1,
+}
+
+
+class TimingProfile:
+    """一个宏的时序配置
+
+    scale:      速度倍率，记录下来的间隔除以它
+    max_gap:    记录里超过这个长度（秒，缩放前）的空闲间隔被截短到这个长度
+    min_delays: 每类事件之后到下一个事件之间的最小延迟（秒），不受 scale 影响
+    lead_in:    开始回放前等待的秒数，记录开头有同步点时可以设为 0
+    iteration_gap: 多轮回放之间等待的秒数
+    """
+
+    def __init__(self, scale=1.0, max_gap=1.0, min_delays=None, lead_in=5.0, iteration_gap=0.3):
+        if scale <= 0:
+            raise ValueError("回放速度必须大于0")
+        if max_gap <= 0:
+            raise ValueError("最大间隔必须大于0")
+        if lead_in < 0 or iteration_gap < 0:
+            raise ValueError("等待时间不能小于0")
+        self.scale = scale
+        self.max_gap = max_gap
+        self.lead_in = lead_in
+        self.iteration_gap = iteration_gap
+        self.min_delays = dict(DEFAULT_MIN_DELAYS)
+        if min_delays:
+            self.min_delays.update(min_delays)
+
+    def key(self):
+        """影响时间线的配置，用作时间线缓存的键"""
+        return (self.scale, self.max_gap) + tuple(self.min_delays[c] for c in KEY_CLASSES)
+
+    def to_dict(self):
+        return {'scale': self.scale, 'max_gap': self.max_gap, 'min_delays': dict(self.min_delays),
+                'lead_in': self.lead_in, 'iteration_gap': self.iteration_gap}
+
+    @classmethod
+    def from_dict(cls, data):
+        """从记录文件里的配置创建，没有配置时返回默认配置"""
+        if not data:
+            return cls()
+        return cls(scale=data.get('scale', 1.0), max_gap=data.get('max_gap', 1.0),
+                   min_delays={c: v for c, v in data.get('min_delays', {}).items()
+                               if c in KEY_CLASSES},
+                   lead_in=data.get('lead_in', 5.0),
+                   iteration_gap=data.get('iteration_gap', 0.3))
+
+
+class KeyClassifier:
+    """按顺序喂事件，得到每个事件的类别
+
+    alt+tab 这类组合键从触发键按下到修饰键全部松开，中间的事件都算切换窗口，
+    这样最后松开 alt（真正切换窗口的时刻）之后会等待切换窗口的延迟。
+    """
+
+    def __init__(self):
+        # 按着的修饰键：原始键名 -> 归一化的修饰键名。按住不放时的自动重复只会重复写同一项，
+        # 一次抬起就能清掉，不会因为重复按下而一直认为修饰键还按着
+        self._modifiers = {}
+        self._switching = False
+
+    def classify(self, name, event_type):
+        modifier = normalize_modifier(name)
+        if event_type in ('text', 'slot'):
+            key_class = TYPING
+        elif modifier is not None:
+            if event_type == 'down':
+                self._modifiers[name] = modifier
+            else:
+                self._modifiers.pop(name, None)
+            key_class = WINDOW_SWITCH if self._switching else MODIFIER
+            if not self._modifiers:
+                self._switching = False
+        else:
+            if event_type == 'down' and any((m, name) in _SWITCH_TRIGGERS for m in self._modifiers.values()):
+                self._switching = True
+            if self._switching:
+                key_class = WINDOW_SWITCH
+            elif name in _ENTER_KEYS:
+                key_class = ENTER
+            elif name in _NAVIGATION_KEYS:
+                key_class = NAVIGATION
+            else:
+                key_class = TYPING
+        return key_class
@@ -0,0 +1,174 @@
+"""跟踪：回放迟到、记录钩子延迟、界面回调耗时，可以导出成 Chrome/Perfetto 能打开的跟踪文件
+
+默认关闭，关闭时各处只多一次 tracer.enabled 判断。打开后事件存在有上限的 deque 里，
+分布用 analytics.QuantileSketch 统计，内存不随会话时长增长。
+导出的文件在 chrome://tracing 或 https://ui.perfetto.dev 里打开。
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from analytics import QuantileSketch
+
+# 日志级别可以用这个环境变量指定，比如 KEYBOARD_APP_LOG=debug
+LOG_LEVEL_ENV = 'KEYBOARD_APP_LOG'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(threadName)s %(name)s: %(message)s'
+
+# 迟到超过这个时间（秒）的事件单独计数，目标窗口可能因此丢键
+LATE_THRESHOLD = 0.005
+
+
+class Tracer:
+    """一次跟踪会话
+
+    lateness:     回放时每个事件实际发送时刻 - 计划时刻（秒）
+    hook_latency: 记录时从键盘事件产生到放进队列（秒）
+    ui_time:      界面回调的耗时（秒）
+    """
+
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        self.events = deque(maxlen=self.max_events)
+        self.lateness = QuantileSketch(min_value=1e-6)
+        self.hook_latency = QuantileSketch(min_value=1e-6)
+        self.ui_time = QuantileSketch(min_value=1e-6)
+        self.late_events = 0
+        self.max_lateness = 0.0
+        self._thread_names = {}
+        self._origin = time.perf_counter()
+
+    def enable(self):
+        """清空上一次的数据并开始跟踪"""
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _add(self, phase, name, category, start, duration=None, args=None):
+        thread = threading.current_thread()
+        self._thread_names[thread.ident] = thread.name
+        self.events.append((phase, name, category, start, duration, thread.ident, args))
+
+    def complete(self, name, start, end, category='ui', args=None):
+        """一段耗时，start/end 是 perf_counter 时刻"""
+        self._add('X', name, category, start, end - start, args)
+
+    def instant(self, name, category, args=None):
+        self._add('i', name, category, time.perf_counter(), None, args)
+
+    @contextmanager
+    def span(self, name, category='ui', args=None):
+        """with tracer.span(...): 记录一段耗时，没打开跟踪时什么都不做"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, start, time.perf_counter(), category, args)
+
+    def playback_event(self, index, key, planned, sent):
+        """回放引擎每发送一个事件调用一次，planned/sent 是 perf_counter 时刻"""
+        lateness = sent - planned
+        self.lateness.add(lateness)
+        if lateness > LATE_THRESHOLD:
+            self.late_events += 1
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        self._add('i', 'send', 'playback', sent, None,
+                  {'index': index, 'key': key, 'late_ms': round(lateness * 1000, 3)})
+
+    def hook_event(self, name, event_time):
+        """记录钩子每收到一个事件调用一次，event_time 是 keyboard 事件的 time.time() 时刻"""
+        latency = time.time() - event_time
+        self.hook_latency.add(latency)
+        self._add('i', 'hook', 'record', time.perf_counter(), None,
+                  {'key': name, 'latency_ms': round(latency * 1000, 3)})
+
+    def summary(self):
+        """统计文本"""
+        lines = ["\n跟踪统计:"]
+        for label, sketch in (("回放迟到", self.lateness), ("钩子延迟", self.hook_latency),
+                              ("界面回调耗时", self.ui_time)):
+            if not sketch.count:
+                continue
+            p50, p95, p99 = (sketch.quantile(q) * 1000 for q in (0.5, 0.95, 0.99))
+            lines.append(f"\n  {label}: {sketch.count} 次，p50/p95/p99 "
+                         f"{p50:.2f}/{p95:.2f}/{p99:.2f}ms")
+        if self.lateness.count:
+            lines.append(f"\n  迟到超过 {LATE_THRESHOLD * 1000:g}ms 的事件: {self.late_events}，"
+                         f"最大迟到 {self.max_lateness * 1000:.2f}ms")
+        return ''.join(lines)
+
+    def to_chrome(self):
+        """转换成 Chrome Trace Event Format 的 dict"""
+        pid = os.getpid()
+        origin = self._origin
+        trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                         'args': {'name': name}}
+                        for tid, name in list(self._thread_names.items())]
+        for phase, name, category, start, duration, tid, args in list(self.events):
+            event = {'name': name, 'cat': category, 'ph': phase, 'pid': pid, 'tid': tid,
+                     'ts': (start - origin) * 1e6}
+            if duration is not None:
+                event['dur'] = duration * 1e6
+            if phase == 'i':
+                event['s'] = 't'
+            if args:
+                event['args'] = args
+            trace_events.append(event)
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
+
+
+# 全局跟踪器，和 logging 一样各模块共用一个
+tracer = Tracer()
+
+
+def traced(name=None, category='ui'):
+    """装饰器：跟踪打开时记录函数耗时，界面回调的耗时同时计入 ui_time"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                tracer.complete(label, start, end, category)
+                if category == 'ui':
+                    tracer.ui_time.add(end - start)
+        return wrapper
+    return decorator
+
+
+def setup_logging(filename=None, level=None):
+    """配置日志：filename 为 None 时输出到 stderr；level 默认取环境变量，没有时用 INFO"""
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV, 'info')
+    if isinstance(level, str):
+        level = getattr(logging, level.upper(), logging.INFO)
+    handler = (logging.FileHandler(filename, encoding='utf-8') if filename
+               else logging.StreamHandler())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
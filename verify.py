@@ -0,0 +1,454 @@
+"""回放校验：把回放实际送达的事件和记录对齐，找出丢失、重复和乱序的事件，并自动找出最快的安全速度
+
+送达的事件可以来自真实的键盘钩子（HookCapture），也可以来自本地的模拟目标（LoopbackSink）。
+模拟目标像真实程序一样按固定速度处理输入、输入缓冲区满了就丢，
+配合 SimulatedClock 不用真的等待，也不需要界面和键盘，可以在任何机器上跑。
+对齐用 Myers 差分算法，时间复杂度 O((N+M)D)，D 是差异个数，回放正常时几乎是线性的。
+"""
+import time
+from collections import Counter, defaultdict
+
+from event_store import UP, DOWN, TEXT
+from keynames import is_modifier, key_id
+from playback import OutputBackend, PlaybackEngine
+from timeline import compile_timeline
+from timing import TimingProfile
+
+# 差异超过这么多时不再逐个对齐，只按数量统计
+MAX_EDITS = 2000
+# 同一个事件在前后这么多个事件之内又出现了，算乱序，离得更远算丢失加重复
+REORDER_WINDOW = 8
+
+
+def expected_tokens(timeline):
+    """时间线应该送达的事件 [(event_type, key)]，文本按字符展开成按下和抬起，同步点不发送事件"""
+    tokens = []
+    for op, key in zip(timeline.ops, timeline.keys):
+        if op == DOWN:
+            tokens.append(('down', key))
+        elif op == UP:
+            tokens.append(('up', key))
+        elif op == TEXT:
+            for character in key:
+                tokens.append(('down', character))
+                tokens.append(('up', character))
+    return tokens
+
+
+def _edit_script(a, b, max_edits=MAX_EDITS):
+    """Myers 差分，返回把 a 变成 b 的编辑 [('delete', i) 或 ('insert', j)]，编辑数超过 max_edits 返回 None"""
+    # 先去掉相同的开头和结尾，正常回放时差分只在很短的中间段上做
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    n, m = len(a), len(b)
+
+    v = {1: 0}
+    trace = []
+    for d in range(min(max_edits, n + m) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, x, y, prefix)
+    return None
+
+
+def _backtrack(trace, x, y, prefix):
+    edits = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k]
+        previous_y = previous_x - previous_k
+        if previous_k == k + 1:
+            edits.append(('insert', prefix + previous_y))
+        else:
+            edits.append(('delete', prefix + previous_x))
+        x, y = previous_x, previous_y
+    edits.reverse()
+    return edits
+
+
+class VerifyReport:
+    """一次回放的校验结果
+
+    dropped:    [(记录里的序号, 事件)] 没有送达的事件
+    duplicated: [(送达序列里的序号, 事件)] 多送达的、记录里有的事件
+    reordered:  [(记录里的序号, 送达序列里的序号, 事件)] 送达了但顺序不对的事件
+    unexpected: [(送达序列里的序号, 事件)] 记录里根本没有的事件，比如回放时有人碰了键盘
+    truncated:  差异太多没有逐个对齐，上面的列表只按数量统计，没有序号
+    """
+
+    def __init__(self, expected, actual):
+        self.expected_count = len(expected)
+        self.actual_count = len(actual)
+        self.dropped = []
+        self.duplicated = []
+        self.reordered = []
+        self.unexpected = []
+        self.truncated = False
+        self.scale = None
+
+    @property
+    def clean(self):
+        return not (self.dropped or self.duplicated or self.reordered or self.unexpected)
+
+    def describe(self):
+        speed = f"（速度 {self.scale:g}）" if self.scale is not None else ""
+        text = f"\n校验{speed}: 应送达 {self.expected_count} 个事件，实际送达 {self.actual_count} 个"
+        if self.clean:
+            return text + "，全部正确"
+        text += (f"\n  丢失 {len(self.dropped)}，重复 {len(self.duplicated)}，"
+                 f"乱序 {len(self.reordered)}，多余 {len(self.unexpected)}")
+        if self.truncated:
+            return text + "\n  差异太多，没有逐个对齐"
+        for label, items in (("丢失", self.dropped), ("重复", self.duplicated),
+                             ("多余", self.unexpected)):
+            if items:
+                index, (event_type, key) = items[0]
+                text += f"\n  第一个{label}的事件: 第 {index} 个 {key} {event_type}"
+        if self.reordered:
+            index, actual_index, (event_type, key) = self.reordered[0]
+            text += f"\n  第一个乱序的事件: 第 {index} 个 {key} {event_type} 在第 {actual_index} 个送达"
+        return text
+
+
+def _align(received, expected, window):
+    """钩子事件按顺序对到应送达序列里附近还没对上的事件，返回每个事件对上的序号，对不上是 None
+
+    扫描码和键名哪个对得上用哪个；先往后找，再往前找乱序提前送达时跳过的事件。
+    """
+    matches = []
+    used = set()
+    position = 0
+    n = len(expected)
+    for event_type, scan_code, name in received:
+        candidates = ((event_type, scan_code), (event_type, name))
+        match = None
+        for index in (*range(position, min(position + window, n)),
+                      *range(position - 1, max(position - window, 0) - 1, -1)):
+            if index not in used and expected[index] in candidates:
+                match = index
+                break
+        if match is not None:
+            used.add(match)
+            if match >= position:
+                position = match + 1
+        matches.append(match)
+    return matches
+
+
+def _text_modifier_run(received, matches, expected, i):
+    """received[i] 开始是 keyboard.write 自己加的修饰键时返回它们包着的字符在哪，否则返回 None
+
+    输入大写字母和 shift 符号（有的布局还有 AltGr 字符）时，keyboard.write 按
+    修饰键按下、字符按下、字符抬起、修饰键抬起 发送，记录里没有这几个修饰键事件：
+    修饰键都没对上应送达的事件，中间的字符对上的是文本里的字符。
+    """
+    n = len(received)
+    j = i
+    while j < n and received[j][0] == 'down' and matches[j] is None and is_modifier(received[j][2]):
+        j += 1
+    count = j - i
+    if not count or j + 1 >= n or matches[j] is None or matches[j + 1] is None:
+        return None
+    down, up = expected[matches[j]], expected[matches[j + 1]]
+    if down[0] != 'down' or up[0] != 'up' or not isinstance(down[1], str) or down[1] != up[1]:
+        return None
+    ups = range(j + 2, j + 2 + count)
+    if ups.stop > n or any(received[k][0] != 'up' or matches[k] is not None for k in ups):
+        return None
+    if (Counter(key_id(received[k][2], received[k][1]) for k in ups)
+            != Counter(key_id(name, code) for _, code, name in received[i:j])):
+        return None
+    return j
+
+
+def resolve_keys(received, expected, window=REORDER_WINDOW):
+    """把钩子收到的 (event_type, scan_code, name) 换成和 expected_tokens 可比较的 (event_type, key)
+
+    同一个物理键可能既在记录里按扫描码回放，又在文本里按字符输入（ctrl+a 和文本 "abc" 里的 a），
+    钩子事件本身分不出是哪一种，所以按顺序对到应送达的序列上，对上的就用应送达的那个事件；
+    对不上的，记录里用到的扫描码按扫描码，其余按键名。keyboard.write 自己加的修饰键去掉。
+    """
+    matches = _align(received, expected, window)
+    scan_codes = frozenset(key for _, key in expected if isinstance(key, int))
+    tokens = []
+    i = 0
+    n = len(received)
+    while i < n:
+        j = _text_modifier_run(received, matches, expected, i)
+        if j is not None:
+            tokens.append(expected[matches[j]])
+            tokens.append(expected[matches[j + 1]])
+            # 跳过 修饰键按下、字符按下抬起、同样多个修饰键抬起
+            i = j + 2 + (j - i)
+            continue
+        event_type, scan_code, name = received[i]
+        if matches[i] is not None:
+            tokens.append(expected[matches[i]])
+        else:
+            tokens.append((event_type, scan_code if scan_code in scan_codes else name))
+        i += 1
+    return tokens
+
+
+def compare(expected, actual, max_edits=MAX_EDITS):
+    """对齐应送达和实际送达的事件序列，返回 VerifyReport
+
+    差分里被删掉的是没送达的，被插入的是多出来的；
+    同一个事件在 REORDER_WINDOW 个事件之内既被删掉又被插入，说明它只是送达的顺序不对。
+    """
+    report = VerifyReport(expected, actual)
+    edits = _edit_script(expected, actual, max_edits)
+    if edits is None:
+        # 只按数量统计多出来和缺少的事件
+        report.truncated = True
+        counts = defaultdict(int)
+        for token in expected:
+            counts[token] += 1
+        for token in actual:
+            counts[token] -= 1
+        expected_set = set(expected)
+        for token, count in counts.items():
+            if count > 0:
+                report.dropped.extend((None, token) for _ in range(count))
+            elif token in expected_set:
+                report.duplicated.extend((None, token) for _ in range(-count))
+            else:
+                report.unexpected.extend((None, token) for _ in range(-count))
+        return report
+
+    deleted = defaultdict(list)
+    # (送达序列里的序号, 对应到记录里的位置)
+    inserted = []
+    deletes = inserts = 0
+    for tag, index in edits:
+        if tag == 'delete':
+            deleted[expected[index]].append(index)
+            deletes += 1
+        else:
+            inserted.append((index, index - inserts + deletes))
+            inserts += 1
+    expected_set = set(expected)
+    for index, position in inserted:
+        token = actual[index]
+        candidates = [i for i in deleted.get(token, ()) if abs(i - position) <= REORDER_WINDOW]
+        if candidates:
+            nearest = min(candidates, key=lambda i: abs(i - position))
+            deleted[token].remove(nearest)
+            report.reordered.append((nearest, index, token))
+        elif token in expected_set:
+            report.duplicated.append((index, token))
+        else:
+            report.unexpected.append((index, token))
+    report.dropped = sorted((index, token) for token, indexes in deleted.items() for index in indexes)
+    report.reordered.sort()
+    return report
+
+
+class SimulatedClock:
+    """模拟时钟：sleep 只是把时间往前拨，配合 PlaybackEngine(spin=0) 使用，回放不用真的等待"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # 浮点误差可能让剩余时间一直是一个极小的正数，至少前进 1 微秒
+        self.now += max(seconds, 1e-6)
+
+
+class LoopbackSink(OutputBackend):
+    """本地模拟目标：回放引擎的输出后端，同时记录送达的事件
+
+    目标每 process_time 秒处理一个输入，来不及处理的输入在缓冲区里排队，
+    排队超过 buffer 个时新来的输入被丢掉——和消息队列满了的程序、按键太快的游戏一样。
+    文本按字符展开，每个字符是按下和抬起两个输入。
+    """
+
+    def __init__(self, clock, process_time=0.004, buffer=16):
+        self.clock = clock
+        self.process_time = process_time
+        self.buffer = buffer
+        self.start()
+
+    def start(self, expected=None):
+        self.received = []
+        self.lost = 0
+        self._busy_until = 0.0
+
+    def stop(self):
+        return self.received
+
+    def _deliver(self, event_type, key):
+        now = self.clock()
+        if self._busy_until - now >= self.buffer * self.process_time:
+            self.lost += 1
+            return
+        self._busy_until = max(self._busy_until, now) + self.process_time
+        self.received.append((event_type, key))
+
+    def press(self, key):
+        self._deliver('down', key)
+
+    def release(self, key):
+        self._deliver('up', key)
+
+    def write(self, text):
+        for character in text:
+            self._deliver('down', character)
+            self._deliver('up', character)
+
+
+class HookCapture:
+    """用键盘钩子记录回放时真正进入系统输入流的事件，校验期间不要碰键盘
+
+    钩子事件同时有扫描码和键名，stop 时按应送达的序列决定每个事件用哪一个比较，
+    keyboard.write 输入文本时自己加上的修饰键也在这时去掉，见 resolve_keys。
+    """
+
+    def __init__(self, settle=0.2):
+        # 回放结束后再等一会儿，等最后几个事件经过钩子
+        self.settle = settle
+        self.received = []
+        self._expected = []
+        self._hook = None
+
+    def _on_event(self, event):
+        self.received.append((event.event_type, event.scan_code, event.name))
+
+    def start(self, expected=None):
+        import keyboard
+        self.received = []
+        self._expected = list(expected or ())
+        self._hook = keyboard.hook(self._on_event)
+
+    def stop(self):
+        """停止记录，返回和 expected_tokens 可比较的 [(event_type, key)]"""
+        import keyboard
+        if self._hook is not None:
+            time.sleep(self.settle)
+            keyboard.unhook(self._hook)
+            self._hook = None
+        return resolve_keys(self.received, self._expected)
+
+
+def verify_timeline(engine, timeline, capture, cancel=None):
+    """回放一遍时间线并校验送达的事件，被取消返回 None"""
+    expected = expected_tokens(timeline)
+    capture.start(expected)
+    try:
+        completed = engine.play_timeline(timeline, cancel)
+    finally:
+        actual = capture.stop()
+    if not completed:
+        return None
+    return compare(expected, actual)
+
+
+def live_verifier(engine, cancel=None, gap=1.0):
+    """返回在真实系统上校验的函数：每次回放前等 gap 秒，用键盘钩子记录送达的事件"""
+    def verify(timeline):
+        if cancel is not None:
+            if cancel.wait(gap):
+                return None
+        else:
+            time.sleep(gap)
+        return verify_timeline(engine, timeline, HookCapture(), cancel)
+    return verify
+
+
+def simulated_verifier(**sink_options):
+    """返回在模拟目标上校验的函数 verify(timeline) -> VerifyReport，参数传给 LoopbackSink"""
+    def verify(timeline):
+        clock = SimulatedClock()
+        sink = LoopbackSink(clock, **sink_options)
+        engine = PlaybackEngine(sink, spin=0.0, clock=clock, sleep=clock.sleep)
+        return verify_timeline(engine, timeline, sink)
+    return verify
+
+
+class TuneResult:
+    """自动调速结果：scale 是校验全部通过的最快速度，没有能通过的速度时为 None"""
+
+    def __init__(self):
+        self.scale = None
+        self.trials = []
+
+    def describe(self):
+        lines = [f"\n  速度 {report.scale:g}: {'通过' if report.clean else '失败'}"
+                 for report in self.trials]
+        if self.scale is None:
+            return "\n自动调速: 最低速度也没有通过校验" + ''.join(lines)
+        return f"\n自动调速: 最快的安全速度是 {self.scale:g}" + ''.join(lines)
+
+
+def tune_scale(store, verify, profile=None, low=1.0, high=10.0, tolerance=0.1, repeats=1,
+               cancel=None):
+    """二分查找校验能通过的最快速度
+
+    verify(timeline) 回放一遍并返回 VerifyReport（或者被取消时返回 None），
+    每个速度回放 repeats 遍，全部通过才算通过。假设速度越快越容易出错：
+    先试 low，不通过就放弃；再试 high，通过就直接用；否则在两者之间二分，直到区间小于 tolerance。
+    """
+    base = profile.to_dict() if profile is not None else store.meta.get('timing')
+    result = TuneResult()
+
+    def passes(scale):
+        trial = TimingProfile.from_dict(base)
+        trial.scale = scale
+        timeline = compile_timeline(store, trial)
+        for _ in range(repeats):
+            if cancel is not None and cancel.is_set():
+                return None
+            report = verify(timeline)
+            if report is None:
+                return None
+            report.scale = scale
+            result.trials.append(report)
+            if not report.clean:
+                return False
+        return True
+
+    outcome = passes(low)
+    if not outcome:
+        return result
+    result.scale = low
+    outcome = passes(high)
+    if outcome is None:
+        return result
+    if outcome:
+        result.scale = high
+        return result
+    while high - low > tolerance:
+        middle = round((low + high) / 2, 3)
+        outcome = passes(middle)
+        if outcome is None:
+            break
+        if outcome:
+            low = result.scale = middle
+        else:
+            high = middle
+    return result
@@ -0,0 +1,131 @@
+"""只渲染可见行的列表：几十万行的记录也只在 Treeview 里放一屏的行"""
+import tkinter as tk
+from tkinter import ttk
+
+from tracing import traced
+
+
+class VirtualList:
+    """Treeview 加滚动条，行数据按需向 fetch 要
+
+    count():           总行数
+    fetch(start, stop): 返回 [start, stop) 的行，每行是各列的值
+    选中的是连续的一段行，用 selection() 取 (start, end)，点击选中一行，按住 Shift 点击选中一段。
+    """
+
+    def __init__(self, parent, columns, headings, widths, count, fetch, height=20):
+        self.count = count
+        self.fetch = fetch
+        self.height = height
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings",
+                                 height=height, selectmode="none")
+        for column, heading, width in zip(columns, headings, widths):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width)
+        self.tree.tag_configure("selected", background="#cce4ff")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 第一行可见行的序号，选中范围的起点和当前行
+        self.top = 0
+        self.anchor = None
+        self.cursor = None
+
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", -height), ("<Next>", height)):
+            self.tree.bind(key, lambda e, step=step: self.move_cursor(step))
+            self.tree.bind(f"<Shift-{key[1:]}", lambda e, step=step: self.move_cursor(step, extend=True))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def selection(self):
+        """选中的范围 (start, end)，没有选中时返回 None"""
+        if self.anchor is None:
+            return None
+        return min(self.anchor, self.cursor), max(self.anchor, self.cursor) + 1
+
+    def select(self, start, end=None):
+        """选中 [start, end)，并滚动到能看见"""
+        total = self.count()
+        if not total:
+            self.anchor = self.cursor = None
+        else:
+            end = start + 1 if end is None else end
+            self.anchor = min(max(start, 0), total - 1)
+            self.cursor = min(max(end - 1, self.anchor), total - 1)
+            self.see(self.cursor)
+        self.refresh()
+
+    def see(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.height:
+            self.top = index - self.height + 1
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+
+    def move_cursor(self, step, extend=False):
+        if self.cursor is None:
+            return
+        cursor = min(max(self.cursor + step, 0), self.count() - 1)
+        if extend:
+            self.cursor = cursor
+            self.see(cursor)
+            self.refresh()
+        else:
+            self.select(cursor)
+        return "break"
+
+    def _on_click(self, event, extend=False):
+        self.tree.focus_set()
+        item = self.tree.identify_row(event.y)
+        if not item:
+            return "break"
+        index = int(item)
+        if extend and self.anchor is not None:
+            self.cursor = index
+            self.refresh()
+        else:
+            self.select(index)
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        total = self.count()
+        if action == "moveto":
+            self.top = int(float(amount) * total)
+        elif unit == "pages":
+            self.top += int(amount) * self.height
+        else:
+            self.top += int(amount)
+        self.refresh()
+
+    @traced('VirtualList.refresh')
+    def refresh(self):
+        """按当前的滚动位置重画可见的行"""
+        total = self.count()
+        self.top = max(min(self.top, total - self.height), 0)
+        if self.cursor is not None and self.cursor >= total:
+            self.anchor = self.cursor = None
+        tree = self.tree
+        tree.delete(*tree.get_children())
+        selection = self.selection()
+        for index, values in enumerate(self.fetch(self.top, min(self.top + self.height, total)),
+                                       self.top):
+            selected = selection is not None and selection[0] <= index < selection[1]
+            tree.insert("", tk.END, iid=str(index), values=values,
+                        tags=("selected",) if selected else ())
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.height, total) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)